@@ -0,0 +1,45 @@
+"""add partial deleted_at indexes so compaction can find tombstones cheaply
+
+Revision ID: 2f8c4a9e6b13
+Revises: e5b71d2c9f40
+Create Date: 2026-10-17 16:48:12.530417
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f8c4a9e6b13'
+down_revision: Union[str, None] = 'e5b71d2c9f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run in the migration transaction; don't lock live tables.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'embeddings_deleted_at_idx', 'embeddings', ['deleted_at'],
+            postgresql_where=sa.text('deleted_at IS NOT NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'documents_deleted_at_idx', 'documents', ['deleted_at'],
+            postgresql_where=sa.text('deleted_at IS NOT NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('documents_deleted_at_idx', table_name='documents',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('embeddings_deleted_at_idx', table_name='embeddings',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,46 @@
+"""add embedding_cache table and cache counters to training_jobs
+
+Revision ID: 3d9a71c4e2b8
+Revises: fc1514028346
+Create Date: 2026-10-17 09:12:40.118302
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import VECTOR
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9a71c4e2b8'
+down_revision: Union[str, None] = 'fc1514028346'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'embedding_cache',
+        sa.Column('embedding_model', sa.Text(), nullable=False),
+        sa.Column('embedding_version', sa.Text(), nullable=False),
+        sa.Column('dimensions', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.Text(), nullable=False),
+        sa.Column('embedding', VECTOR(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('embedding_model', 'embedding_version', 'dimensions', 'content_hash', name='embedding_cache_pkey'),
+    )
+    op.create_index('embedding_cache_last_used_at_idx', 'embedding_cache', ['last_used_at'])
+    op.add_column('training_jobs', sa.Column('embedding_cache_hits', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.add_column('training_jobs', sa.Column('embedding_cache_misses', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('training_jobs', 'embedding_cache_misses')
+    op.drop_column('training_jobs', 'embedding_cache_hits')
+    op.drop_index('embedding_cache_last_used_at_idx', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
@@ -0,0 +1,51 @@
+"""add answer_cache table and per-bot opt-in columns on model_config_versions
+
+Revision ID: 4a8c1e6f2b97
+Revises: 9e4f1a7c2d58
+Create Date: 2026-10-17 20:41:08.532117
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import HALFVEC
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8c1e6f2b97'
+down_revision: Union[str, None] = '9e4f1a7c2d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'answer_cache',
+        sa.Column('id', sa.Uuid(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('bot_id', sa.Uuid(), nullable=False),
+        sa.Column('generation', sa.BigInteger(), nullable=False),
+        sa.Column('embedding_model', sa.Text(), nullable=False),
+        sa.Column('llm_model', sa.Text(), nullable=False),
+        sa.Column('query', sa.Text(), nullable=False),
+        sa.Column('query_embedding', HALFVEC(1536), nullable=False),
+        sa.Column('answer', sa.Text(), nullable=False),
+        sa.Column('answer_latency_ms', sa.Integer(), nullable=False),
+        sa.Column('hits', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_hit_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id', name='answer_cache_pkey'),
+    )
+    op.create_index('answer_cache_bot_generation_idx', 'answer_cache', ['bot_id', 'generation'])
+    op.add_column('model_config_versions', sa.Column('answer_cache_enabled', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.add_column('model_config_versions', sa.Column('answer_cache_min_similarity', sa.Double(precision=53), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('model_config_versions', 'answer_cache_min_similarity')
+    op.drop_column('model_config_versions', 'answer_cache_enabled')
+    op.drop_index('answer_cache_bot_generation_idx', table_name='answer_cache')
+    op.drop_table('answer_cache')
@@ -0,0 +1,45 @@
+"""add an HNSW (cosine) index over live embeddings
+
+Revision ID: 6b3e9d1f7a25
+Revises: 2f8c4a9e6b13
+Create Date: 2026-10-17 17:20:44.901263
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b3e9d1f7a25'
+down_revision: Union[str, None] = '2f8c4a9e6b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Building the graph over existing rows takes a while; CONCURRENTLY keeps
+    # ingestion and retrieval running meanwhile. A bigger maintenance_work_mem
+    # keeps the build in memory (much faster) where the server allows it.
+    with op.get_context().autocommit_block():
+        op.execute(sa.text("SET maintenance_work_mem = '1GB'"))
+        op.create_index(
+            'embeddings_embedding_hnsw_idx', 'embeddings', ['embedding'],
+            postgresql_using='hnsw',
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_where=sa.text('deleted_at IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.execute(sa.text("RESET maintenance_work_mem"))
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('embeddings_embedding_hnsw_idx', table_name='embeddings',
+                      postgresql_concurrently=True, if_exists=True)
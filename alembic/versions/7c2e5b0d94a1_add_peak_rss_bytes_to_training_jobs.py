@@ -0,0 +1,30 @@
+"""add peak_rss_bytes to training_jobs
+
+Revision ID: 7c2e5b0d94a1
+Revises: 3d9a71c4e2b8
+Create Date: 2026-10-17 11:03:27.502194
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e5b0d94a1'
+down_revision: Union[str, None] = '3d9a71c4e2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('training_jobs', sa.Column('peak_rss_bytes', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('training_jobs', 'peak_rss_bytes')
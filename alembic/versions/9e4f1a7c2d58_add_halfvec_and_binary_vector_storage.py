@@ -0,0 +1,72 @@
+"""add halfvec / binary-quantized embedding columns and their HNSW indexes
+
+Revision ID: 9e4f1a7c2d58
+Revises: c7d2e8f4a1b6
+Create Date: 2026-10-17 18:52:40.117385
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import BIT, HALFVEC, VECTOR
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4f1a7c2d58'
+down_revision: Union[str, None] = 'c7d2e8f4a1b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # halfvec / bit HNSW operator classes need pgvector >= 0.7.
+    op.add_column('embeddings', sa.Column('embedding_half', HALFVEC(1536), nullable=True))
+    op.add_column('embeddings', sa.Column('embedding_bits', BIT(1536), nullable=True))
+    op.alter_column('embeddings', 'embedding', existing_type=VECTOR(1536), nullable=True)
+    # Added NOT VALID (no scan under the ACCESS EXCLUSIVE lock) and validated
+    # below in its own transaction, which only takes SHARE UPDATE EXCLUSIVE, so
+    # the validating scan doesn't block writes.
+    op.execute(sa.text(
+        "ALTER TABLE embeddings ADD CONSTRAINT embeddings_has_vector_check "
+        "CHECK (embedding IS NOT NULL OR embedding_half IS NOT NULL) NOT VALID"
+    ))
+
+    with op.get_context().autocommit_block():
+        op.execute(sa.text("ALTER TABLE embeddings VALIDATE CONSTRAINT embeddings_has_vector_check"))
+        # Empty until a version is switched to "halfvec" / "binary" (NULLs aren't indexed).
+        op.create_index(
+            'embeddings_embedding_half_hnsw_idx', 'embeddings', ['embedding_half'],
+            postgresql_using='hnsw',
+            postgresql_ops={'embedding_half': 'halfvec_cosine_ops'},
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_where=sa.text('deleted_at IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'embeddings_embedding_bits_hnsw_idx', 'embeddings', ['embedding_bits'],
+            postgresql_using='hnsw',
+            postgresql_ops={'embedding_bits': 'bit_hamming_ops'},
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_where=sa.text('deleted_at IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('embeddings_embedding_bits_hnsw_idx', table_name='embeddings',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('embeddings_embedding_half_hnsw_idx', table_name='embeddings',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_constraint('embeddings_has_vector_check', 'embeddings', type_='check')
+    # Rows stored without a float32 vector get one back from their halfvec.
+    op.execute(sa.text(
+        "UPDATE embeddings SET embedding = embedding_half::vector(1536) WHERE embedding IS NULL"
+    ))
+    op.alter_column('embeddings', 'embedding', existing_type=VECTOR(1536), nullable=False)
+    op.drop_column('embeddings', 'embedding_bits')
+    op.drop_column('embeddings', 'embedding_half')
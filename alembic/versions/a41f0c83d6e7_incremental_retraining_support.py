@@ -0,0 +1,72 @@
+"""add documents.content_hash and make chunk uniqueness apply to live rows only
+
+Revision ID: a41f0c83d6e7
+Revises: 7c2e5b0d94a1
+Create Date: 2026-10-17 13:41:09.684120
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f0c83d6e7'
+down_revision: Union[str, None] = '7c2e5b0d94a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows per backfill transaction; keeps locks and WAL bursts small on big tables.
+_BACKFILL_BATCH = 10_000
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('content_hash', sa.Text(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        # Walk the primary key so every batch is an index range, not a rescan.
+        after = None
+        while True:
+            ids = conn.execute(
+                sa.text(
+                    "SELECT id FROM documents WHERE (CAST(:after AS uuid) IS NULL OR id > :after) "
+                    "ORDER BY id LIMIT :batch"
+                ),
+                {"after": after, "batch": _BACKFILL_BATCH},
+            ).scalars().all()
+            if not ids:
+                break
+            # Same digest as app.helpers.rag.content_hash (sha256 hex of the UTF-8 text).
+            conn.execute(
+                sa.text(
+                    "UPDATE documents SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') "
+                    "WHERE id = ANY(:ids) AND content IS NOT NULL AND content_hash IS NULL"
+                ),
+                {"ids": list(ids)},
+            )
+            after = ids[-1]
+
+        # Built before the old constraint goes, so chunk uniqueness is never unenforced.
+        op.create_index(
+            'uq_documents_live_source_chunk_model_version',
+            'documents',
+            ['source_id', 'chunk_index', 'embedding_model', 'embedding_version'],
+            unique=True,
+            postgresql_where=sa.text('is_active AND deleted_at IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+    op.drop_constraint('uq_documents_source_chunk_model_version', 'documents', type_='unique')
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('uq_documents_source_chunk_model_version', 'documents', ['source_id', 'chunk_index', 'embedding_model', 'embedding_version'])
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_documents_live_source_chunk_model_version', table_name='documents',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column('documents', 'content_hash')
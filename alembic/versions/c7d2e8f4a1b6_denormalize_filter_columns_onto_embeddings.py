@@ -0,0 +1,84 @@
+"""copy bot/org/model/version/is_active from documents onto embeddings
+
+Revision ID: c7d2e8f4a1b6
+Revises: 6b3e9d1f7a25
+Create Date: 2026-10-17 18:05:19.442871
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e8f4a1b6'
+down_revision: Union[str, None] = '6b3e9d1f7a25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows per backfill transaction; keeps locks and WAL bursts small on big tables.
+_BACKFILL_BATCH = 10_000
+
+
+def upgrade() -> None:
+    op.add_column('embeddings', sa.Column('bot_id', sa.Uuid(), nullable=True))
+    op.add_column('embeddings', sa.Column('organization_id', sa.Text(), nullable=True))
+    op.add_column('embeddings', sa.Column('embedding_model', sa.Text(), nullable=True))
+    op.add_column('embeddings', sa.Column('embedding_version', sa.Text(), nullable=True))
+    # Constant default: no table rewrite.
+    op.add_column('embeddings', sa.Column('is_active', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        # Walk the primary key so every batch is an index range, not a rescan.
+        after = None
+        while True:
+            ids = conn.execute(
+                sa.text(
+                    "SELECT id FROM embeddings WHERE (CAST(:after AS uuid) IS NULL OR id > :after) "
+                    "ORDER BY id LIMIT :batch"
+                ),
+                {"after": after, "batch": _BACKFILL_BATCH},
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(
+                sa.text(
+                    """
+                    UPDATE embeddings e
+                    SET bot_id = d.bot_id,
+                        organization_id = d.organization_id,
+                        embedding_model = d.embedding_model,
+                        embedding_version = d.embedding_version,
+                        is_active = coalesce(d.is_active, false)
+                            AND d.deleted_at IS NULL AND e.deleted_at IS NULL
+                    FROM documents d
+                    WHERE d.id = e.document_id AND e.id = ANY(:ids)
+                    """
+                ),
+                {"ids": list(ids)},
+            )
+            after = ids[-1]
+
+        op.create_index(
+            'embeddings_bot_live_idx', 'embeddings',
+            ['bot_id', 'embedding_model', 'embedding_version'],
+            postgresql_where=sa.text('is_active AND deleted_at IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('embeddings_bot_live_idx', table_name='embeddings',
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column('embeddings', 'is_active')
+    op.drop_column('embeddings', 'embedding_version')
+    op.drop_column('embeddings', 'embedding_model')
+    op.drop_column('embeddings', 'organization_id')
+    op.drop_column('embeddings', 'bot_id')
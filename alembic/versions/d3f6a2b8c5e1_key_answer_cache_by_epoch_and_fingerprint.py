@@ -0,0 +1,33 @@
+"""key answer_cache rows by Redis generation epoch and config fingerprint
+
+Revision ID: d3f6a2b8c5e1
+Revises: 4a8c1e6f2b97
+Create Date: 2026-10-17 23:12:46.208913
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f6a2b8c5e1'
+down_revision: Union[str, None] = '4a8c1e6f2b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing answers can't be attributed to an epoch or config; it's a cache, drop them.
+    op.execute(sa.text("DELETE FROM answer_cache"))
+    op.add_column('answer_cache', sa.Column('generation_epoch', sa.Text(), nullable=False))
+    op.add_column('answer_cache', sa.Column('config_fingerprint', sa.Text(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('answer_cache', 'config_fingerprint')
+    op.drop_column('answer_cache', 'generation_epoch')
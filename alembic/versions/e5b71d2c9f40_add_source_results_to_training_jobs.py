@@ -0,0 +1,30 @@
+"""add training_jobs.source_results for batch deletions
+
+Revision ID: e5b71d2c9f40
+Revises: a41f0c83d6e7
+Create Date: 2026-10-17 16:02:37.215904
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b71d2c9f40'
+down_revision: Union[str, None] = 'a41f0c83d6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('training_jobs', sa.Column('source_results', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('training_jobs', 'source_results')
@@ -15,12 +15,16 @@ from app.infra.redis_client import redis_client
 from app.models.chat_db_models import TrainingJobs
 from app.models.dashboard_db_models import TrainingSources
 from app.services.worker_fns import (delete_training_source_job,
+                                     delete_training_sources_job,
                                      process_training_job)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Upper bound on source ids accepted by one batch deletion request.
+_MAX_BATCH_DELETE_SOURCES = 5000
+
 
 @router.post("/api/training/queue")
 async def queue_training(
@@ -158,3 +162,75 @@ async def delete_training_source(
         str(bot_uuid),
     )
     return JSONResponse(content={"message": "Source was deleted successfully", "job_id": str(job.id)}, status_code=200)
+
+
+@router.post('/api/training/delete-batch')
+async def delete_training_sources_batch(
+    request: Request,
+    chat_db: Session = Depends(get_chat_db),
+):
+    """
+    Queue cleanup for many already-deleted sources as a single job.
+    Body: {"source_ids": [...]}; per-source outcomes land in training_jobs.source_results.
+    """
+    claims: dict = request.state.claims
+    try:
+        data = await request.json()
+    except Exception:
+        return JSONResponse(content={"error": "Invalid request body"}, status_code=400)
+    raw_ids = data.get("source_ids") if isinstance(data, dict) else None
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return JSONResponse(content={"error": "source_ids must be a non-empty list"}, status_code=400)
+    if len(raw_ids) > _MAX_BATCH_DELETE_SOURCES:
+        return JSONResponse(
+            content={"error": f"At most {_MAX_BATCH_DELETE_SOURCES} sources can be deleted per request"},
+            status_code=400,
+        )
+    try:
+        source_ids = list(dict.fromkeys(str(uuid.UUID(str(s))) for s in raw_ids))
+    except ValueError:
+        logger.error("Invalid Training Source ID in batch", extra={"count": len(raw_ids)})
+        return JSONResponse(content={"error": "Invalid Training Source Provided"}, status_code=400)
+
+    try:
+        bot_uuid = uuid.UUID(str(claims.get("bot_id")))
+    except Exception:
+        return JSONResponse(content={"error": "Invalid Bot selected"}, status_code=400)
+
+    job = TrainingJobs(
+        id=uuid.uuid4(),
+        organization_id=claims.get("organization_id"),
+        bot_id=bot_uuid,
+        status="queued"
+    )
+    try:
+        chat_db.add(job)
+        chat_db.commit()
+        chat_db.refresh(job)
+        queue = Queue(connection=redis_client)
+        queue.enqueue(
+            delete_training_sources_job,
+            str(job.id),
+            source_ids,
+            claims.get("organization_id"),
+            str(bot_uuid),
+        )
+    except Exception as e:
+        # Sources are already deleted on the dashboard side; cleanup is best-effort.
+        logger.exception("Failed to queue batch deletion job",
+                         extra={"job_id": str(job.id), "error": str(e)})
+        try:
+            job.status = "failed"
+            job.error_message = str(e)
+            job.completed_at = datetime.now(timezone.utc)
+            chat_db.commit()
+        except Exception as err:
+            logger.exception("Failed to update job status as failed",
+                             extra={"error": str(err)})
+            chat_db.rollback()
+        return JSONResponse(content={"message": "Sources were deleted successfully"}, status_code=200)
+    logger.info("Batch deletion job queued", extra={"job_id": str(job.id), "sources": len(source_ids)})
+    return JSONResponse(
+        content={"message": "Sources were deleted successfully", "job_id": str(job.id), "source_count": len(source_ids)},
+        status_code=200,
+    )
@@ -1,8 +1,222 @@
+# chunk_size / chunk_overlap are in tokens of the model's tokenizer; a chunk
+# never exceeds max_input_tokens (the model's per-input limit). Bump `version`
+# per the scheme in process_file_training_source (v.1.1.0: token chunking).
 _EMBEDDING_CONFIG = {
     "model": "text-embedding-3-small",
     "dimensions": 1536,
     "provider": "openai",
-    "version": "v.1.0.0",
-    "chunk_size": 800,
-    "chunk_overlap": 100
-}
\ No newline at end of file
+    "version": "v.1.1.0",
+    "chunk_size": 200,
+    "chunk_overlap": 25,
+    "max_input_tokens": 8191,
+}
+
+# Request packing for create_embeddings. The provider caps a single embeddings
+# request at 2048 inputs / 300k tokens; stay well below so requests finish fast.
+_EMBEDDING_BATCH_CONFIG = {
+    "max_batch_tokens": 100_000,
+    "max_batch_size": 512,
+    "max_concurrency": 4,
+}
+
+# Content-addressed embedding cache (chat DB `embedding_cache`). Least recently
+# used rows are evicted once the table grows past `max_entries`.
+_EMBEDDING_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 2_000_000,
+    "lookup_batch_size": 1000,
+}
+
+# Vector retrieval (retrieve_closest_embeddings). `embeddings` carries an HNSW
+# index (cosine ops, built with hnsw_m / hnsw_ef_construction) over live rows.
+# `ef_search` is the per-query candidate list (raised to k if smaller);
+# `iterative_scan` lets pgvector >= 0.8 keep scanning when the bot filter drops
+# candidates (None leaves the server default). `probes` only matters for an
+# IVFFlat index.
+_RETRIEVAL_CONFIG = {
+    "hnsw_m": 16,
+    "hnsw_ef_construction": 64,
+    "ef_search": 100,
+    "iterative_scan": "relaxed_order",
+    "probes": None,
+}
+
+# How embeddings of each embedding version are stored (chat DB `embeddings`):
+#   "vector"  - float32 `embedding` (6 KB at 1536 dims)
+#   "halfvec" - float16 `embedding_half` only (3 KB), searched directly
+#   "binary"  - `embedding_half` plus 1 bit/dim `embedding_bits` (192 B); the
+#               Hamming-distance index returns k * `binary_oversample`
+#               candidates that are rescored by exact halfvec cosine distance
+# Versions not listed use `default`. Changing a version's mode only affects
+# rows written afterwards, so pair it with a new embedding version.
+_VECTOR_STORAGE_CONFIG = {
+    "default": "vector",
+    "versions": {},
+    "binary_oversample": 20,
+}
+
+# Query embedding cache for embed_query (app/helpers/query_embedding_cache.py),
+# keyed by model, dimensions and normalized query text (NFKC, whitespace
+# collapsed, casefolded; the normalized text is what gets embedded). A per-process
+# LRU of `memory_max_entries` sits in front of Redis, which keeps packed float32
+# vectors under `{redis_key_prefix}...` for `redis_ttl_s`.
+_QUERY_EMBEDDING_CACHE_CONFIG = {
+    "enabled": True,
+    "memory_max_entries": 10_000,
+    "redis_enabled": True,
+    "redis_ttl_s": 7 * 24 * 3600,
+    "redis_key_prefix": "query_embedding:",
+}
+
+# In-process per-bot vector cache in the API (app/helpers/vector_cache.py). A
+# bot's live chunks are loaded on first query as an L2-normalized float32 matrix
+# and searched by brute force; bots over `max_bot_chunks` stay on the HNSW path.
+# Least recently used bots are dropped past `max_bytes`. Workers bump
+# `{generation_key_prefix}{bot_id}` and publish it on `channel` after training or
+# deletion, which drops that bot's cached copy in every API process. `epoch_key`
+# holds a random id that is recreated if Redis loses its data, since the
+# generation counters restart then.
+_VECTOR_CACHE_CONFIG = {
+    "enabled": True,
+    "max_bytes": 512 * 1024 * 1024,
+    "max_bot_chunks": 50_000,
+    "load_batch_size": 5000,
+    "generation_key_prefix": "bot_generation:",
+    "channel": "bot_generation",
+    "epoch_key": "bot_generation_epoch",
+    "reconnect_max_s": 30,
+}
+
+# Per-bot vector snapshot files shared by the API processes of a node
+# (app/helpers/vector_snapshot.py; directory from VECTOR_SNAPSHOT_DIR, unset
+# disables them). After training or deletion the worker writes the bot's live
+# vectors for the new generation (temp file + rename) before publishing it, so
+# API processes mmap one copy instead of each loading from Postgres. Older
+# generations are removed once `gc_grace_s` old, keeping `keep_previous`.
+_VECTOR_SNAPSHOT_CONFIG = {
+    "keep_previous": 1,
+    "gc_grace_s": 10 * 60,
+}
+
+# Streaming ingestion: text is tokenized in batches of roughly `split_window_chars`
+# and chunks are persisted + embedded `persist_batch_size` at a time, so worker
+# memory stays flat regardless of file size. With `incremental`, re-training a
+# source only embeds chunks whose text is new or changed.
+_INGEST_CONFIG = {
+    "persist_batch_size": 2048,
+    "split_window_chars": 32_000,
+    "incremental": True,
+}
+
+# Per-source parallelism inside process_training_job. URL sources are I/O bound
+# and run on threads; file sources (PDF/CSV/text parsing) run on a process pool
+# unless `file_executor` is "thread". Every task opens its own DB sessions, so
+# keep url_workers + file_workers within the engines' pool_size + max_overflow.
+_TRAINING_EXECUTOR_CONFIG = {
+    "url_workers": 8,
+    "file_workers": 4,
+    "file_executor": "process",
+    "mp_start_method": "spawn",
+}
+
+# Async pooled fetcher for URL training sources (app/infra/http_fetcher.py).
+# One keep-alive pool per job; `per_host_limit` keeps us polite to a single site.
+# At most `queue_size` pages are downloading or waiting to be extracted at once.
+_URL_FETCH_CONFIG = {
+    "max_connections": 64,
+    "max_keepalive_connections": 32,
+    "keepalive_expiry_s": 30.0,
+    "per_host_limit": 4,
+    "connect_timeout_s": 10.0,
+    "total_timeout_s": 30.0,
+    "max_body_bytes": 10 * 1024 * 1024,
+    "queue_size": 32,
+    "user_agent": "Mozilla/5.0 (compatible; ChatAPI/1.0; +https://example.local)",
+}
+
+# Process-wide R2 (S3) client and file-source downloads (app/infra/r2_storage.py).
+# Objects up to `part_size_bytes` come back from the first ranged GET; larger
+# ones fetch the remaining parts `download_workers` at a time. Non-PDF files up
+# to `spool_max_bytes` stay in memory instead of a temp file.
+_R2_CONFIG = {
+    "max_pool_connections": 32,
+    "connect_timeout_s": 5.0,
+    "read_timeout_s": 60.0,
+    "max_attempts": 5,
+    "retry_mode": "standard",
+    "tcp_keepalive": True,
+    "part_size_bytes": 8 * 1024 * 1024,
+    "download_workers": 8,
+    "spool_max_bytes": 16 * 1024 * 1024,
+}
+
+# Site crawls (training sources with type "crawl", app/services/crawler.py).
+# Seeds come from sitemap.xml when the site has one, otherwise same-origin links
+# are followed up to `max_depth`. Requests to a host start at least
+# `politeness_delay_s` apart (or the robots.txt Crawl-delay, if larger). The
+# frontier lives in Redis for `state_ttl_s` so a crashed worker can resume.
+_CRAWL_CONFIG = {
+    "max_pages": 500,
+    "max_depth": 3,
+    "concurrency": 4,
+    "politeness_delay_s": 0.5,
+    "robots_user_agent": "ChatAPI",
+    "max_sitemaps": 50,
+    "queue_size": 32,
+    "state_ttl_s": 3 * 24 * 3600,
+    "progress_every_pages": 50,
+}
+
+# Page-parallel PDF text extraction (app/helpers/pdf_extract.py). `workers` = 0
+# means one process per CPU, split between the file sources a training job
+# parses at once. Extracted page text is cached in Redis by file
+# content hash + page number for `cache_ttl_s`, so a retried job skips pages it
+# already parsed. PDFs under `min_pages_for_pool` pages are parsed inline.
+_PDF_EXTRACT_CONFIG = {
+    "workers": 0,
+    "pages_per_task": 8,
+    "min_pages_for_pool": 16,
+    "mp_start_method": "spawn",
+    "cache_enabled": True,
+    "cache_ttl_s": 7 * 24 * 3600,
+    "cache_batch_size": 500,
+}
+
+# CSV file sources are read `batch_rows` rows at a time and packed into chunks
+# of whole rows (header line repeated in every chunk), so memory stays flat for
+# any number of rows.
+_CSV_INGEST_CONFIG = {
+    "batch_rows": 2000,
+    "encoding": "utf-8-sig",
+}
+
+# Compaction of soft-deleted rows (app/services/compaction.py). Tombstones older
+# than `retention_days` are hard-deleted `batch_size` rows per transaction with
+# `pause_s` between batches; a run stops after `max_runtime_s` and the next run
+# picks up the rest. Index maintenance (VACUUM + REINDEX CONCURRENTLY) only runs
+# after a purge of at least `maintenance_min_rows` rows or `maintenance_min_ratio`
+# of the table. The job re-enqueues itself every `interval_s`.
+_COMPACTION_CONFIG = {
+    "retention_days": 7,
+    "batch_size": 2000,
+    "pause_s": 0.2,
+    "max_runtime_s": 30 * 60,
+    "maintenance_min_rows": 50_000,
+    "maintenance_min_ratio": 0.1,
+    "interval_s": 6 * 60 * 60,
+    # RQ's default 180s timeout would kill the purge + REINDEX
+    "job_timeout_s": 2 * 60 * 60,
+    "queue": "default",
+    "job_id_prefix": "chat-db-compaction",
+}
+
+# Semantic answer cache for chat replies (app/helpers/answer_cache.py), opt-in
+# per bot via model_config_versions.answer_cache_enabled. A question is answered
+# from the cache when a previous question to the same bot, at the same epoch and
+# generation and with the same config fingerprint (prompts and models), has cosine similarity >= `min_similarity` (overridable per bot). Entries older than `max_age_s` are ignored and purged.
+# Hits, lookups and saved milliseconds accumulate in `{stats_key_prefix}{bot_id}`.
+_ANSWER_CACHE_CONFIG = {
+    "min_similarity": 0.95,
+    "max_age_s": 7 * 24 * 3600,
+    "stats_key_prefix": "answer_cache_stats:",
+}
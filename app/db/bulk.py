@@ -0,0 +1,161 @@
+"""Set-based write paths for the chat DB (documents / embeddings)."""
+
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Iterable, Sequence
+from uuid import UUID
+
+import numpy as np
+from pgvector import Bit, HalfVector, Vector
+from pgvector.psycopg.bit import BitBinaryDumper
+from pgvector.psycopg.halfvec import HalfVectorBinaryDumper
+from pgvector.psycopg.vector import VectorBinaryDumper
+from psycopg.postgres import types as pg_types
+from psycopg.types import TypeInfo
+from sqlalchemy import Uuid, column, func, insert, select, values
+from sqlalchemy.orm import Session
+
+from app.config.rag_config import _VECTOR_STORAGE_CONFIG
+from app.models.chat_db_models import Documents, Embeddings
+
+# pgvector is an extension, so its type oids differ per database; resolved once.
+_EXTENSION_OIDS: dict[str, int] = {}
+
+# embeddings columns written for each storage mode (see _VECTOR_STORAGE_CONFIG)
+_STORAGE_COLUMNS: dict[str, tuple[str, ...]] = {
+    "vector": ("embedding",),
+    "halfvec": ("embedding_half",),
+    "binary": ("embedding_half", "embedding_bits"),
+}
+
+
+def vector_storage_mode(embedding_version: str) -> str:
+    mode = _VECTOR_STORAGE_CONFIG["versions"].get(embedding_version, _VECTOR_STORAGE_CONFIG["default"])
+    if mode not in _STORAGE_COLUMNS:
+        raise ValueError(f"Unknown vector storage mode {mode!r} for embedding version {embedding_version!r}.")
+    return str(mode)
+
+
+def _extension_oid(driver_conn, name: str) -> int:
+    oid = _EXTENSION_OIDS.get(name)
+    if oid is None:
+        info = TypeInfo.fetch(driver_conn, name)  # type: ignore[arg-type]
+        if info is None:
+            raise RuntimeError(f"{name} type not found in the database")
+        oid = _EXTENSION_OIDS[name] = info.oid
+    return oid
+
+
+@dataclass(frozen=True, slots=True)
+class EmbeddingScope:
+    """Document columns copied onto every embedding row so retrieval can filter without a join."""
+
+    bot_id: UUID
+    organization_id: str
+    embedding_model: str
+    embedding_version: str
+
+
+def insert_documents(session: Session, rows: Sequence[dict[str, Any]]) -> list[UUID]:
+    """
+    Insert `rows` into documents with multi-row INSERT ... RETURNING id.
+
+    Ids come back in the same order as `rows`, so callers don't need to read the
+    chunks back to learn them.
+    """
+    if not rows:
+        return []
+    return list(
+        session.scalars(
+            insert(Documents).returning(Documents.id, sort_by_parameter_order=True),
+            list(rows),
+        ).all()
+    )
+
+
+def copy_embeddings(
+    session: Session,
+    rows: Iterable[tuple[UUID, Sequence[float]]],
+    scope: EmbeddingScope,
+    is_active: bool,
+) -> int:
+    """
+    Stream (document_id, embedding) rows into embeddings with binary COPY, stamping
+    each with `scope` and `is_active` (which must match the documents' own values).
+    The vector columns written follow the storage mode of the scope's version.
+
+    Runs on the session's connection, so the rows commit or roll back with the
+    surrounding ORM transaction. Returns the number of rows written.
+    """
+    storage = _STORAGE_COLUMNS[vector_storage_mode(scope.embedding_version)]
+    driver_conn = session.connection().connection.driver_connection
+    vector_types = {
+        "embedding": _extension_oid(driver_conn, "vector"),
+        "embedding_half": _extension_oid(driver_conn, "halfvec"),
+        "embedding_bits": pg_types["bit"].oid,
+    }
+    columns = ("document_id", *storage, "bot_id", "organization_id",
+               "embedding_model", "embedding_version", "is_active")
+
+    written = 0
+    with driver_conn.cursor() as cur:  # type: ignore[union-attr]
+        # Scoped to this cursor so result loading elsewhere keeps its usual types.
+        cur.adapters.register_dumper(Vector, type("", (VectorBinaryDumper,), {"oid": vector_types["embedding"]}))
+        cur.adapters.register_dumper(
+            HalfVector, type("", (HalfVectorBinaryDumper,), {"oid": vector_types["embedding_half"]}))
+        cur.adapters.register_dumper(Bit, type("", (BitBinaryDumper,), {"oid": vector_types["embedding_bits"]}))
+        with cur.copy(f"COPY embeddings ({', '.join(columns)}) FROM STDIN WITH (FORMAT BINARY)") as copy:
+            copy.set_types([
+                pg_types["uuid"].oid, *(vector_types[c] for c in storage), pg_types["uuid"].oid,
+                pg_types["text"].oid, pg_types["text"].oid, pg_types["text"].oid, pg_types["bool"].oid,
+            ])
+            tail = (scope.bot_id, scope.organization_id, scope.embedding_model, scope.embedding_version, is_active)
+            for document_id, embedding in rows:
+                values_ = _encode_vector(np.asarray(embedding, dtype=np.float32), storage)
+                copy.write_row((document_id, *values_, *tail))
+                written += 1
+    return written
+
+
+def _encode_vector(vector: np.ndarray, storage: tuple[str, ...]) -> list:
+    encoded = []
+    for column_name in storage:
+        if column_name == "embedding":
+            encoded.append(Vector(vector))
+        elif column_name == "embedding_half":
+            encoded.append(HalfVector(vector))
+        else:
+            # same rule as pgvector's binary_quantize(): 1 where the component is > 0
+            encoded.append(Bit(vector > 0))
+    return encoded
+
+
+def copy_embeddings_from(session: Session, pairs: Sequence[tuple[UUID, UUID]]) -> int:
+    """
+    Give each new document the live vector of an existing one, server side.
+
+    `pairs` are (new_document_id, existing_document_id); used when re-training finds
+    a chunk whose text is unchanged but whose position moved. The filter columns
+    (bot, model/version, is_active) come from the new document.
+    """
+    if not pairs:
+        return 0
+    mapping = values(
+        column("new_id", Uuid), column("old_id", Uuid), name="mapping"
+    ).data(list(pairs))
+    result = session.execute(
+        insert(Embeddings).from_select(
+            ["document_id", "embedding", "embedding_half", "embedding_bits", "bot_id", "organization_id",
+             "embedding_model", "embedding_version", "is_active"],
+            select(mapping.c.new_id, Embeddings.embedding, Embeddings.embedding_half, Embeddings.embedding_bits,
+                   Documents.bot_id, Documents.organization_id,
+                   Documents.embedding_model, Documents.embedding_version,
+                   func.coalesce(Documents.is_active, False))
+            .join(mapping, Embeddings.document_id == mapping.c.old_id)
+            .join(Documents, Documents.id == mapping.c.new_id)
+            .where(Embeddings.deleted_at.is_(None)),
+        )
+    )
+    return int(getattr(result, "rowcount", 0) or 0)
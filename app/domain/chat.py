@@ -43,6 +43,8 @@ class ChatSession(BaseModel):
 
     conversation_id: str = Field(min_length=1)
     organization_id: str = Field(min_length=1)
+    # From the user token; replies are grounded in (and cached for) this bot when set.
+    bot_id: str | None = Field(default=None)
     # WebSocket objects are runtime-only (not JSON-serializable); exclude from dumps.
     user_socket: WebSocket | None = Field(default=None, exclude=True)
     agent_socket: WebSocket | None = Field(default=None, exclude=True)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from redis import Redis, RedisError
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config.rag_config import _ANSWER_CACHE_CONFIG
+from app.infra.redis_client import redis_client
+from app.models.chat_db_models import AnswerCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedAnswer:
+    id: UUID
+    answer: str
+    similarity: float
+    answer_latency_ms: int
+
+
+def config_fingerprint(parts: dict) -> str:
+    """sha256 of everything besides the question that shapes an answer (prompts, models, retrieval settings)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=int(_ANSWER_CACHE_CONFIG["max_age_s"]))
+
+
+def lookup_answer(
+    chat_session: Session,
+    bot_id: UUID,
+    epoch: str,
+    generation: int,
+    fingerprint: str,
+    query_embedding: list[float],
+    min_similarity: float | None = None,
+) -> CachedAnswer | None:
+    """
+    The stored answer whose question is closest to `query_embedding`, if its
+    cosine similarity reaches `min_similarity`; counts the hit on the row.
+    Exact scan over the bot's rows for this epoch, generation and config
+    fingerprint. The caller commits.
+    """
+    min_similarity = float(min_similarity if min_similarity is not None else _ANSWER_CACHE_CONFIG["min_similarity"])
+    distance = AnswerCache.query_embedding.cosine_distance(query_embedding)
+    row = chat_session.execute(
+        select(AnswerCache.id, AnswerCache.answer, AnswerCache.answer_latency_ms, distance.label("distance"))
+        .where(
+            AnswerCache.bot_id == bot_id,
+            AnswerCache.generation == generation,
+            AnswerCache.generation_epoch == epoch,
+            AnswerCache.config_fingerprint == fingerprint,
+            AnswerCache.created_at >= _cutoff(),
+        )
+        .order_by(distance)
+        .limit(1)
+    ).one_or_none()
+    if row is None or 1.0 - float(row.distance) < min_similarity:
+        return None
+    chat_session.execute(
+        update(AnswerCache)
+        .where(AnswerCache.id == row.id)
+        .values(hits=AnswerCache.hits + 1, last_hit_at=func.now())
+    )
+    return CachedAnswer(row.id, row.answer, 1.0 - float(row.distance), int(row.answer_latency_ms))
+
+
+def store_answer(
+    chat_session: Session,
+    bot_id: UUID,
+    epoch: str,
+    generation: int,
+    fingerprint: str,
+    query: str,
+    query_embedding: list[float],
+    answer: str,
+    answer_latency_ms: int,
+    embedding_model: str,
+    llm_model: str,
+) -> None:
+    """
+    Store an answer for this epoch, generation and fingerprint, and purge the
+    bot's rows that can no longer match: other epochs or fingerprints, older
+    generations, expired. The caller commits.
+    """
+    chat_session.execute(
+        delete(AnswerCache).where(
+            AnswerCache.bot_id == bot_id,
+            or_(
+                AnswerCache.generation_epoch != epoch,
+                AnswerCache.config_fingerprint != fingerprint,
+                AnswerCache.generation < generation,
+                AnswerCache.created_at < _cutoff(),
+            ),
+        )
+    )
+    chat_session.execute(
+        insert(AnswerCache).values(
+            bot_id=bot_id,
+            generation_epoch=epoch,
+            generation=generation,
+            config_fingerprint=fingerprint,
+            embedding_model=embedding_model,
+            llm_model=llm_model,
+            query=query,
+            query_embedding=query_embedding,
+            answer=answer,
+            answer_latency_ms=answer_latency_ms,
+        )
+    )
+
+
+def _stats_key(bot_id: UUID | str) -> str:
+    return f"{_ANSWER_CACHE_CONFIG['stats_key_prefix']}{bot_id}"
+
+
+def record_answer_cache_lookup(bot_id: UUID | str, hit: bool, saved_ms: int = 0, redis: Redis | None = None) -> None:
+    """Count a lookup (and on a hit, the latency it saved). Best-effort."""
+    try:
+        pipe = (redis or redis_client).pipeline(transaction=False)
+        key = _stats_key(bot_id)
+        pipe.hincrby(key, "lookups", 1)
+        if hit:
+            pipe.hincrby(key, "hits", 1)
+            pipe.hincrby(key, "saved_ms", max(0, int(saved_ms)))
+        pipe.execute()
+    except RedisError as e:
+        logger.warning("Failed to record answer cache stats", extra={"bot_id": str(bot_id), "error": str(e)})
+
+
+def answer_cache_stats(bot_id: UUID | str, redis: Redis | None = None) -> dict:
+    raw = (redis or redis_client).hgetall(_stats_key(bot_id))
+    lookups, hits = int(raw.get("lookups", 0)), int(raw.get("hits", 0))
+    saved_ms = int(raw.get("saved_ms", 0))
+    return {
+        "lookups": lookups,
+        "hits": hits,
+        "hit_ratio": hits / lookups if lookups else 0.0,
+        "saved_ms": saved_ms,
+        "avg_saved_ms": saved_ms / hits if hits else 0.0,
+    }
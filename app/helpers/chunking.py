@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+import tiktoken
+
+from app.config.rag_config import (_CSV_INGEST_CONFIG, _EMBEDDING_CONFIG,
+                                   _INGEST_CONFIG)
+from app.helpers.rag import get_encoding
+
+logger = logging.getLogger(__name__)
+
+# Texts of one stream are joined with a paragraph break, as before.
+_TEXT_SEPARATOR = "\n\n"
+
+
+@dataclass(frozen=True, slots=True)
+class TextChunk:
+    """A chunk ready to persist; token_count is the exact window length."""
+
+    text: str
+    token_count: int
+    section_title: str | None = None
+
+
+def _starts_mid_char(enc: tiktoken.Encoding, token: int) -> bool:
+    # Byte-level BPE can split a multi-byte UTF-8 character across tokens.
+    return (enc.decode_single_token_bytes(token)[0] & 0xC0) == 0x80
+
+
+def _snap_back(enc: tiktoken.Encoding, tokens: list[int], pos: int, floor: int) -> int:
+    """Move a boundary back to the nearest token that starts a character (not below floor)."""
+    snapped = pos
+    while snapped > floor and snapped < len(tokens) and _starts_mid_char(enc, tokens[snapped]):
+        snapped -= 1
+    return snapped if snapped > floor else pos
+
+
+def _char_windows(text: str, window_chars: int) -> Iterator[str]:
+    """`text` in pieces of about `window_chars`, cut before whitespace where there is some."""
+    start = 0
+    while len(text) - start > window_chars:
+        end = start + window_chars
+        # tokens start at a space, so cutting there leaves the tokens either side intact
+        cut = max(text.rfind(" ", start + window_chars // 2, end), text.rfind("\n", start + window_chars // 2, end))
+        if cut <= start:
+            cut = end
+        yield text[start:cut]
+        start = cut
+    yield text[start:]
+
+
+def _iter_token_batches(enc: tiktoken.Encoding, texts: Iterable[str], window_chars: int) -> Iterator[list[int]]:
+    """
+    Token ids of `texts`, separator included, encoded `window_chars` worth at a
+    time; a text longer than that is encoded in character windows.
+    """
+    separator = enc.encode_ordinary(_TEXT_SEPARATOR)
+    batch: list[str] = []
+    # Whether each batch entry begins a text (and so follows a separator).
+    starts: list[bool] = []
+    batch_chars = 0
+    first = True
+
+    def _encode() -> Iterator[list[int]]:
+        nonlocal first
+        for starts_text, ids in zip(starts, enc.encode_ordinary_batch(batch)):
+            yield separator + ids if starts_text and not first else ids
+            first = False
+
+    for text in texts:
+        if not text:
+            continue
+        for i, piece in enumerate(_char_windows(text, window_chars)):
+            batch.append(piece)
+            starts.append(i == 0)
+            batch_chars += len(piece)
+            if batch_chars >= window_chars:
+                yield from _encode()
+                batch.clear()
+                starts.clear()
+                batch_chars = 0
+    if batch:
+        yield from _encode()
+
+
+def _chunking_limits(chunk_size: int | None, chunk_overlap: int | None) -> tuple[int, int]:
+    size = min(int(chunk_size or _EMBEDDING_CONFIG["chunk_size"]), int(_EMBEDDING_CONFIG["max_input_tokens"]))
+    overlap = int(_EMBEDDING_CONFIG["chunk_overlap"] if chunk_overlap is None else chunk_overlap)
+    if size <= 0 or overlap < 0 or overlap >= size:
+        raise ValueError(f"Invalid chunking config (chunk_size={size}, chunk_overlap={overlap}).")
+    return size, overlap
+
+
+def split_text_by_tokens(
+    texts: Iterable[str],
+    chunk_size: int | None = None,
+    chunk_overlap: int | None = None,
+    model: str | None = None,
+    section_title: str | None = None,
+) -> Iterator[TextChunk]:
+    """
+    Split a stream of texts into chunks of exactly `chunk_size` tokens (the last
+    one may be shorter) that overlap by `chunk_overlap` tokens.
+
+    Texts are tokenized once, in batches of about `split_window_chars`, and the
+    windows are cut from the token ids, so token_count needs no second encode.
+    Boundaries that would split a UTF-8 character are moved back to the start of
+    that character; chunks only ever get shorter, never longer than chunk_size,
+    which is capped at the model's max_input_tokens.
+    """
+    model = model or str(_EMBEDDING_CONFIG["model"])
+    size, overlap = _chunking_limits(chunk_size, chunk_overlap)
+    enc = get_encoding(model)
+    buffer: list[int] = []
+    # Start of the next window in `buffer`; consumed tokens are trimmed once per batch.
+    pos = 0
+    # Tokens from `pos` on that the previous chunk already covered.
+    covered = 0
+
+    def _chunk(start: int, end: int) -> TextChunk:
+        return TextChunk(text=enc.decode(buffer[start:end]), token_count=end - start, section_title=section_title)
+
+    for ids in _iter_token_batches(enc, texts, int(_INGEST_CONFIG["split_window_chars"])):
+        buffer.extend(ids)
+        # Keep one token past the window so the end boundary can be checked.
+        while len(buffer) - pos > size:
+            end = _snap_back(enc, buffer, pos + size, pos)
+            yield _chunk(pos, end)
+            start = end - overlap if end - pos > overlap else end
+            if start < end:
+                start = _snap_back(enc, buffer, start, pos)
+            covered = end - start
+            pos = start
+        del buffer[:pos]
+        pos = 0
+    if len(buffer) > covered:
+        yield _chunk(0, len(buffer))
+
+
+def _csv_line(cells: list[str]) -> str:
+    # One physical line per row: cell whitespace (incl. embedded newlines) collapses to a space.
+    out = io.StringIO()
+    csv.writer(out, lineterminator="").writerow([" ".join(cell.replace("\x00", "").split()) for cell in cells])
+    return out.getvalue()
+
+
+def iter_csv_chunks(
+    source: str | Path | BinaryIO,
+    chunk_size: int | None = None,
+    model: str | None = None,
+) -> Iterator[TextChunk]:
+    """
+    Stream a CSV file as chunks of whole rows: the header line followed by as many
+    rows as fit in `chunk_size` tokens.
+
+    Rows are read `batch_rows` at a time and token-counted with one batched encode
+    per batch; a chunk's token_count is the sum of its lines' counts. A row too
+    large for one chunk is split by tokens, each piece still under the header.
+    Empty rows are skipped. Header only (or empty) files yield nothing.
+    `source` is a path or a binary file object (consumed and closed).
+    """
+    model = model or str(_EMBEDDING_CONFIG["model"])
+    size, _ = _chunking_limits(chunk_size, 0)
+    enc = get_encoding(model)
+    newline_tokens = len(enc.encode_ordinary("\n"))
+    batch_rows = int(_CSV_INGEST_CONFIG["batch_rows"])
+
+    encoding = str(_CSV_INGEST_CONFIG["encoding"])
+    if isinstance(source, (str, Path)):
+        f = open(source, newline="", encoding=encoding, errors="replace")
+    else:
+        f = io.TextIOWrapper(source, newline="", encoding=encoding, errors="replace")
+    with f:
+        reader = csv.reader(f)
+        header_cells = next(reader, None)
+        if header_cells is None:
+            return
+        header = _csv_line(header_cells)
+        header_tokens = len(enc.encode_ordinary(header)) + newline_tokens
+        if header_tokens > size // 2:
+            # A header that eats most of every chunk isn't worth repeating.
+            logger.warning("CSV header too long to repeat per chunk", extra={"header_tokens": header_tokens})
+            header, header_tokens = "", 0
+        prefix = f"{header}\n" if header else ""
+
+        lines: list[str] = []
+        tokens = header_tokens
+
+        def _flush() -> TextChunk:
+            chunk = TextChunk(text=prefix + "\n".join(lines), token_count=tokens - (newline_tokens if lines else 0))
+            lines.clear()
+            return chunk
+
+        while True:
+            batch = [_csv_line(cells) for cells in islice(reader, batch_rows)]
+            if not batch:
+                break
+            batch = [line for line in batch if line.strip(", ")]
+            for line, ids in zip(batch, enc.encode_ordinary_batch(batch)):
+                line_tokens = len(ids) + newline_tokens
+                if lines and tokens + line_tokens > size:
+                    yield _flush()
+                    tokens = header_tokens
+                if header_tokens + line_tokens <= size:
+                    lines.append(line)
+                    tokens += line_tokens
+                    continue
+                # Oversize row: cut its token ids into header-sized-down windows.
+                window = size - header_tokens
+                for start in range(0, len(ids), window):
+                    piece = ids[start:start + window]
+                    yield TextChunk(text=prefix + enc.decode(piece), token_count=header_tokens + len(piece))
+        if lines:
+            yield _flush()
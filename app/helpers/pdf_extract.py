@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from pypdf import PdfReader
+from redis import Redis
+
+from app.config.rag_config import _PDF_EXTRACT_CONFIG
+from app.infra.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def file_sha256(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# This process's share of the CPUs for page pools (see set_pdf_cpu_share).
+_cpu_share: int | None = None
+# The PDF a pool process parses, opened once by its initializer.
+_pool_reader: PdfReader | None = None
+
+
+def set_pdf_cpu_share(cpus: int) -> None:
+    """
+    Cap the page pools this process starts at `cpus` workers. Executor
+    initializer for callers that parse several PDFs at once, so N of them
+    don't each start a pool per CPU; a share of 1 parses inline.
+    """
+    global _cpu_share
+    _cpu_share = max(1, int(cpus))
+
+
+def _extract_pages(reader: PdfReader, start: int, stop: int) -> list[str]:
+    # Same extraction PyPDFLoader used (plain mode, one string per page).
+    return [reader.pages[i].extract_text(extraction_mode="plain") or "" for i in range(start, stop)]
+
+
+def _open_pool_reader(path: str) -> None:
+    global _pool_reader
+    _pool_reader = PdfReader(path)
+
+
+def _extract_pool_range(start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop); runs in a pool process, on the reader its initializer opened."""
+    return _extract_pages(_pool_reader, start, stop)
+
+
+class _PageCache:
+    """`pdf_page:{sha256}:{page}` -> page text in Redis. Cache errors disable the cache, never the job."""
+
+    def __init__(self, redis: Redis | None, file_hash: str) -> None:
+        self._redis = redis
+        self._prefix = f"pdf_page:{file_hash}"
+        self._ttl_s = int(_PDF_EXTRACT_CONFIG["cache_ttl_s"])
+
+    def _key(self, page: int) -> str:
+        return f"{self._prefix}:{page}"
+
+    def _disable(self, action: str, error: Exception) -> None:
+        logger.warning("PDF page cache unavailable", extra={"action": action, "error": str(error)})
+        self._redis = None
+
+    def cached_pages(self, page_count: int) -> set[int]:
+        if self._redis is None:
+            return set()
+        batch_size = int(_PDF_EXTRACT_CONFIG["cache_batch_size"])
+        cached: set[int] = set()
+        try:
+            for first in range(0, page_count, batch_size):
+                pages = range(first, min(first + batch_size, page_count))
+                pipe = self._redis.pipeline(transaction=False)
+                for page in pages:
+                    pipe.exists(self._key(page))
+                cached.update(page for page, hit in zip(pages, pipe.execute()) if hit)
+        except Exception as e:
+            self._disable("exists", e)
+            return set()
+        return cached
+
+    def get(self, pages: list[int]) -> list[str | None]:
+        if self._redis is None or not pages:
+            return [None] * len(pages)
+        try:
+            return self._redis.mget([self._key(page) for page in pages])
+        except Exception as e:
+            self._disable("get", e)
+            return [None] * len(pages)
+
+    def put(self, start: int, texts: list[str]) -> None:
+        if self._redis is None:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for offset, text in enumerate(texts):
+                try:
+                    value = text.encode("utf-8")
+                except UnicodeEncodeError:
+                    # Lone surrogates from a broken text layer; such a page just isn't cached.
+                    continue
+                pipe.set(self._key(start + offset), value, ex=self._ttl_s)
+            pipe.execute()
+        except Exception as e:
+            self._disable("put", e)
+
+
+def _missing_ranges(page_count: int, cached: set[int], pages_per_task: int) -> list[range]:
+    """Runs of uncached pages, cut into ranges of at most pages_per_task."""
+    ranges: list[range] = []
+    start: int | None = None
+    for page in range(page_count + 1):
+        missing = page < page_count and page not in cached
+        if missing and start is None:
+            start = page
+        if start is not None and (not missing or page - start == pages_per_task):
+            ranges.append(range(start, page))
+            start = page if missing else None
+    return ranges
+
+
+def iter_pdf_pages(path: str | Path, redis: Redis | None = None) -> Iterator[str]:
+    """
+    Yield the text of every page of a PDF, in page order, as soon as it is available.
+
+    Uncached pages are split into ranges of `pages_per_task` and parsed on a
+    process pool (one process per CPU unless `workers` is set, capped by
+    set_pdf_cpu_share); each pool process opens the file once. At most two
+    ranges per worker are in flight, so memory stays bounded on large files.
+    Parsed pages are cached in Redis under the file's content hash, and cached
+    pages are never re-parsed. Logs pages/s when done.
+    """
+    path = str(path)
+    started = time.perf_counter()
+    # Also parses inline ranges and pages evicted from the cache.
+    reader = PdfReader(path)
+    page_count = len(reader.pages)
+
+    cache = _PageCache(None, "")
+    if _PDF_EXTRACT_CONFIG["cache_enabled"]:
+        cache = _PageCache(redis or get_redis(), file_sha256(path))
+    cached = cache.cached_pages(page_count)
+
+    pages_per_task = max(1, int(_PDF_EXTRACT_CONFIG["pages_per_task"]))
+    ranges = _missing_ranges(page_count, cached, pages_per_task)
+    missing_count = page_count - len(cached)
+    workers = int(_PDF_EXTRACT_CONFIG["workers"]) or os.cpu_count() or 1
+    if _cpu_share is not None:
+        workers = min(workers, _cpu_share)
+    workers = min(workers, len(ranges)) or 1
+    use_pool = missing_count >= int(_PDF_EXTRACT_CONFIG["min_pages_for_pool"]) and workers > 1
+
+    pool: ProcessPoolExecutor | None = None
+    if use_pool:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(str(_PDF_EXTRACT_CONFIG["mp_start_method"])),
+            initializer=_open_pool_reader,
+            initargs=(path,),
+        )
+    pending_ranges = deque(ranges)
+    in_flight: deque[tuple[range, Future[list[str]]]] = deque()
+
+    def _top_up() -> None:
+        while pool is not None and pending_ranges and len(in_flight) < workers * 2:
+            r = pending_ranges.popleft()
+            in_flight.append((r, pool.submit(_extract_pool_range, r.start, r.stop)))
+
+    def _next_range() -> tuple[range, list[str]]:
+        if pool is None:
+            r = pending_ranges.popleft()
+            return r, _extract_pages(reader, r.start, r.stop)
+        r, future = in_flight.popleft()
+        texts = future.result()
+        _top_up()
+        return r, texts
+
+    try:
+        _top_up()
+        parsed: dict[int, str] = {}
+        from_cache: dict[int, str | None] = {}
+        for page in range(page_count):
+            if page in cached:
+                if page not in from_cache:
+                    # Fetch cached text a block at a time, only as the stream reaches it.
+                    block = [p for p in range(page, min(page + pages_per_task * 8, page_count)) if p in cached]
+                    from_cache = dict(zip(block, cache.get(block)))
+                text = from_cache.pop(page)
+                if text is None:
+                    # Evicted since the existence check; parse it here.
+                    text = _extract_pages(reader, page, page + 1)[0]
+                yield text
+                continue
+            if page not in parsed:
+                r, texts = _next_range()
+                cache.put(r.start, texts)
+                parsed = dict(zip(r, texts))
+            yield parsed.pop(page)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "PDF pages extracted",
+        extra={
+            "path": path,
+            "pages": page_count,
+            "cached_pages": len(cached),
+            "parsed_pages": missing_count,
+            "workers": workers if use_pool else 1,
+            "elapsed_s": round(elapsed, 3),
+            "pages_per_s": round(page_count / elapsed, 2) if elapsed > 0 else 0.0,
+        },
+    )
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+from redis import Redis, RedisError
+
+from app.config.rag_config import _QUERY_EMBEDDING_CACHE_CONFIG
+from app.infra.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Cache-key form of a query; also the text that gets embedded, so equal keys mean equal vectors."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Two tiers in front of the embeddings API: a bounded in-process LRU, then
+    Redis holding little-endian float32 bytes with a TTL. Redis errors only
+    skip that tier for the call. Vectors are returned as lists (what the
+    retrieval code takes); they are stored as float32 arrays.
+    """
+
+    def __init__(self, redis: Redis | None = None, config: dict | None = None) -> None:
+        self._cfg = {**_QUERY_EMBEDDING_CACHE_CONFIG, **(config or {})}
+        # Raw-bytes client: the shared one decodes responses to str.
+        self._redis = redis if redis is not None else (
+            get_redis(decode_responses=False) if self._cfg["redis_enabled"] else None
+        )
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._counts = {"memory_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+
+    def _key(self, model: str, dimensions: int, normalized: str) -> str:
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{self._cfg['redis_key_prefix']}{model}:{dimensions}:{digest}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > int(self._cfg["memory_max_entries"]):
+                self._memory.popitem(last=False)
+
+    def _redis_get(self, key: str, dimensions: int) -> np.ndarray | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(key)
+        except RedisError as e:
+            self._count("redis_errors")
+            logger.warning("Query embedding cache unavailable", extra={"action": "get", "error": str(e)})
+            return None
+        if raw is None or len(raw) != 4 * dimensions:
+            return None
+        return np.frombuffer(raw, dtype="<f4")
+
+    def _redis_set(self, key: str, vector: np.ndarray) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.set(key, vector.astype("<f4").tobytes(), ex=int(self._cfg["redis_ttl_s"]))
+        except RedisError as e:
+            self._count("redis_errors")
+            logger.warning("Query embedding cache unavailable", extra={"action": "set", "error": str(e)})
+
+    def get_or_embed(
+        self, query: str, model: str, dimensions: int, embed: Callable[[str], list[float]]
+    ) -> list[float]:
+        """The cached vector for `query`, or embed(normalized query) stored in both tiers."""
+        normalized = normalize_query(query)
+        if not self._cfg["enabled"]:
+            return embed(normalized)
+        key = self._key(model, dimensions, normalized)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._counts["memory_hits"] += 1
+                return vector.tolist()
+        vector = self._redis_get(key, dimensions)
+        if vector is not None:
+            self._count("redis_hits")
+            self._remember(key, vector)
+            return vector.tolist()
+        self._count("misses")
+        values = embed(normalized)
+        vector = np.asarray(values, dtype=np.float32)
+        self._remember(key, vector)
+        self._redis_set(key, vector)
+        return values
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._memory)
+        lookups = counts["memory_hits"] + counts["redis_hits"] + counts["misses"]
+        hits = counts["memory_hits"] + counts["redis_hits"]
+        return {
+            **counts,
+            "lookups": lookups,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_hit_ratio": counts["memory_hits"] / lookups if lookups else 0.0,
+            "memory_entries": entries,
+        }
+
+
+_cache: QueryEmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Process-wide cache (the memory tier is per process, Redis is shared)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryEmbeddingCache()
+        return _cache
@@ -1,68 +1,409 @@
+import hashlib
 import logging
-from typing import cast
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Iterator, Protocol, Sequence
 from uuid import UUID
 
 import numpy as np
 import tiktoken
 from langchain_openai import OpenAIEmbeddings
-from pgvector.sqlalchemy import VECTOR
-from sqlalchemy import select
+from pgvector import Vector
+from pgvector.sqlalchemy import BIT, HALFVEC, VECTOR
+from sqlalchemy import (Integer, Text, cast, column, delete, func, select,
+                        true, tuple_, update, values)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from app.config.rag_config import _EMBEDDING_CONFIG
-from app.models.chat_db_models import Documents, Embeddings
+from app.config.rag_config import (_EMBEDDING_BATCH_CONFIG,
+                                   _EMBEDDING_CACHE_CONFIG, _EMBEDDING_CONFIG,
+                                   _RETRIEVAL_CONFIG, _VECTOR_STORAGE_CONFIG)
+from app.db.bulk import EmbeddingScope, copy_embeddings, vector_storage_mode
+from app.helpers.query_embedding_cache import get_query_embedding_cache
+from app.models.chat_db_models import Documents, EmbeddingCache, Embeddings
 
 logger = logging.getLogger(__name__)
 _ENCODINGS: dict[str, tiktoken.Encoding] = {}
+_QUERY_EMBEDDERS: dict[str, OpenAIEmbeddings] = {}
+_QUERY_EMBEDDERS_LOCK = threading.Lock()
 
 
-def create_embeddings(chat_session: Session, documents: list[Documents],source_id: str) -> None:
-  try:
-    #Guard against existing embeddings to prevent duplication and empty documents
-    existing = chat_session.scalars(
-    select(Embeddings.document_id)
-    .where(Embeddings.document_id.in_([d.id for d in documents]),Embeddings.deleted_at.is_(None))
-    ).all()
+@dataclass(slots=True)
+class EmbeddingStats:
+    """Per-source embedding throughput, returned by create_embeddings."""
+
+    chunks: int = 0
+    tokens: int = 0
+    batches: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    elapsed_s: float = 0.0
+
+    def add(self, other: "EmbeddingStats") -> None:
+        self.chunks += other.chunks
+        self.tokens += other.tokens
+        self.batches += other.batches
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.elapsed_s += other.elapsed_s
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.tokens / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+class EmbeddableDocument(Protocol):
+    id: UUID
+    content: str | None
+    token_count: int | None
+
+
+@dataclass(frozen=True, slots=True)
+class DocumentChunk:
+    """A persisted documents row, as returned by the bulk insert path (no ORM state)."""
+
+    id: UUID
+    content: str
+    token_count: int | None
 
-    existing_ids = set[UUID](existing)
-    documents = [d for d in documents if d.id not in existing_ids]
 
-    if not documents:
-        logger.info(f"No new documents to embed for source: {source_id}")
-        return
+# (content_hash, content, token_count) - plain tuples so committed batches don't
+# expire ORM state that later batches still need.
+_Chunk = tuple[str, str, int]
 
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small", dimensions=1536,
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _batch_by_tokens(chunks: list[_Chunk], max_tokens: int, max_size: int) -> Iterator[list[_Chunk]]:
+    """Pack chunks, in order, into batches bounded by total tokens and input count."""
+    batch: list[_Chunk] = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = chunk[2]
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_size):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def _cache_key_filter():
+    return (
+        EmbeddingCache.embedding_model == _EMBEDDING_CONFIG["model"],
+        EmbeddingCache.embedding_version == _EMBEDDING_CONFIG["version"],
+        EmbeddingCache.dimensions == _EMBEDDING_CONFIG["dimensions"],
     )
-    vectors = embeddings.embed_documents([cast(str, d.content) for d in documents])
-    for i, vector in enumerate[list[float]](vectors):
-        chat_session.add(
-            Embeddings(
-                document_id=documents[i].id,
-                embedding=vector,
-            )
+
+
+def _lookup_cached_embeddings(chat_session: Session, hashes: list[str]) -> dict[str, list[float]]:
+    """Fetch cached vectors for `hashes` and bump their last_used_at."""
+    found: dict[str, list[float]] = {}
+    step = int(_EMBEDDING_CACHE_CONFIG["lookup_batch_size"])
+    for i in range(0, len(hashes), step):
+        window = hashes[i:i + step]
+        rows = chat_session.execute(
+            select(EmbeddingCache.content_hash, EmbeddingCache.embedding)
+            .where(*_cache_key_filter(), EmbeddingCache.content_hash.in_(window))
+        ).all()
+        if not rows:
+            continue
+        found.update((h, v) for h, v in rows)
+        chat_session.execute(
+            update(EmbeddingCache)
+            .where(*_cache_key_filter(), EmbeddingCache.content_hash.in_([h for h, _ in rows]))
+            .values(last_used_at=func.now())
         )
-        documents[i].is_active = True
+    return found
+
+
+def _store_cached_embeddings(chat_session: Session, batch: list[_Chunk], vectors: list[list[float]]) -> None:
+    chat_session.execute(
+        pg_insert(EmbeddingCache)
+        .values([
+            {
+                "embedding_model": _EMBEDDING_CONFIG["model"],
+                "embedding_version": _EMBEDDING_CONFIG["version"],
+                "dimensions": _EMBEDDING_CONFIG["dimensions"],
+                "content_hash": chunk[0],
+                "embedding": vector,
+            }
+            for chunk, vector in zip(batch, vectors)
+        ])
+        .on_conflict_do_nothing(index_elements=[
+            EmbeddingCache.embedding_model,
+            EmbeddingCache.embedding_version,
+            EmbeddingCache.dimensions,
+            EmbeddingCache.content_hash,
+        ])
+    )
+
+
+def evict_embedding_cache(chat_session: Session) -> int:
+    """Trim embedding_cache to `max_entries`, least recently used first. Returns rows evicted."""
+    max_entries = int(_EMBEDDING_CACHE_CONFIG["max_entries"])
+    total = chat_session.scalar(select(func.count()).select_from(EmbeddingCache)) or 0
+    excess = total - max_entries
+    if excess <= 0:
+        return 0
+    oldest = (
+        select(EmbeddingCache.embedding_model, EmbeddingCache.embedding_version,
+               EmbeddingCache.dimensions, EmbeddingCache.content_hash)
+        .order_by(EmbeddingCache.last_used_at)
+        .limit(excess)
+    )
+    result = chat_session.execute(
+        delete(EmbeddingCache).where(
+            tuple_(EmbeddingCache.embedding_model, EmbeddingCache.embedding_version,
+                   EmbeddingCache.dimensions, EmbeddingCache.content_hash).in_(oldest)
+        )
+    )
     chat_session.commit()
-    logger.info(f"Embeddings created for source: {source_id}")
-  except Exception:
-    logger.exception(
-      "Failed to create embeddings",
-      extra={"source_id": str(source_id)},
+    evicted = int(getattr(result, "rowcount", 0) or 0)
+    logger.info("Embedding cache evicted", extra={"evicted": evicted, "max_entries": max_entries})
+    return evicted
+
+
+def create_embeddings(
+    chat_session: Session,
+    documents: Sequence[EmbeddableDocument],
+    source_id: str,
+    scope: EmbeddingScope,
+    activate: bool = True,
+) -> EmbeddingStats:
+    """
+    - Skips documents that already have a live embedding.
+    - Stamps each embedding with `scope` (the documents' bot/org/model/version).
+    - With activate=False the documents (and their embeddings) stay inactive (staged re-training rows are swapped in later).
+    - Reuses vectors from embedding_cache for chunk text embedded before (same model/version/dimensions).
+    - Packs the remaining unique texts into token-budgeted batches and embeds up to `max_concurrency` batches at once.
+    - Commits each batch (embeddings + is_active + cache rows) as soon as it comes back.
+    """
+    stats = EmbeddingStats()
+    try:
+        #Guard against existing embeddings to prevent duplication and empty documents
+        existing = chat_session.scalars(
+            select(Embeddings.document_id)
+            .where(Embeddings.document_id.in_([d.id for d in documents]), Embeddings.deleted_at.is_(None))
+        ).all()
+
+        existing_ids = set[UUID](existing)
+        # Identical chunk text is embedded once and fanned out to every document carrying it.
+        doc_ids_by_hash: dict[str, list[UUID]] = {}
+        chunks: list[_Chunk] = []
+        for d in documents:
+            if d.id in existing_ids:
+                continue
+            text = d.content or ""
+            h = content_hash(text)
+            if h not in doc_ids_by_hash:
+                doc_ids_by_hash[h] = []
+                tokens = d.token_count if d.token_count is not None else count_tokens(text, _EMBEDDING_CONFIG["model"])
+                chunks.append((h, text, tokens))
+            doc_ids_by_hash[h].append(d.id)
+
+        if not chunks:
+            logger.info(f"No new documents to embed for source: {source_id}")
+            return stats
+
+        started = time.perf_counter()
+
+        def _commit_vectors(batch: list[_Chunk], vectors: list[list[float]]) -> int:
+            doc_ids = [doc_id for chunk in batch for doc_id in doc_ids_by_hash[chunk[0]]]
+            copy_embeddings(
+                chat_session,
+                (
+                    (doc_id, vector)
+                    for chunk, vector in zip(batch, vectors)
+                    for doc_id in doc_ids_by_hash[chunk[0]]
+                ),
+                scope,
+                is_active=activate,
+            )
+            if activate:
+                chat_session.execute(
+                    update(Documents)
+                    .where(Documents.id.in_(doc_ids))
+                    .values(is_active=True)
+                )
+            chat_session.commit()
+            return len(doc_ids)
+
+        if _EMBEDDING_CACHE_CONFIG["enabled"]:
+            cached = _lookup_cached_embeddings(chat_session, [c[0] for c in chunks])
+            if cached:
+                hits = [c for c in chunks if c[0] in cached]
+                stats.cache_hits = _commit_vectors(hits, [cached[c[0]] for c in hits])
+                stats.chunks += stats.cache_hits
+                chunks = [c for c in chunks if c[0] not in cached]
+            stats.cache_misses = sum(len(doc_ids_by_hash[c[0]]) for c in chunks)
+
+        if chunks:
+            embeddings = OpenAIEmbeddings(
+                model=_EMBEDDING_CONFIG["model"], dimensions=_EMBEDDING_CONFIG["dimensions"],
+            )
+            batches = _batch_by_tokens(
+                chunks,
+                max_tokens=int(_EMBEDDING_BATCH_CONFIG["max_batch_tokens"]),
+                max_size=int(_EMBEDDING_BATCH_CONFIG["max_batch_size"]),
+            )
+            max_concurrency = max(1, int(_EMBEDDING_BATCH_CONFIG["max_concurrency"]))
+
+            # Only provider calls run on the pool; the session stays on this thread.
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                in_flight: dict[Future[list[list[float]]], list[_Chunk]] = {}
+
+                def _submit_next() -> bool:
+                    batch = next(batches, None)
+                    if batch is None:
+                        return False
+                    in_flight[pool.submit(embeddings.embed_documents, [c[1] for c in batch])] = batch
+                    return True
+
+                while len(in_flight) < max_concurrency and _submit_next():
+                    pass
+
+                try:
+                    while in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            batch = in_flight.pop(future)
+                            vectors = future.result()
+                            if _EMBEDDING_CACHE_CONFIG["enabled"]:
+                                _store_cached_embeddings(chat_session, batch, vectors)
+                            stats.chunks += _commit_vectors(batch, vectors)
+                            stats.batches += 1
+                            stats.tokens += sum(c[2] for c in batch)
+                            _submit_next()
+                except Exception:
+                    for future in in_flight:
+                        future.cancel()
+                    raise
+
+        stats.elapsed_s = time.perf_counter() - started
+        logger.info(
+            f"Embeddings created for source: {source_id}",
+            extra={
+                "source_id": str(source_id),
+                "chunks": stats.chunks,
+                "tokens": stats.tokens,
+                "batches": stats.batches,
+                "cache_hits": stats.cache_hits,
+                "cache_misses": stats.cache_misses,
+                "elapsed_s": round(stats.elapsed_s, 3),
+                "chunks_per_s": round(stats.chunks_per_s, 2),
+                "tokens_per_s": round(stats.tokens_per_s, 2),
+            },
+        )
+        return stats
+    except Exception:
+        logger.exception(
+            "Failed to create embeddings",
+            extra={"source_id": str(source_id), "chunks_committed": stats.chunks},
+        )
+        raise ValueError("Failed to create embeddings. Please retry.")
+
+
+def set_ann_search_params(
+    chat_session: Session,
+    k: int,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    iterative_scan: str | None = None,
+) -> None:
+    """
+    Transaction-local (SET LOCAL) pgvector search knobs for the next ANN query;
+    defaults come from _RETRIEVAL_CONFIG.
+    """
+    ef = max(int(ef_search or _RETRIEVAL_CONFIG["ef_search"]), k)
+    settings = {"hnsw.ef_search": ef}
+    iterative = iterative_scan if iterative_scan is not None else _RETRIEVAL_CONFIG["iterative_scan"]
+    if iterative:
+        settings["hnsw.iterative_scan"] = iterative
+    probes = probes or _RETRIEVAL_CONFIG["probes"]
+    if probes:
+        settings["ivfflat.probes"] = int(probes)
+    # set_config(..., true) is SET LOCAL with bind parameters.
+    chat_session.execute(
+        select(*(func.set_config(name, str(value), True) for name, value in settings.items()))
     )
-    raise ValueError("Failed to create embeddings. Please retry.")
-  
-def retrieve_closest_embeddings(chat_session: Session, query:list[float], bot_id: UUID, k: int=5, threshold:float = 0.5,CURRENT_MODEL: str=_EMBEDDING_CONFIG["model"], CURRENT_VERSION: str=_EMBEDDING_CONFIG["version"]):
+
+
+def ann_candidate_count(k: int, version: str) -> int:
+    """Rows the index scan must return: k, or k * oversample for the binary first pass."""
+    if vector_storage_mode(version) == "binary":
+        return k * max(1, int(_VECTOR_STORAGE_CONFIG["binary_oversample"]))
+    return k
+
+
+def live_embeddings_filter(bot_id: UUID, model: str, version: str) -> tuple:
+    """A bot's searchable embeddings; matches embeddings_bot_live_idx and the HNSW partial indexes."""
+    return (
+        Embeddings.bot_id == bot_id,
+        Embeddings.is_active.is_(True),
+        Embeddings.embedding_model == model,
+        Embeddings.embedding_version == version,
+        Embeddings.deleted_at.is_(None),
+    )
+
+
+def retrieval_statement(query: list[float], bot_id: UUID, k: int, threshold: float, model: str, version: str):
+    """
+    Top-k by cosine distance for one bot, shaped so the HNSW index drives it:
+    the inner query is a bare ORDER BY distance LIMIT k (no distance predicate,
+    which an index scan can't use) that filters on embeddings' own copies of the
+    document columns, so no candidate is lost to a join. It is materialized so
+    the threshold and the final ordering (exact, since iterative scans may
+    return slightly out of order) apply to those k rows only; documents are
+    joined for content last.
+
+    The searched column follows the version's storage mode. For "binary" the
+    index scan ranks by Hamming distance over the sign bits and returns
+    ann_candidate_count() rows, which are rescored by halfvec cosine distance.
+
+    Rows are (Embeddings, Documents, distance).
+    """
+    live = live_embeddings_filter(bot_id, model, version)
+    mode = vector_storage_mode(version)
+    if mode == "binary":
+        bits = "".join("1" if x > 0 else "0" for x in query)
+        candidates = (
+            select(Embeddings.id, Embeddings.embedding_half)
+            .where(*live)
+            .order_by(Embeddings.embedding_bits.hamming_distance(bits))
+            .limit(ann_candidate_count(k, version))
+            .cte("candidates")
+            .prefix_with("MATERIALIZED")
+        )
+        distance = candidates.c.embedding_half.cosine_distance(query)
+        nearest = select(candidates.c.id.label("embedding_id"), distance.label("distance"))
+    else:
+        column = Embeddings.embedding_half if mode == "halfvec" else Embeddings.embedding
+        distance = column.cosine_distance(query)
+        nearest = select(Embeddings.id.label("embedding_id"), distance.label("distance")).where(*live)
+    nearest = nearest.order_by(distance).limit(k).cte("nearest").prefix_with("MATERIALIZED")
+    return (
+        select(Embeddings, Documents, nearest.c.distance)
+        .join(nearest, nearest.c.embedding_id == Embeddings.id)
+        .join(Documents, Embeddings.document_id == Documents.id)
+        .where(nearest.c.distance <= threshold)
+        .order_by(nearest.c.distance, Documents.chunk_index)
+    )
+
+
+def retrieve_closest_embeddings(chat_session: Session, query:list[float], bot_id: UUID, k: int=5, threshold:float = 0.5,CURRENT_MODEL: str=_EMBEDDING_CONFIG["model"], CURRENT_VERSION: str=_EMBEDDING_CONFIG["version"], ef_search: int | None = None, probes: int | None = None):
   try: 
-    distance = Embeddings.embedding.cosine_distance(query)
-    stmnt =  select(Embeddings,Documents).join(Documents, Embeddings.document_id == Documents.id).where(
-        Documents.bot_id == bot_id,
-        Documents.is_active.is_(True),
-        Documents.deleted_at.is_(None),
-        Documents.embedding_model == CURRENT_MODEL,
-        Documents.embedding_version == CURRENT_VERSION,
-        distance <= threshold
-      ).order_by(distance,Documents.chunk_index).limit(k)
+    set_ann_search_params(chat_session, ann_candidate_count(k, CURRENT_VERSION), ef_search=ef_search, probes=probes)
+    stmnt = retrieval_statement(query, bot_id, k, threshold, CURRENT_MODEL, CURRENT_VERSION)
     similar_embeddings_with_documents = chat_session.execute(stmnt).all()
     return similar_embeddings_with_documents
   except Exception as e:
@@ -70,22 +411,119 @@ def retrieve_closest_embeddings(chat_session: Session, query:list[float], bot_id
     raise ValueError("Failed to retrieve closest embeddings. Please retry.")
 
 
+def batch_retrieval_statement(
+    queries: Sequence[list[float]], bot_id: UUID, k: int, threshold: float, model: str, version: str
+):
+    """
+    retrieval_statement for many query vectors in one statement: the queries
+    are a VALUES list and each one drives its own top-k index scan through a
+    LATERAL subquery (same filters, same storage-mode handling), so N queries
+    cost one round trip and one plan.
+
+    Vectors are sent as text and cast inside the lateral, since the type of an
+    untyped VALUES column would otherwise be inferred as text.
+    Rows are (query_index, Embeddings, Documents, distance), ordered by
+    query_index, then distance and chunk_index.
+    """
+    dims = len(queries[0])
+    mode = vector_storage_mode(version)
+    live = live_embeddings_filter(bot_id, model, version)
+    columns = [column("query_index", Integer), column("embedding", Text)]
+    rows = [(i, Vector(q).to_text()) for i, q in enumerate(queries)]
+    if mode == "binary":
+        columns.append(column("bits", Text))
+        rows = [(i, vec, "".join("1" if x > 0 else "0" for x in q)) for (i, vec), q in zip(rows, queries)]
+    query_values = values(*columns, name="queries").data(rows)
+
+    if mode == "binary":
+        candidates = (
+            select(Embeddings.id, Embeddings.embedding_half)
+            .where(*live)
+            .order_by(Embeddings.embedding_bits.hamming_distance(cast(query_values.c.bits, BIT(dims))))
+            .limit(ann_candidate_count(k, version))
+            .correlate(query_values)
+            .subquery("candidates")
+        )
+        distance = candidates.c.embedding_half.cosine_distance(cast(query_values.c.embedding, HALFVEC(dims)))
+        nearest = select(candidates.c.id.label("embedding_id"), distance.label("distance"))
+    elif mode == "halfvec":
+        distance = Embeddings.embedding_half.cosine_distance(cast(query_values.c.embedding, HALFVEC(dims)))
+        nearest = select(Embeddings.id.label("embedding_id"), distance.label("distance")).where(*live)
+    else:
+        distance = Embeddings.embedding.cosine_distance(cast(query_values.c.embedding, VECTOR(dims)))
+        nearest = select(Embeddings.id.label("embedding_id"), distance.label("distance")).where(*live)
+    # Correlate only to the VALUES list: the outer query joins embeddings too.
+    nearest = nearest.correlate(query_values).order_by(distance).limit(k).lateral("nearest")
+    return (
+        select(query_values.c.query_index, Embeddings, Documents, nearest.c.distance)
+        .select_from(query_values)
+        .join(nearest, true())
+        .join(Embeddings, Embeddings.id == nearest.c.embedding_id)
+        .join(Documents, Embeddings.document_id == Documents.id)
+        .where(nearest.c.distance <= threshold)
+        .order_by(query_values.c.query_index, nearest.c.distance, Documents.chunk_index)
+    )
+
+
+def retrieve_closest_embeddings_batch(
+    chat_session: Session,
+    queries: Sequence[list[float]],
+    bot_id: UUID,
+    k: int = 5,
+    threshold: float = 0.5,
+    CURRENT_MODEL: str = _EMBEDDING_CONFIG["model"],
+    CURRENT_VERSION: str = _EMBEDDING_CONFIG["version"],
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> list[list[tuple]]:
+    """
+    retrieve_closest_embeddings for several query vectors in one round trip.
+    Returns one list of (Embeddings, Documents, distance) per query, in order.
+    """
+    if not queries:
+        return []
+    try:
+        set_ann_search_params(chat_session, ann_candidate_count(k, CURRENT_VERSION), ef_search=ef_search, probes=probes)
+        stmt = batch_retrieval_statement(queries, bot_id, k, threshold, CURRENT_MODEL, CURRENT_VERSION)
+        results: list[list[tuple]] = [[] for _ in queries]
+        for query_index, embedding, document, distance in chat_session.execute(stmt):
+            results[query_index].append((embedding, document, distance))
+        return results
+    except Exception as e:
+        logger.exception("Failed to retrieve closest embeddings", extra={"queries": len(queries), "error": str(e)})
+        raise ValueError("Failed to retrieve closest embeddings. Please retry.")
+
+
+def _query_embedder(model: str) -> OpenAIEmbeddings:
+    """One client per model for the process, so its HTTP connection pool is reused across queries."""
+    with _QUERY_EMBEDDERS_LOCK:
+        embedder = _QUERY_EMBEDDERS.get(model)
+        if embedder is None:
+            embedder = OpenAIEmbeddings(model=model, dimensions=_EMBEDDING_CONFIG["dimensions"])
+            _QUERY_EMBEDDERS[model] = embedder
+        return embedder
+
+
 def embed_query(query: str, CURRENT_MODEL: str=_EMBEDDING_CONFIG["model"]):
   try:
-    embeddings = OpenAIEmbeddings(
-    model=CURRENT_MODEL,dimensions=_EMBEDDING_CONFIG["dimensions"])
-    query_vector = embeddings.embed_query(query)
-    return query_vector
+    return get_query_embedding_cache().get_or_embed(
+      query, CURRENT_MODEL, int(_EMBEDDING_CONFIG["dimensions"]),
+      lambda text: _query_embedder(CURRENT_MODEL).embed_query(text),
+    )
   except Exception as e:
     logger.exception("Failed to embed query",extra={"error": str(e)})  
     raise ValueError("Failed to embed query. Please retry.")
 
-def count_tokens(text: str, model: str) -> int:
+def get_encoding(model: str) -> tiktoken.Encoding:
     enc = _ENCODINGS.get(model)
     if enc is None:
         enc = tiktoken.encoding_for_model(model)
         _ENCODINGS[model] = enc
-    return len(enc.encode(text))
+    return enc
+
+
+def count_tokens(text: str, model: str) -> int:
+    return len(get_encoding(model).encode(text))
 
 
 def cosine_similarity(a: list[float], b: list[float]) -> float:
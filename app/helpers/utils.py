@@ -1,15 +1,124 @@
 import re
 import unicodedata
+from typing import Iterable, Iterator
+
 from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
 from app.infra.r2_storage import (r2_delete_object, r2_object_exists,
                                   r2_presigned_get_url)
 
+# Tags removed with everything inside them (non-content + boilerplate containers).
+_REMOVED_TAGS = frozenset((
+    "script", "style", "noscript", "svg", "img", "iframe", "canvas",
+    "nav", "footer", "header", "aside", "form",
+))
+# "banner/modal/cookie/login" sections, matched against "id class role".
+_JUNK_RE = re.compile(
+    r"(cookie|consent|gdpr|banner|modal|popup|subscribe|sign[\s_-]?in|sign[\s_-]?up|login|register|advert|ads|promo|footer|header|nav|sidebar)",
+    re.IGNORECASE,
+)
+# BeautifulSoup keeps these strings out of get_text(); so do we.
+_HIDDEN_TEXT_TAGS = frozenset(("template", "rt", "rp"))
+_PRESERVE_WHITESPACE_TAGS = frozenset(("pre", "textarea"))
+_ASCII_SPACES = {ord(c): None for c in " \n\t\x0c\r"}
+_HTML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
+
+def _is_removed(el: etree._Element) -> bool:
+    if el.tag in _REMOVED_TAGS:
+        return True
+    attrs = el.attrib
+    ident = " ".join([
+        attrs.get("id") or "",
+        " ".join((attrs.get("class") or "").split()),
+        attrs.get("role") or "",
+    ])
+    return _JUNK_RE.search(ident) is not None
+
+
+def _is_kept(el: etree._Element) -> bool:
+    return not _is_removed(el) and not any(_is_removed(a) for a in el.iterancestors())
+
+
+def _iter_kept_strings(root: etree._Element) -> Iterator[str]:
+    """
+    Text nodes under `root` in document order, skipping removed subtrees, the way
+    BeautifulSoup's html.parser tree would hold them: whitespace-only strings
+    collapse to "\n" (or " ") outside <pre>/<textarea>.
+    """
+    preserve = sum(1 for a in root.iterancestors() if a.tag in _PRESERVE_WHITESPACE_TAGS)
+
+    def _string(text: str) -> str:
+        if preserve or text.translate(_ASCII_SPACES):
+            return text
+        return "\n" if "\n" in text else " "
+
+    if root.tag in _PRESERVE_WHITESPACE_TAGS:
+        preserve += 1
+    if root.text:
+        yield _string(root.text)
+    stack = [(root, iter(root))]
+    while stack:
+        el, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if el.tag in _PRESERVE_WHITESPACE_TAGS:
+                preserve -= 1
+            if stack and el.tail:
+                yield _string(el.tail)
+            continue
+        # Comments/processing instructions have a non-str tag; only their tail is text.
+        if isinstance(child.tag, str) and child.tag not in _HIDDEN_TEXT_TAGS and not _is_removed(child):
+            if child.tag in _PRESERVE_WHITESPACE_TAGS:
+                preserve += 1
+            if child.text:
+                yield _string(child.text)
+            stack.append((child, iter(child)))
+        elif child.tail:
+            yield _string(child.tail)
+
 
 def extract_main_text_from_html(html: str) -> str:
     """
     - Remove boilerplate elements (nav/footer/header/aside/form/scripts).
     - Prefer <main> or <article>, else fall back to <body>.
     - Convert to text with newlines to preserve paragraph breaks.
+
+    lxml-backed; same output as `extract_main_text_from_html_reference` (checked
+    against a golden corpus by app/scripts/bench_html_extract.py) without building
+    a BeautifulSoup tree or mutating one. Removed elements are skipped in a single
+    walk instead of being decomposed. Badly malformed markup can still come out
+    slightly differently, since libxml2 and html.parser repair it differently.
+    """
+    if not html or not html.strip():
+        return ""
+    try:
+        # libxml2 turns NULs into U+FFFD; the cleaner drops them either way.
+        data = html.replace("\x00", "").encode("utf-8", errors="replace")
+        doc = lxml_html.document_fromstring(data, parser=_HTML_PARSER)
+    except etree.ParserError:
+        return ""
+
+    root = None
+    for tag in ("main", "article", "body"):
+        root = next((el for el in doc.iter(tag) if _is_kept(el)), None)
+        if root is not None:
+            break
+    if root is None:
+        if _is_removed(doc):
+            return ""
+        root = doc
+    elif any(a.tag in _HIDDEN_TEXT_TAGS for a in root.iterancestors()):
+        return ""
+    return "\n".join(_iter_kept_strings(root)).strip()
+
+
+def extract_main_text_from_html_reference(html: str) -> str:
+    """
+    Original BeautifulSoup (html.parser) implementation of
+    `extract_main_text_from_html`; kept as the reference for parity checks.
     """
     soup = BeautifulSoup(html, "html.parser")
 
@@ -42,7 +151,97 @@ def extract_main_text_from_html(html: str) -> str:
     return text.strip()
 
 
+def extract_all_text_from_html(html: str) -> str:
+    """
+    - Fallback for pages where `extract_main_text_from_html` comes up short.
+    - Keeps every visible element (no boilerplate heuristics); only scripts/styles are dropped.
+    - Runs over the same body, so the page is never downloaded twice.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+    return soup.get_text("\n").strip()
+
+
+# Precompiled once for iter_clean_lines (clean_scraped_text_reference recompiles per call).
+_SPACE_RUN_RE = re.compile(r"[ \t]+")
+_PUNCT_ONLY_RE = re.compile(r"[\W_]+")
+
+
+def iter_clean_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Single-pass version of clean_scraped_text over lines (input split on "\n",
+    without the newline); yields the cleaned lines, "" for a paragraph break.
+
+    Each line is normalized once: NULs dropped, NFKC, a CRLF's "\r" dropped and
+    lone "\r" treated as line breaks, zero-width chars removed, spaces/tabs
+    collapsed, then stripped. Short (< 3 chars) and punctuation-only lines are
+    dropped, runs of blank lines become one "" and leading/trailing blanks are
+    never emitted. "\n".join() of the output equals clean_scraped_text_reference.
+    """
+    normalize = unicodedata.normalize
+    collapse_spaces = _SPACE_RUN_RE.sub
+    punct_only = _PUNCT_ONLY_RE.fullmatch
+    blank_pending = False
+    emitted = False
+    for raw in lines:
+        ascii_only = raw.isascii()
+        if "\x00" in raw:
+            raw = raw.replace("\x00", "")
+        if not ascii_only:
+            raw = normalize("NFKC", raw)
+        if "\r" in raw:
+            if raw[-1] == "\r":
+                raw = raw[:-1]
+            parts = raw.split("\r")
+        else:
+            parts = (raw,)
+        for line in parts:
+            if not ascii_only:
+                line = line.replace("\u200b", "").replace("\ufeff", "")
+            if "\t" in line or "  " in line:
+                line = collapse_spaces(" ", line)
+            line = line.strip()
+            if not line:
+                blank_pending = emitted
+                continue
+            if len(line) < 3 or punct_only(line):
+                continue
+            if blank_pending:
+                yield ""
+                blank_pending = False
+            emitted = True
+            yield line
+
+
 def clean_scraped_text(text: str) -> str:
+    return "\n".join(iter_clean_lines(text.split("\n")))
+
+
+def iter_clean_text_blocks(lines: Iterable[str], block_chars: int) -> Iterator[str]:
+    """
+    iter_clean_lines output regrouped into texts of about `block_chars`, cut at
+    a paragraph break so that "\n\n".join() of the blocks equals
+    clean_scraped_text of the whole input. A block that reaches 4x
+    `block_chars` without a paragraph break is cut at the next line instead.
+    """
+    block: list[str] = []
+    size = 0
+    for line in iter_clean_lines(lines):
+        if (not line and size >= block_chars) or (line and size >= 4 * block_chars):
+            yield "\n".join(block)
+            block.clear()
+            size = 0
+            if not line:
+                continue
+        block.append(line)
+        size += len(line) + 1
+    if block:
+        yield "\n".join(block)
+
+
+def clean_scraped_text_reference(text: str) -> str:
+    """Original multi-pass implementation of clean_scraped_text; kept as the reference for parity checks."""
     text = text.replace("\x00", "")
     # normalize unicode + newlines
     text = unicodedata.normalize("NFKC", text)
@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from uuid import UUID, uuid4
+
+import numpy as np
+from redis import Redis, RedisError
+from sqlalchemy.orm import Session
+
+from app.config.rag_config import _EMBEDDING_CONFIG, _VECTOR_CACHE_CONFIG
+from app.helpers.rag import (retrieve_closest_embeddings,
+                             retrieve_closest_embeddings_batch)
+from app.helpers.vector_snapshot import BotVectors, load_bot_vectors, open_snapshot
+from app.infra.redis_client import redis_client
+from app.models.chat_db_models import Documents
+
+logger = logging.getLogger(__name__)
+
+# Listener liveness: PING when idle this long, reconnect if no PONG within twice that.
+_PING_INTERVAL_S = 10.0
+
+
+def _generation_key(bot_id: UUID | str) -> str:
+    return f"{_VECTOR_CACHE_CONFIG['generation_key_prefix']}{bot_id}"
+
+
+def next_bot_generation(bot_id: UUID | str, redis: Redis | None = None) -> int:
+    """INCR a bot's generation without announcing it (see publish_bot_generation)."""
+    return int((redis or redis_client).incr(_generation_key(bot_id)))
+
+
+def publish_bot_generation(bot_id: UUID | str, generation: int, redis: Redis | None = None) -> None:
+    """Tell every API process that `bot_id` moved to `generation`, dropping its cached copy."""
+    (redis or redis_client).publish(str(_VECTOR_CACHE_CONFIG["channel"]), f"{bot_id}:{generation}")
+
+
+def bump_bot_generation(bot_id: UUID | str, redis: Redis | None = None) -> int:
+    """
+    Mark a bot's retrievable chunks as changed: INCR its generation and publish
+    it. Call after the change is committed.
+    """
+    generation = next_bot_generation(bot_id, redis)
+    publish_bot_generation(bot_id, generation, redis)
+    return generation
+
+
+def get_bot_generation(bot_id: UUID | str, redis: Redis | None = None) -> int:
+    """Current generation of a bot (0 if it was never bumped)."""
+    value = (redis or redis_client).get(_generation_key(bot_id))
+    return int(value) if value is not None else 0
+
+
+def get_bot_generation_stamp(bot_id: UUID | str, redis: Redis | None = None) -> tuple[str, int]:
+    """
+    (epoch, generation) of a bot in one round trip. The epoch is a random id
+    created on first read, so it changes whenever Redis loses its keys and the
+    generation counters restart; anything stored by generation outside Redis
+    must be keyed by both.
+    """
+    epoch_key = str(_VECTOR_CACHE_CONFIG["epoch_key"])
+    pipe = (redis or redis_client).pipeline(transaction=False)
+    pipe.set(epoch_key, uuid4().hex, nx=True)
+    pipe.get(epoch_key)
+    pipe.get(_generation_key(bot_id))
+    _, epoch, value = pipe.execute()
+    epoch = epoch.decode() if isinstance(epoch, bytes) else str(epoch)
+    return epoch, int(value) if value is not None else 0
+
+
+@dataclass(frozen=True, slots=True)
+class RetrievedChunk:
+    """One retrieval hit, independent of whether it came from the cache or the database."""
+
+    document_id: UUID
+    source_id: UUID
+    chunk_index: int
+    content: str
+    section_title: str | None
+    distance: float
+
+
+class BotVectorCache:
+    """
+    Per-bot brute-force search over L2-normalized float32 matrices, loaded
+    lazily and kept under an LRU byte budget. A bot is mapped from its
+    snapshot file for the current generation when the worker wrote one, else
+    read from the chat DB. Cosine distance is 1 - dot product, the same value
+    pgvector's <=> returns.
+
+    Staleness is tracked per bot by the Redis generation counter: entries
+    remember the generation they were loaded at, and a background subscriber
+    drops them when a newer one is published. While the subscriber is not
+    connected every search re-reads the generation instead, and if Redis is
+    unreachable search() returns None so callers use the database.
+    """
+
+    def __init__(self, redis: Redis | None = None, config: dict | None = None) -> None:
+        self._redis = redis or redis_client
+        self._cfg = {**_VECTOR_CACHE_CONFIG, **(config or {})}
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[UUID, str, str], BotVectors] = OrderedDict()
+        self._load_locks: dict[tuple[UUID, str, str], threading.Lock] = {}
+        self._bytes = 0
+        # Newest generation seen per bot (from loads and published bumps).
+        self._generations: dict[UUID, int] = {}
+        self._listening = False
+        self._listener: threading.Thread | None = None
+        self._stats = {"hits": 0, "loads": 0, "snapshot_loads": 0, "fallbacks": 0}
+
+    # ---- invalidation ----
+
+    def _start_listener(self) -> None:
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name="vector-cache-invalidation", daemon=True)
+        self._listener.start()
+
+    def _listen(self) -> None:
+        delay = 1.0
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(str(self._cfg["channel"]))
+                # Bumps published while we were not subscribed are lost.
+                self.invalidate()
+                self._listening = True
+                delay = 1.0
+                last_seen = time.monotonic()
+                pinged = False
+                while True:
+                    message = pubsub.get_message(timeout=_PING_INTERVAL_S)
+                    now = time.monotonic()
+                    if message is None:
+                        if now - last_seen > 2 * _PING_INTERVAL_S:
+                            raise RedisError("no reply to PING")
+                        if not pinged:
+                            pubsub.ping()
+                            pinged = True
+                        continue
+                    last_seen, pinged = now, False
+                    if message["type"] == "message":
+                        self._on_bump(message["data"])
+            except Exception as e:
+                logger.warning(
+                    "Vector cache invalidation listener disconnected",
+                    extra={"error": str(e), "retry_in_s": delay},
+                )
+            finally:
+                self._listening = False
+                try:
+                    if pubsub is not None:
+                        pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(delay)
+            delay = min(delay * 2, float(self._cfg["reconnect_max_s"]))
+
+    def _on_bump(self, data: str | bytes) -> None:
+        if isinstance(data, bytes):
+            data = data.decode()
+        try:
+            bot, generation = data.rsplit(":", 1)
+            self._seen_generation(UUID(bot), int(generation))
+        except ValueError:
+            logger.warning("Ignoring malformed bot generation message", extra={"data": data})
+
+    def _seen_generation(self, bot_id: UUID, generation: int) -> None:
+        with self._lock:
+            if generation <= self._generations.get(bot_id, -1):
+                return
+            self._generations[bot_id] = generation
+            for key in [key for key in self._entries if key[0] == bot_id]:
+                self._drop(key)
+
+    def _drop(self, key: tuple[UUID, str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def invalidate(self, bot_id: UUID | None = None) -> None:
+        """Drop one bot's entries, or everything."""
+        with self._lock:
+            if bot_id is None:
+                self._entries.clear()
+                self._generations.clear()
+                self._bytes = 0
+            else:
+                for key in [key for key in self._entries if key[0] == bot_id]:
+                    self._drop(key)
+
+    # ---- loading ----
+
+    def _current(self, key: tuple[UUID, str, str]) -> BotVectors | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.generation < self._generations.get(key[0], -1):
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: tuple[UUID, str, str], entry: BotVectors) -> None:
+        max_bytes = int(self._cfg["max_bytes"])
+        with self._lock:
+            if entry.generation < self._generations.get(key[0], -1):
+                return  # a bump arrived while loading
+            self._generations[key[0]] = max(entry.generation, self._generations.get(key[0], -1))
+            if entry.nbytes > max_bytes:
+                entry = BotVectors.too_large(entry.generation)
+            self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def _entry(self, chat_session: Session, key: tuple[UUID, str, str]) -> BotVectors | None:
+        if not self._listening:
+            # No invalidation feed: check the generation on every query.
+            try:
+                self._seen_generation(key[0], get_bot_generation(key[0], self._redis))
+            except RedisError as e:
+                logger.warning("Vector cache bypassed: Redis unavailable", extra={"error": str(e)})
+                return None
+        entry = self._current(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            entry = self._current(key)
+            if entry is not None:
+                return entry
+            # Read the generation before the rows so the entry is never newer than its label.
+            try:
+                generation = get_bot_generation(key[0], self._redis)
+            except RedisError as e:
+                logger.warning("Vector cache bypassed: Redis unavailable", extra={"error": str(e)})
+                return None
+            started = time.perf_counter()
+            entry = open_snapshot(*key, generation)
+            if entry is not None:
+                self._stats["snapshot_loads"] += 1
+            else:
+                with chat_session.begin_nested():
+                    entry = load_bot_vectors(
+                        chat_session, *key, generation,
+                        max_rows=int(self._cfg["max_bot_chunks"]),
+                        batch_size=int(self._cfg["load_batch_size"]),
+                    )
+                self._stats["loads"] += 1
+            self._store(key, entry)
+            logger.info(
+                "Vector cache loaded bot",
+                extra={
+                    "bot_id": str(key[0]),
+                    "generation": generation,
+                    "chunks": entry.rows,
+                    "cached": entry.matrix is not None,
+                    "mapped": entry.mapped,
+                    "bytes": entry.nbytes,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                },
+            )
+            return entry
+
+    # ---- search ----
+
+    def search(
+        self,
+        chat_session: Session,
+        query: list[float],
+        bot_id: UUID,
+        k: int,
+        threshold: float,
+        model: str,
+        version: str,
+    ) -> list[RetrievedChunk] | None:
+        """
+        Top-k chunks with cosine distance <= threshold, ordered like
+        retrieve_closest_embeddings (distance, then chunk_index). Returns None
+        when the cache can't answer (disabled, bot too large, Redis or load
+        failure); the caller should query the database.
+        """
+        hits = self.search_many(chat_session, [query], bot_id, k, threshold, model, version)
+        return None if hits is None else hits[0]
+
+    def search_many(
+        self,
+        chat_session: Session,
+        queries: list[list[float]],
+        bot_id: UUID,
+        k: int,
+        threshold: float,
+        model: str,
+        version: str,
+    ) -> list[list[RetrievedChunk]] | None:
+        """search() for several queries at once: one matmul against the bot's matrix."""
+        if not self._cfg["enabled"] or k <= 0:
+            return None
+        self._start_listener()
+        key = (bot_id, model, version)
+        try:
+            entry = self._entry(chat_session, key)
+        except Exception as e:
+            logger.exception("Vector cache load failed", extra={"bot_id": str(bot_id), "error": str(e)})
+            entry = None
+        if entry is None or entry.matrix is None:
+            self._stats["fallbacks"] += 1
+            return None
+        self._stats["hits"] += 1
+
+        n = entry.matrix.shape[0]
+        if n == 0 or not queries:
+            return [[] for _ in queries]
+        q = np.asarray(queries, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        # (n, m): column j scores every chunk against query j; zero queries score 0
+        scores = entry.matrix @ (q / np.where(norms == 0, 1.0, norms)).T
+        k = min(k, n)
+        results: list[list[RetrievedChunk]] = []
+        for j in range(len(queries)):
+            if norms[j, 0] == 0:
+                results.append([])
+                continue
+            column_scores = scores[:, j]
+            top = np.argpartition(column_scores, n - k)[n - k:]
+            # highest score first, ties by chunk_index
+            top = top[np.lexsort((entry.chunk_indexes[top], -column_scores[top]))]
+            hits: list[RetrievedChunk] = []
+            for i in top:
+                distance = 1.0 - float(column_scores[i])
+                if distance > threshold:
+                    break
+                hits.append(RetrievedChunk(
+                    document_id=entry.document_id(i),
+                    source_id=entry.source_id(i),
+                    chunk_index=int(entry.chunk_indexes[i]),
+                    content=entry.text(i),
+                    section_title=entry.title(i),
+                    distance=distance,
+                ))
+            results.append(hits)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "bots": len(self._entries), "bytes": self._bytes, "listening": self._listening}
+
+
+_cache: BotVectorCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_vector_cache() -> BotVectorCache:
+    """Process-wide cache (one per API worker process)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BotVectorCache()
+        return _cache
+
+
+def _retrieved_chunk(doc: Documents, distance: float) -> RetrievedChunk:
+    return RetrievedChunk(
+        document_id=doc.id,
+        source_id=doc.source_id,
+        chunk_index=doc.chunk_index,
+        content=doc.content or "",
+        section_title=doc.section_title,
+        distance=float(distance),
+    )
+
+
+def retrieve_chunks(
+    chat_session: Session,
+    query: list[float],
+    bot_id: UUID,
+    k: int = 5,
+    threshold: float = 0.5,
+    CURRENT_MODEL: str = _EMBEDDING_CONFIG["model"],
+    CURRENT_VERSION: str = _EMBEDDING_CONFIG["version"],
+) -> list[RetrievedChunk]:
+    """Closest chunks for a bot: from the in-process cache when it can answer, else from Postgres."""
+    hits = get_vector_cache().search(chat_session, query, bot_id, k, threshold, CURRENT_MODEL, CURRENT_VERSION)
+    if hits is not None:
+        return hits
+    rows = retrieve_closest_embeddings(
+        chat_session, query, bot_id, k, threshold, CURRENT_MODEL=CURRENT_MODEL, CURRENT_VERSION=CURRENT_VERSION
+    )
+    return [_retrieved_chunk(doc, distance) for _, doc, distance in rows]
+
+
+def retrieve_chunks_batch(
+    chat_session: Session,
+    queries: list[list[float]],
+    bot_id: UUID,
+    k: int = 5,
+    threshold: float = 0.5,
+    CURRENT_MODEL: str = _EMBEDDING_CONFIG["model"],
+    CURRENT_VERSION: str = _EMBEDDING_CONFIG["version"],
+) -> list[list[RetrievedChunk]]:
+    """retrieve_chunks for several query vectors (query expansion, multi-question messages); one list per query."""
+    hits = get_vector_cache().search_many(
+        chat_session, queries, bot_id, k, threshold, CURRENT_MODEL, CURRENT_VERSION
+    )
+    if hits is not None:
+        return hits
+    per_query = retrieve_closest_embeddings_batch(
+        chat_session, queries, bot_id, k, threshold, CURRENT_MODEL=CURRENT_MODEL, CURRENT_VERSION=CURRENT_VERSION
+    )
+    return [[_retrieved_chunk(doc, distance) for _, doc, distance in rows] for rows in per_query]
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config.rag_config import _EMBEDDING_CONFIG, _VECTOR_SNAPSHOT_CONFIG
+from app.db.bulk import vector_storage_mode
+from app.helpers.rag import live_embeddings_filter
+from app.models.chat_db_models import Documents, Embeddings
+
+logger = logging.getLogger(__name__)
+
+VECTOR_SNAPSHOT_DIR = (os.getenv("VECTOR_SNAPSHOT_DIR") or "").strip() or None
+
+_MAGIC = b"VSNAP\x00\x01\x00"
+_ALIGN = 64
+# name -> dtype of each array section, in file order
+_SECTIONS = {
+    "matrix": "<f4",
+    "document_ids": "u1",
+    "source_ids": "u1",
+    "chunk_indexes": "<i4",
+    "content_offsets": "<i8",
+    "content": "u1",
+    "title_offsets": "<i8",
+    "titles": "u1",
+}
+_SUFFIX = ".vsnap"
+
+
+@dataclass(frozen=True, slots=True)
+class BotVectors:
+    """
+    A bot's live chunks at one generation, as flat arrays that can live in
+    process memory or in a read-only mmap. Row i of `matrix` (unit norm) is
+    document_ids[i] (16 raw UUID bytes); its text is the UTF-8 bytes
+    content[content_offsets[i]:content_offsets[i + 1]], likewise for titles
+    (empty = no title). `matrix` None marks a bot too large to cache.
+    """
+
+    generation: int
+    matrix: np.ndarray | None
+    document_ids: np.ndarray
+    source_ids: np.ndarray
+    chunk_indexes: np.ndarray
+    content_offsets: np.ndarray
+    content: np.ndarray
+    title_offsets: np.ndarray
+    titles: np.ndarray
+    nbytes: int
+    mapped: bool = False
+
+    @classmethod
+    def too_large(cls, generation: int) -> "BotVectors":
+        empty = np.empty(0, dtype=np.uint8)
+        return cls(generation, None, empty, empty, empty, empty, empty, empty, empty, 0)
+
+    @property
+    def rows(self) -> int:
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def document_id(self, i: int) -> UUID:
+        return UUID(bytes=self.document_ids[i].tobytes())
+
+    def source_id(self, i: int) -> UUID:
+        return UUID(bytes=self.source_ids[i].tobytes())
+
+    def text(self, i: int) -> str:
+        return self.content[self.content_offsets[i]:self.content_offsets[i + 1]].tobytes().decode("utf-8")
+
+    def title(self, i: int) -> str | None:
+        return self.titles[self.title_offsets[i]:self.title_offsets[i + 1]].tobytes().decode("utf-8") or None
+
+
+def _packed_text(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _packed_uuids(values: list[UUID]) -> np.ndarray:
+    return np.frombuffer(b"".join(v.bytes for v in values), dtype=np.uint8).reshape(-1, 16)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def load_bot_vectors(
+    chat_session: Session,
+    bot_id: UUID,
+    model: str,
+    version: str,
+    generation: int,
+    max_rows: int,
+    batch_size: int = 5000,
+) -> BotVectors:
+    """
+    Read a bot's live chunks from the chat DB (the same rows retrieval
+    searches). Bots over `max_rows` come back as BotVectors.too_large().
+    """
+    live = live_embeddings_filter(bot_id, model, version)
+    rows = chat_session.scalar(
+        select(func.count()).select_from(select(Embeddings.id).where(*live).limit(max_rows + 1).subquery())
+    )
+    if rows > max_rows:
+        return BotVectors.too_large(generation)
+
+    column = Embeddings.embedding if vector_storage_mode(version) == "vector" else Embeddings.embedding_half
+    stmt = (
+        select(column, Documents.id, Documents.source_id, Documents.chunk_index,
+               Documents.section_title, Documents.content)
+        .join(Documents, Embeddings.document_id == Documents.id)
+        .where(*live)
+        .execution_options(yield_per=batch_size)
+    )
+    vectors: list[np.ndarray] = []
+    document_ids: list[UUID] = []
+    source_ids: list[UUID] = []
+    chunk_indexes: list[int] = []
+    titles: list[str] = []
+    texts: list[str] = []
+    for vector, document_id, source_id, chunk_index, title, content in chat_session.execute(stmt):
+        # VECTOR yields float32 arrays, HALFVEC yields HalfVector.
+        vectors.append(vector if isinstance(vector, np.ndarray) else vector.to_numpy())
+        document_ids.append(document_id)
+        source_ids.append(source_id)
+        chunk_indexes.append(chunk_index)
+        titles.append(title or "")
+        texts.append(content or "")
+
+    dims = int(_EMBEDDING_CONFIG["dimensions"])
+    matrix = (
+        _normalize_rows(np.vstack(vectors).astype(np.float32, copy=False))
+        if vectors else np.empty((0, dims), dtype=np.float32)
+    )
+    content_offsets, content = _packed_text(texts)
+    title_offsets, title_bytes = _packed_text(titles)
+    arrays = (matrix, _packed_uuids(document_ids), _packed_uuids(source_ids),
+              np.asarray(chunk_indexes, dtype=np.int32), content_offsets, content, title_offsets, title_bytes)
+    return BotVectors(generation, *arrays, nbytes=sum(a.nbytes for a in arrays))
+
+
+# ---- snapshot files ----
+
+def _safe(part: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", part)
+
+
+def _bot_dir(root: str | Path, bot_id: UUID) -> Path:
+    return Path(root) / str(bot_id)
+
+
+def _snapshot_prefix(model: str, version: str) -> str:
+    return f"{_safe(model)}@{_safe(version)}."
+
+
+def snapshot_path(root: str | Path, bot_id: UUID, model: str, version: str, generation: int) -> Path:
+    return _bot_dir(root, bot_id) / f"{_snapshot_prefix(model, version)}{generation:012d}{_SUFFIX}"
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def write_snapshot(
+    vectors: BotVectors, bot_id: UUID, model: str, version: str, root: str | Path | None = None
+) -> Path | None:
+    """
+    Write `vectors` as the bot's snapshot for vectors.generation: a JSON header
+    followed by 64-byte aligned raw arrays, written to a temp file in the same
+    directory, fsynced and renamed into place so readers only ever see whole
+    files. Returns None when snapshots are disabled or the bot is too large.
+    """
+    root = root or VECTOR_SNAPSHOT_DIR
+    if root is None or vectors.matrix is None:
+        return None
+    arrays = {name: getattr(vectors, name) for name in _SECTIONS}
+    sections: dict[str, dict] = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {"offset": offset, "shape": list(array.shape)}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({
+        "bot_id": str(bot_id),
+        "model": model,
+        "version": version,
+        "generation": vectors.generation,
+        "rows": vectors.rows,
+        "dims": int(vectors.matrix.shape[1]),
+        "sections": sections,
+    }).encode("utf-8")
+    data_start = _aligned(len(_MAGIC) + 8 + len(header))
+
+    path = snapshot_path(root, bot_id, model, version, vectors.generation)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGIC + len(header).to_bytes(8, "little") + header)
+            for name, array in arrays.items():
+                f.seek(data_start + sections[name]["offset"])
+                f.write(np.ascontiguousarray(array, dtype=_SECTIONS[name]).tobytes())
+            # trailing empty sections still need their offsets inside the file
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return path
+
+
+def open_snapshot(
+    bot_id: UUID, model: str, version: str, generation: int, root: str | Path | None = None
+) -> BotVectors | None:
+    """
+    Map the bot's snapshot for exactly `generation` read-only. The arrays are
+    views into the mapping, so every process that opens it shares the same
+    page-cache pages. None if there is no such snapshot (or it is unreadable).
+    """
+    root = root or VECTOR_SNAPSHOT_DIR
+    if root is None:
+        return None
+    path = snapshot_path(root, bot_id, model, version, generation)
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Unreadable vector snapshot", extra={"path": str(path), "error": str(e)})
+        return None
+    try:
+        if mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("bad magic")
+        header_len = int.from_bytes(mm[len(_MAGIC):len(_MAGIC) + 8], "little")
+        header = json.loads(mm[len(_MAGIC) + 8:len(_MAGIC) + 8 + header_len])
+        if (header["model"], header["version"], header["generation"]) != (model, version, generation):
+            raise ValueError("header does not match file name")
+        data_start = _aligned(len(_MAGIC) + 8 + header_len)
+        arrays = {}
+        for name, dtype in _SECTIONS.items():
+            section = header["sections"][name]
+            shape = tuple(section["shape"])
+            count = int(np.prod(shape)) if shape else 0
+            arrays[name] = np.frombuffer(
+                mm, dtype=dtype, count=count, offset=data_start + section["offset"]
+            ).reshape(shape)
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning("Corrupt vector snapshot", extra={"path": str(path), "error": str(e)})
+        return None
+    # The arrays keep the mapping alive; it is unmapped when the last one goes.
+    return BotVectors(generation, **arrays, nbytes=len(mm), mapped=True)
+
+
+def gc_snapshots(
+    bot_id: UUID, model: str, version: str, current: int, root: str | Path | None = None
+) -> int:
+    """
+    Remove this bot's snapshots (and abandoned temp files) older than
+    `current`, keeping the newest `keep_previous` and anything younger than
+    `gc_grace_s`. Processes that still map a removed file keep reading it;
+    the pages are freed when they unmap. Returns files removed.
+    """
+    root = root or VECTOR_SNAPSHOT_DIR
+    if root is None:
+        return 0
+    directory = _bot_dir(root, bot_id)
+    prefix = _snapshot_prefix(model, version)
+    cutoff = time.time() - float(_VECTOR_SNAPSHOT_CONFIG["gc_grace_s"])
+    keep = int(_VECTOR_SNAPSHOT_CONFIG["keep_previous"])
+    older: list[tuple[int, Path]] = []
+    removed = 0
+    try:
+        entries = list(directory.iterdir())
+    except FileNotFoundError:
+        return 0
+    for path in entries:
+        name = path.name
+        try:
+            if name.startswith(f".{prefix}") and name.endswith(".tmp"):
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+            elif name.startswith(prefix) and name.endswith(_SUFFIX):
+                generation = int(name[len(prefix):-len(_SUFFIX)])
+                if generation < current:
+                    older.append((generation, path))
+        except (OSError, ValueError):
+            continue
+    older.sort(reverse=True)
+    for _, path in older[keep:]:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+from urllib.parse import urlparse
+
+import httpx
+
+from app.config.rag_config import _URL_FETCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class FetchResult:
+    url: str
+    status_code: int | None
+    content_type: str
+    body: bytes
+    encoding: str | None
+    # time to response headers / to the last body byte, excluding per-host queueing
+    ttfb_ms: float
+    elapsed_ms: float
+    final_url: str | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status_code is not None and self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        # Same decoding rule as httpx.Response.text (declared charset, else utf-8).
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+class BodyTooLargeError(Exception):
+    pass
+
+
+class PooledFetcher:
+    """
+    One shared httpx.AsyncClient (keep-alive pool) with a per-host concurrency cap.
+
+    Use as an async context manager; `fetch` never raises, failures come back
+    as a FetchResult with `error` set.
+    """
+
+    def __init__(self, config: dict | None = None) -> None:
+        self._config = {**_URL_FETCH_CONFIG, **(config or {})}
+        self._client: httpx.AsyncClient | None = None
+        self._host_limits: defaultdict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(int(self._config["per_host_limit"]))
+        )
+
+    async def __aenter__(self) -> "PooledFetcher":
+        cfg = self._config
+        self._client = httpx.AsyncClient(
+            follow_redirects=True,
+            headers={
+                "User-Agent": str(cfg["user_agent"]),
+                "Accept": "text/html,application/xhtml+xml",
+            },
+            timeout=httpx.Timeout(float(cfg["total_timeout_s"]), connect=float(cfg["connect_timeout_s"])),
+            limits=httpx.Limits(
+                max_connections=int(cfg["max_connections"]),
+                max_keepalive_connections=int(cfg["max_keepalive_connections"]),
+                keepalive_expiry=float(cfg["keepalive_expiry_s"]),
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, url: str) -> FetchResult:
+        assert self._client is not None, "PooledFetcher used outside 'async with'"
+        host = (urlparse(url).hostname or "").lower()
+        async with self._host_limits[host]:
+            started = time.perf_counter()
+            ttfb_ms = 0.0
+            try:
+                async with asyncio.timeout(float(self._config["total_timeout_s"])):
+                    result = await self._fetch(url, started)
+            except Exception as e:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                result = FetchResult(
+                    url=url, status_code=None, content_type="", body=b"", encoding=None,
+                    ttfb_ms=ttfb_ms, elapsed_ms=elapsed_ms,
+                    error=f"{type(e).__name__}: {e}" if str(e) else type(e).__name__,
+                )
+        logger.info(
+            "Fetched URL",
+            extra={
+                "url": url,
+                "status_code": result.status_code,
+                "bytes": len(result.body),
+                "ttfb_ms": round(result.ttfb_ms, 1),
+                "elapsed_ms": round(result.elapsed_ms, 1),
+                "error": result.error,
+            },
+        )
+        return result
+
+    async def _fetch(self, url: str, started: float) -> FetchResult:
+        assert self._client is not None
+        max_body = int(self._config["max_body_bytes"])
+        async with self._client.stream("GET", url) as resp:
+            ttfb_ms = (time.perf_counter() - started) * 1000
+            declared = resp.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > max_body:
+                raise BodyTooLargeError(f"content-length {declared} exceeds {max_body} bytes")
+            body = bytearray()
+            async for part in resp.aiter_bytes():
+                body.extend(part)
+                if len(body) > max_body:
+                    raise BodyTooLargeError(f"body exceeds {max_body} bytes")
+            return FetchResult(
+                url=url,
+                status_code=resp.status_code,
+                content_type=resp.headers.get("content-type", ""),
+                body=bytes(body),
+                encoding=resp.charset_encoding,
+                ttfb_ms=ttfb_ms,
+                elapsed_ms=(time.perf_counter() - started) * 1000,
+                final_url=str(resp.url),
+            )
+
+
+_DONE = object()
+
+
+def iter_fetched(urls: Iterable[str], config: dict | None = None) -> Iterator[FetchResult]:
+    """
+    Fetch `urls` concurrently on a background event loop and yield results in
+    completion order, so callers can start extracting while the rest download.
+    Each distinct URL is fetched once. At most `queue_size` results are in
+    flight or waiting for the consumer; a fetch is only started when one of
+    those slots frees up, so a slow consumer holds back the downloads.
+    """
+    unique = list(dict.fromkeys(urls))
+    if not unique:
+        return
+    queue_size = int({**_URL_FETCH_CONFIG, **(config or {})}["queue_size"])
+    results: queue.Queue = queue.Queue(maxsize=queue_size)
+    slots = threading.Semaphore(queue_size)
+    stop = threading.Event()
+
+    async def _run() -> None:
+        async with PooledFetcher(config) as fetcher:
+            async def _one(url: str) -> None:
+                # Never blocks: each queued result holds one of `queue_size` slots.
+                results.put(await fetcher.fetch(url))
+
+            tasks: set[asyncio.Task] = set()
+            try:
+                for url in unique:
+                    while not slots.acquire(blocking=False):
+                        if stop.is_set():
+                            return
+                        await asyncio.to_thread(_wait_for_slot, slots, stop)
+                    task = asyncio.create_task(_one(url))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def _put(item: object) -> None:
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def _thread_main() -> None:
+        try:
+            asyncio.run(_run())
+        except BaseException as e:  # surfaced to the consumer below
+            _put(e)
+        finally:
+            _put(_DONE)
+
+    thread = threading.Thread(target=_thread_main, name="url-fetcher", daemon=True)
+    thread.start()
+    completed = False
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            slots.release()
+            yield item
+        completed = True
+    finally:
+        # Also unblocks the producer if the consumer stopped early.
+        stop.set()
+        if completed:
+            thread.join()
+
+
+def _wait_for_slot(slots: threading.Semaphore, stop: threading.Event) -> None:
+    # Off the event loop, so in-flight fetches keep running while we wait.
+    while not stop.is_set():
+        if slots.acquire(timeout=0.5):
+            slots.release()
+            return
+
+
+def fetch_url(url: str, config: dict | None = None) -> FetchResult:
+    return next(iter_fetched([url], config))
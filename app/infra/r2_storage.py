@@ -1,11 +1,26 @@
 from __future__ import annotations
 
 import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import BinaryIO
 
 import boto3
 from botocore.client import BaseClient
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from app.config.rag_config import _R2_CONFIG
+
+_MISSING_CODES = ("404", "NoSuchKey", "NotFound")
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+# One client per process: boto3 clients are thread-safe and keep their own
+# connection pool, but sockets must not be shared across a fork (RQ work horses).
+_client_lock = threading.Lock()
+_client: tuple[int, BaseClient] | None = None
 
 
 @dataclass(frozen=True, slots=True)
@@ -17,9 +32,13 @@ class R2Config:
     # Optional envs (kept for compatibility / future use)
     api_key_token: str | None = None
     base_url: str | None = None
+    # Any S3-compatible endpoint (e.g. a local MinIO) instead of the R2 account endpoint.
+    endpoint_override: str | None = None
 
     @property
     def endpoint_url(self) -> str:
+        if self.endpoint_override:
+            return self.endpoint_override
         # Cloudflare R2 is S3-compatible.
         return f"https://{self.account_id}.r2.cloudflarestorage.com"
 
@@ -28,8 +47,9 @@ def load_r2_config() -> R2Config:
     account_id = (os.getenv("R2_ACCOUNT_ID") or "").strip()
     access_key_id = (os.getenv("ACCESS_KEY_ID") or "").strip()
     secret_access_key = (os.getenv("SECRET_ACCESS_KEY") or "").strip()
+    endpoint_override = (os.getenv("R2_ENDPOINT_URL") or "").strip() or None
 
-    if not account_id:
+    if not account_id and not endpoint_override:
         raise RuntimeError("R2_ACCOUNT_ID is not set")
     if not access_key_id:
         raise RuntimeError("ACCESS_KEY_ID is not set")
@@ -42,22 +62,50 @@ def load_r2_config() -> R2Config:
         secret_access_key=secret_access_key,
         api_key_token=(os.getenv("R2_API_KEY_TOKEN") or "").strip() or None,
         base_url=(os.getenv("CLOUDFLARE_R2_BASE_URL") or "").strip() or None,
+        endpoint_override=endpoint_override,
     )
 
 
-def get_r2_client(cfg: R2Config | None = None) -> BaseClient:
-    if cfg is None:
-        cfg = load_r2_config()
-
-    return boto3.client(
+def _build_client(cfg: R2Config) -> BaseClient:
+    # A fresh Session per client: the boto3 default session isn't thread-safe.
+    return boto3.session.Session().client(
         "s3",
         endpoint_url=cfg.endpoint_url,
         aws_access_key_id=cfg.access_key_id,
         aws_secret_access_key=cfg.secret_access_key,
         region_name="auto",
+        config=Config(
+            max_pool_connections=int(_R2_CONFIG["max_pool_connections"]),
+            connect_timeout=float(_R2_CONFIG["connect_timeout_s"]),
+            read_timeout=float(_R2_CONFIG["read_timeout_s"]),
+            retries={"max_attempts": int(_R2_CONFIG["max_attempts"]), "mode": str(_R2_CONFIG["retry_mode"])},
+            tcp_keepalive=bool(_R2_CONFIG["tcp_keepalive"]),
+        ),
     )
 
 
+def get_r2_client(cfg: R2Config | None = None) -> BaseClient:
+    """
+    Return the process-wide client (built on first use, rebuilt after a fork).
+    Passing `cfg` builds a separate, uncached client.
+    """
+    global _client
+    if cfg is not None:
+        return _build_client(cfg)
+    pid = os.getpid()
+    cached = _client
+    if cached is not None and cached[0] == pid:
+        return cached[1]
+    with _client_lock:
+        if _client is None or _client[0] != pid:
+            _client = (pid, _build_client(load_r2_config()))
+        return _client[1]
+
+
+def _error_code(e: ClientError) -> str:
+    return str(e.response.get("Error", {}).get("Code", ""))
+
+
 def r2_object_exists(bucket: str, key: str, client: BaseClient | None = None) -> bool:
     if client is None:
         client = get_r2_client()
@@ -65,8 +113,7 @@ def r2_object_exists(bucket: str, key: str, client: BaseClient | None = None) ->
         client.head_object(Bucket=bucket, Key=key)
         return True
     except ClientError as e:
-        code = str(e.response.get("Error", {}).get("Code", ""))
-        if code in ("404", "NoSuchKey", "NotFound"):
+        if _error_code(e) in _MISSING_CODES:
             return False
         raise
 
@@ -77,11 +124,113 @@ def r2_delete_object(bucket: str, key: str, client: BaseClient | None = None) ->
     client.delete_object(Bucket=bucket, Key=key)
 
 
-def r2_download_to_path(bucket: str, key: str, dest_path: str, client: BaseClient | None = None) -> None:
+# S3 DeleteObjects accepts at most this many keys per request.
+_DELETE_BATCH_SIZE = 1000
+
+
+def r2_delete_objects(bucket: str, keys: list[str], client: BaseClient | None = None) -> dict[str, str]:
+    """
+    Delete many keys with DeleteObjects, 1000 per request. Missing keys count as
+    deleted (as with DeleteObject). Returns {key: error} for keys that failed;
+    a request that fails as a whole marks all of its keys with that error.
+    """
+    if client is None:
+        client = get_r2_client()
+    errors: dict[str, str] = {}
+    unique = list(dict.fromkeys(keys))
+    for i in range(0, len(unique), _DELETE_BATCH_SIZE):
+        batch = unique[i:i + _DELETE_BATCH_SIZE]
+        try:
+            resp = client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except ClientError as e:
+            errors.update((key, _error_code(e) or str(e)) for key in batch)
+            continue
+        except BotoCoreError as e:
+            errors.update((key, type(e).__name__) for key in batch)
+            continue
+        for err in resp.get("Errors", []):
+            errors[str(err.get("Key"))] = str(err.get("Code") or err.get("Message") or "unknown")
+    return errors
+
+
+def _get_range(client: BaseClient, bucket: str, key: str, start: int, stop: int, etag: str | None) -> dict:
+    params = {"Bucket": bucket, "Key": key, "Range": f"bytes={start}-{stop - 1}"}
+    if etag:
+        # Fail the part (412) rather than splice two versions of an overwritten object.
+        params["IfMatch"] = etag
+    return client.get_object(**params)
+
+
+def _read_part(client: BaseClient, bucket: str, key: str, start: int, stop: int, etag: str | None) -> bytes:
+    resp = _get_range(client, bucket, key, start, stop, etag)
+    with resp["Body"] as body:
+        return body.read()
+
+
+def r2_download(bucket: str, key: str, dest: BinaryIO, client: BaseClient | None = None) -> int | None:
+    """
+    Download an object into `dest`; returns the object size, or None if the key doesn't exist.
+
+    The first ranged GET doubles as the existence check (no separate HEAD) and
+    returns small objects whole. Larger objects fetch their remaining parts in
+    parallel, pinned to the first response's ETag, and write them in order, so
+    `dest` only needs to support sequential writes.
+    """
     if client is None:
         client = get_r2_client()
+    part = int(_R2_CONFIG["part_size_bytes"])
+    try:
+        first = _get_range(client, bucket, key, 0, part, None)
+    except ClientError as e:
+        code = _error_code(e)
+        if code in _MISSING_CODES:
+            return None
+        if code == "InvalidRange":
+            # Ranged GET on an empty object.
+            return 0
+        raise
+
+    with first["Body"] as body:
+        head = body.read()
+    dest.write(head)
+    match = _CONTENT_RANGE_RE.fullmatch(str(first.get("ContentRange") or ""))
+    if match is None or match.group(3) == "*":
+        # Plain 200: the server ignored the Range header and sent everything.
+        return len(head)
+    total = int(match.group(3))
+    if total <= len(head):
+        return total
+
+    etag = first.get("ETag")
+    workers = max(1, int(_R2_CONFIG["download_workers"]))
+    ranges = [(start, min(start + part, total)) for start in range(len(head), total, part)]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="r2-download") as pool:
+        # At most `workers * 2` parts buffered; written back in range order.
+        inflight: list[Future[bytes]] = []
+        next_range = iter(ranges)
+        for start, stop in next_range:
+            inflight.append(pool.submit(_read_part, client, bucket, key, start, stop, etag))
+            if len(inflight) >= workers * 2:
+                break
+        while inflight:
+            dest.write(inflight.pop(0).result())
+            for start, stop in next_range:
+                inflight.append(pool.submit(_read_part, client, bucket, key, start, stop, etag))
+                break
+    return total
+
+
+def r2_download_to_path(bucket: str, key: str, dest_path: str, client: BaseClient | None = None) -> bool:
+    """Download an object to `dest_path`; False (and no file) if the key doesn't exist."""
     with open(dest_path, "wb") as f:
-        client.download_fileobj(bucket, key, f)
+        size = r2_download(bucket, key, f, client=client)
+    if size is None:
+        os.remove(dest_path)
+        return False
+    return True
 
 
 def r2_presigned_get_url(
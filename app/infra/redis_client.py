@@ -8,9 +8,12 @@ from redis import Redis
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 
-def get_redis() -> Redis:
-    """Create a Redis client. Connections are opened lazily on first command."""
-    return Redis.from_url(REDIS_URL, decode_responses=True)
+def get_redis(decode_responses: bool = True) -> Redis:
+    """
+    Create a Redis client. Connections are opened lazily on first command.
+    Pass decode_responses=False for values that are raw bytes (e.g. packed vectors).
+    """
+    return Redis.from_url(REDIS_URL, decode_responses=decode_responses)
 
 
 # Optional shared client for app usage.
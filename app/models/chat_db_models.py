@@ -5,8 +5,10 @@ import uuid
 from typing import Optional
 from uuid import UUID
 
+from pgvector.sqlalchemy import BIT, HALFVEC
 from pgvector.sqlalchemy.vector import VECTOR
-from sqlalchemy import (ARRAY, Boolean, CheckConstraint, DateTime, Double,
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import (ARRAY, BigInteger, Boolean, CheckConstraint, DateTime, Double,
                         Float, ForeignKeyConstraint, Index, Integer,
                         PrimaryKeyConstraint, String, Text, UniqueConstraint,
                         Uuid, text)
@@ -23,13 +25,20 @@ class Base(DeclarativeBase):
 
 class Documents(Base):
     __tablename__ = "documents"
-    __table_args__ = (PrimaryKeyConstraint("id", name="documents_pk"),UniqueConstraint(
+    __table_args__ = (PrimaryKeyConstraint("id", name="documents_pk"),Index(
+            "uq_documents_live_source_chunk_model_version",
             "source_id",
             "chunk_index",
             "embedding_model",
             "embedding_version",
-            name="uq_documents_source_chunk_model_version",
-        ))
+            unique=True,
+            # Only the live set is unique, so a retrain can stage replacement
+            # rows (is_active = false) next to the rows they will replace.
+            postgresql_where=text("is_active AND deleted_at IS NULL"),
+        ),
+        # Tombstones only; lets compaction find expired rows without a scan.
+        Index("documents_deleted_at_idx", "deleted_at",
+              postgresql_where=text("deleted_at IS NOT NULL")))
     
     id: Mapped[uuid.UUID] = mapped_column(
         Uuid, primary_key=True, server_default=text('gen_random_uuid()'))
@@ -44,6 +53,8 @@ class Documents(Base):
     chunk_overlap: Mapped[Optional[int]] = mapped_column(Integer)
     section_title: Mapped[Optional[str]] = mapped_column(Text)
     token_count: Mapped[Optional[int]] = mapped_column(Integer)
+    # sha256 hex of content; used to diff chunks on re-training
+    content_hash: Mapped[Optional[str]] = mapped_column(Text)
     embedding_model: Mapped[Optional[str]] = mapped_column(Text)
     embedding_version: Mapped[Optional[str]] = mapped_column(Text)
     embedding_provider: Mapped[Optional[str]] = mapped_column(Text)
@@ -83,6 +94,14 @@ class TrainingJobs(Base):
     completed_at: Mapped[Optional[datetime.datetime]
                          ] = mapped_column(DateTime(True))
     error_message: Mapped[Optional[str]] = mapped_column(Text)
+    embedding_cache_hits: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=text("0"))
+    embedding_cache_misses: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=text("0"))
+    # high-water resident set size of the worker process that ran the job
+    peak_rss_bytes: Mapped[Optional[int]] = mapped_column(BigInteger)
+    # batch deletions: {source_id: {"status": ..., "documents": n, "file": ...}}
+    source_results: Mapped[Optional[dict]] = mapped_column(JSONB)
 
 
 class Embeddings(Base):
@@ -90,22 +109,114 @@ class Embeddings(Base):
     __table_args__ = (
         ForeignKeyConstraint(["document_id"], ["documents.id"],
                              ondelete="CASCADE", name="embeddings_document_id_fkey"),
+        # Which columns are set depends on the version's storage mode (_VECTOR_STORAGE_CONFIG).
+        CheckConstraint("embedding IS NOT NULL OR embedding_half IS NOT NULL",
+                        name="embeddings_has_vector_check"),
         PrimaryKeyConstraint("id", name="embeddings_pkey"),
         Index("embeddings_document_id_idx", "document_id"), 
+        Index("embeddings_deleted_at_idx", "deleted_at",
+              postgresql_where=text("deleted_at IS NOT NULL")),
+        # Exact-scan path for small bots (the planner picks it over the ANN index).
+        Index("embeddings_bot_live_idx", "bot_id", "embedding_model", "embedding_version",
+              postgresql_where=text("is_active AND deleted_at IS NULL")),
+        # ANN index for retrieve_closest_embeddings (live rows only).
+        Index("embeddings_embedding_hnsw_idx", "embedding",
+              postgresql_using="hnsw",
+              postgresql_ops={"embedding": "vector_cosine_ops"},
+              postgresql_with={"m": 16, "ef_construction": 64},
+              postgresql_where=text("deleted_at IS NULL")),
+        Index("embeddings_embedding_half_hnsw_idx", "embedding_half",
+              postgresql_using="hnsw",
+              postgresql_ops={"embedding_half": "halfvec_cosine_ops"},
+              postgresql_with={"m": 16, "ef_construction": 64},
+              postgresql_where=text("deleted_at IS NULL")),
+        # Hamming first pass for the "binary" storage mode.
+        Index("embeddings_embedding_bits_hnsw_idx", "embedding_bits",
+              postgresql_using="hnsw",
+              postgresql_ops={"embedding_bits": "bit_hamming_ops"},
+              postgresql_with={"m": 16, "ef_construction": 64},
+              postgresql_where=text("deleted_at IS NULL")),
     )
 
     id: Mapped[uuid.UUID] = mapped_column(
         Uuid, primary_key=True, server_default=text("gen_random_uuid()"))
     document_id: Mapped[uuid.UUID] = mapped_column(Uuid, nullable=False,unique=True)
-    embedding: Mapped[list[float]] = mapped_column(
-        VECTOR(1536), nullable=False)
+    # float32; NULL for versions stored as halfvec / binary
+    embedding: Mapped[Optional[list[float]]] = mapped_column(VECTOR(1536))
+    # float16 copy ("halfvec" and "binary" storage modes)
+    embedding_half: Mapped[Optional[list[float]]] = mapped_column(HALFVEC(1536))
+    # sign bits, binary_quantize() ("binary" storage mode)
+    embedding_bits: Mapped[Optional[str]] = mapped_column(BIT(1536))
     created_at: Mapped[datetime.datetime] = mapped_column(
         DateTime(True), nullable=False, server_default=text("now()"))
     deleted_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True))
+    # Copies of the document's filter columns (kept in sync by the write path and
+    # deletion jobs) so retrieval filters and ranks on this table alone.
+    bot_id: Mapped[Optional[uuid.UUID]] = mapped_column(Uuid)
+    organization_id: Mapped[Optional[str]] = mapped_column(Text)
+    embedding_model: Mapped[Optional[str]] = mapped_column(Text)
+    embedding_version: Mapped[Optional[str]] = mapped_column(Text)
+    is_active: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, server_default=text("false"))
     document: Mapped["Documents"] = relationship(
         "Documents", back_populates="embeddings")
 
 
+class EmbeddingCache(Base):
+    """Content-addressed vectors shared across sources, bots and organizations."""
+    __tablename__ = "embedding_cache"
+    __table_args__ = (
+        PrimaryKeyConstraint("embedding_model", "embedding_version", "dimensions",
+                             "content_hash", name="embedding_cache_pkey"),
+        Index("embedding_cache_last_used_at_idx", "last_used_at"),
+    )
+
+    embedding_model: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding_version: Mapped[str] = mapped_column(Text, nullable=False)
+    dimensions: Mapped[int] = mapped_column(Integer, nullable=False)
+    # sha256 hex digest of the chunk text
+    content_hash: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(VECTOR(), nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(True), nullable=False, server_default=text("now()"))
+    last_used_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(True), nullable=False, server_default=text("now()"))
+
+
+class AnswerCache(Base):
+    """
+    Answers served to a bot's users, keyed by the question's embedding. Rows
+    belong to one bot generation within one Redis epoch
+    (vector_cache.get_bot_generation_stamp) and one config fingerprint, so a
+    retrain, deletion, Redis reset or prompt/model/retrieval change makes them
+    unreachable; such rows are purged as new answers are stored.
+    """
+    __tablename__ = "answer_cache"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", name="answer_cache_pkey"),
+        Index("answer_cache_bot_generation_idx", "bot_id", "generation"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        Uuid, primary_key=True, server_default=text("gen_random_uuid()"))
+    bot_id: Mapped[uuid.UUID] = mapped_column(Uuid, nullable=False)
+    generation_epoch: Mapped[str] = mapped_column(Text, nullable=False)
+    generation: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # answer_cache.config_fingerprint of prompts, models and retrieval settings
+    config_fingerprint: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding_model: Mapped[str] = mapped_column(Text, nullable=False)
+    llm_model: Mapped[str] = mapped_column(Text, nullable=False)
+    query: Mapped[str] = mapped_column(Text, nullable=False)
+    query_embedding: Mapped[list[float]] = mapped_column(HALFVEC(1536), nullable=False)
+    answer: Mapped[str] = mapped_column(Text, nullable=False)
+    # time it took to produce the answer (retrieval + completion); a hit saves about this much
+    answer_latency_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(True), nullable=False, server_default=text("now()"))
+    last_hit_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True))
+
+
 class RetrievalLogs(Base):
     __tablename__ = 'retrieval_logs'
     __table_args__ = (
@@ -173,3 +284,8 @@ class ModelConfigVersions(Base):
         Boolean, server_default=text('false'))
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(
         DateTime(True), server_default=text('now()'))
+    # Opt-in semantic answer cache (app/helpers/answer_cache.py); NULL
+    # similarity uses _ANSWER_CACHE_CONFIG["min_similarity"].
+    answer_cache_enabled: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, server_default=text('false'))
+    answer_cache_min_similarity: Mapped[Optional[float]] = mapped_column(Double(53))
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import sys
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import select
+
+from app.config.rag_config import _EMBEDDING_CONFIG
+from app.db.bulk import EmbeddingScope, copy_embeddings, insert_documents
+from app.db.session import SessionLocal
+from app.models.chat_db_models import Documents, Embeddings
+
+_SIZES = (1_000, 10_000, 100_000)
+
+
+def _rows(n: int, source_id: uuid.UUID, bot_id: uuid.UUID) -> list[dict]:
+    return [
+        {
+            "organization_id": "org_bench",
+            "bot_id": bot_id,
+            "source_id": source_id,
+            "chunk_index": i,
+            "content": f"benchmark chunk {i} " * 40,
+            "is_active": False,
+            "token_count": 200,
+            "embedding_model": _EMBEDDING_CONFIG["model"],
+            "embedding_version": _EMBEDDING_CONFIG["version"],
+            "embedding_provider": _EMBEDDING_CONFIG["provider"],
+        }
+        for i in range(n)
+    ]
+
+
+def _orm_path(session, rows: list[dict], vectors: np.ndarray) -> None:
+    """The pre-bulk path: session.add per chunk, read ids back, session.add per vector."""
+    for row in rows:
+        session.add(Documents(**row))
+    session.flush()
+    documents = session.scalars(
+        select(Documents).where(Documents.source_id == rows[0]["source_id"]).order_by(Documents.chunk_index)
+    ).all()
+    for document, vector in zip(documents, vectors):
+        session.add(Embeddings(document_id=document.id, embedding=vector.tolist()))
+    session.flush()
+
+
+def _bulk_path(session, rows: list[dict], vectors: np.ndarray) -> None:
+    ids = insert_documents(session, rows)
+    scope = EmbeddingScope(rows[0]["bot_id"], rows[0]["organization_id"],
+                           rows[0]["embedding_model"], rows[0]["embedding_version"])
+    copy_embeddings(session, zip(ids, vectors), scope, is_active=False)
+
+
+def main() -> None:
+    """
+    Compare rows/s of the ORM write path with insert_documents + copy_embeddings.
+
+    Needs CHAT_DB_* env vars. Every run happens inside a transaction that is
+    rolled back, so nothing is left behind in the database.
+
+        python -m app.scripts.bench_bulk_persist [sizes...]
+    """
+    if SessionLocal is None:
+        raise SystemExit("Chat DB is not configured (CHAT_DB_* env vars missing).")
+
+    sizes = tuple(int(a) for a in sys.argv[1:]) or _SIZES
+    rng = np.random.default_rng(0)
+    dims = int(_EMBEDDING_CONFIG["dimensions"])
+
+    print(f"{'chunks':>8}  {'path':<5}  {'seconds':>8}  {'rows/s':>10}")
+    for n in sizes:
+        vectors = rng.standard_normal((n, dims), dtype=np.float32)
+        for name, path in (("orm", _orm_path), ("bulk", _bulk_path)):
+            rows = _rows(n, uuid.uuid4(), uuid.uuid4())
+            session = SessionLocal()
+            try:
+                started = time.perf_counter()
+                path(session, rows, vectors)
+                elapsed = time.perf_counter() - started
+            finally:
+                session.rollback()
+                session.close()
+            # documents + embeddings rows
+            print(f"{n:>8}  {name:<5}  {elapsed:>8.2f}  {2 * n / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
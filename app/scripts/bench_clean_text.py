@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import Callable
+
+from app.helpers.utils import clean_scraped_text, clean_scraped_text_reference
+
+_HTML_CORPUS_DIR = Path(__file__).with_name("html_corpus")
+
+# Fragments that exercise every normalization step, including the order-sensitive
+# ones (CR vs CRLF, zero-width chars next to line breaks, NFKC composition).
+_FUZZ_ALPHABET = (
+    "a", "Word", "12", "--", "!!", "_", "\u00b7", "\u2026", " ", "  ", "\t", "\n", "\n\n\n",
+    "\r", "\r\n", "\x00", "\u200b", "\ufeff", "\xa0", "\u3000", "\u2003", "\x0b", "\x0c",
+    "\x85", "\u2028", "\uff26\uff55\uff4c\uff4c", "\ufb01", "\u00bd", "\u00e9", "e\u0301", "\u0301",
+)
+
+
+def _fuzz_cases(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(_FUZZ_ALPHABET) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+
+def _csv_like(target_bytes: int) -> str:
+    rows = ["Name,Email,Amount,Notes"]
+    size, i = 0, 0
+    while size < target_bytes:
+        row = f"Customer {i},user{i}@example.com,  {i * 3}.50\t,Renewal  due\t "
+        rows.append(row)
+        size += len(row) + 1
+        i += 1
+    return "\n".join(rows)
+
+
+def _pdf_like(target_bytes: int) -> str:
+    page = (
+        "Ｑｕａｒｔｅｒｌｙ ｒｅｐｏｒｔ\r\n"
+        "Revenue grew 12% year over year — driven by the “Growth” plan’s ﬁrst full quarter.\r\n"
+        "  •  \r\n"
+        "Operating margin:  18.4%\r\n"
+        "\r\n\r\n\r\n"
+        "3\r\n"
+    )
+    return page * max(1, target_bytes // len(page.encode("utf-8")))
+
+
+def _html_like(target_bytes: int) -> str:
+    texts = [p.read_text(encoding="utf-8") for p in sorted(_HTML_CORPUS_DIR.glob("*.txt"))]
+    blob = "\n\n".join(texts) or "No corpus found.\n"
+    return blob * max(1, target_bytes // len(blob.encode("utf-8")))
+
+
+def _mb_per_s(clean: Callable[[str], str], text: str, min_seconds: float) -> float:
+    size_mb = len(text.encode("utf-8")) / 1e6
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        clean(text)
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return size_mb * runs / elapsed
+
+
+def main() -> None:
+    """
+    Differential check and MB/s for the text normalizer.
+
+    clean_scraped_text (single pass over lines) must return exactly what
+    clean_scraped_text_reference returns for a seeded fuzz corpus, the golden
+    HTML extracts in app/scripts/html_corpus and the large benchmark inputs;
+    then both are timed on CSV-, PDF- and HTML-extract-like inputs.
+
+        python -m app.scripts.bench_clean_text [--mb 8] [--fuzz 50000]
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=8.0, help="size of each benchmark input")
+    parser.add_argument("--fuzz", type=int, default=50_000, help="number of fuzz cases")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=2.0, help="minimum time per measurement")
+    args = parser.parse_args()
+
+    target = int(args.mb * 1e6)
+    inputs = {"csv": _csv_like(target), "pdf": _pdf_like(target), "html": _html_like(target)}
+    cases = _fuzz_cases(args.fuzz, args.seed)
+    cases += [p.read_text(encoding="utf-8") for p in sorted(_HTML_CORPUS_DIR.glob("*.txt"))]
+    cases += list(inputs.values())
+
+    mismatches = [case for case in cases if clean_scraped_text(case) != clean_scraped_text_reference(case)]
+    for case in mismatches[:5]:
+        print(f"MISMATCH {case[:80]!r}")
+    if mismatches:
+        raise SystemExit(f"Differential check failed: {len(mismatches)}/{len(cases)} inputs differ.")
+    print(f"differential check: {len(cases)} inputs identical")
+
+    print(f"{'input':<6}  {'cleaner':<9}  {'MB/s':>8}")
+    for label, text in inputs.items():
+        for name, clean in (("reference", clean_scraped_text_reference), ("single", clean_scraped_text)):
+            print(f"{label:<6}  {name:<9}  {_mb_per_s(clean, text, args.seconds):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config.rag_config import _EMBEDDING_CONFIG, _VECTOR_STORAGE_CONFIG
+from app.db.bulk import EmbeddingScope, copy_embeddings, insert_documents
+from app.db.session import SessionLocal
+from app.helpers.rag import (ann_candidate_count, batch_retrieval_statement,
+                             retrieval_statement, set_ann_search_params)
+
+_SIZES = (100_000, 1_000_000)
+_INSERT_BATCH = 5_000
+# Index the ANN first pass of each storage mode should run on.
+_MODE_INDEXES = {
+    "vector": "embeddings_embedding_hnsw_idx",
+    "halfvec": "embeddings_embedding_half_hnsw_idx",
+    "binary": "embeddings_embedding_bits_hnsw_idx",
+}
+# Small bots should be read through this index and ranked exactly instead.
+_SMALL_BOT_INDEX = "embeddings_bot_live_idx"
+
+
+def _unit(rng: np.random.Generator, n: int, dims: int) -> np.ndarray:
+    v = rng.standard_normal((n, dims), dtype=np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _load(
+    session: Session, n: int, bots: list[uuid.UUID], version: str, dims: int, rng: np.random.Generator
+) -> None:
+    """n live chunks spread over `bots` in insert-batch sized runs, one source per bot."""
+    sources = {bot: uuid.uuid4() for bot in bots}
+    scopes = {bot: EmbeddingScope(bot, "org_bench", _EMBEDDING_CONFIG["model"], version) for bot in bots}
+    batch = min(_INSERT_BATCH, max(1, n // len(bots)))
+    for start in range(0, n, batch):
+        stop = min(start + batch, n)
+        # one bot per insert batch so each COPY carries a single scope
+        bot = bots[(start // batch) % len(bots)]
+        rows = [
+            {
+                "organization_id": "org_bench",
+                "bot_id": bot,
+                "source_id": sources[bot],
+                "chunk_index": i,
+                "content": f"benchmark chunk {i}",
+                "is_active": True,
+                "token_count": 200,
+                "embedding_model": _EMBEDDING_CONFIG["model"],
+                "embedding_version": version,
+                "embedding_provider": _EMBEDDING_CONFIG["provider"],
+            }
+            for i in range(start, stop)
+        ]
+        ids = insert_documents(session, rows)
+        copy_embeddings(session, zip(ids, _unit(rng, stop - start, dims)), scopes[bot], is_active=True)
+
+
+def _explain(session: Session, stmt) -> str:
+    """EXPLAIN the exact statement retrieve_closest_embeddings sends (same binds, same processors)."""
+    compiled = stmt.compile(dialect=session.get_bind().dialect)
+    processors = compiled._bind_processors
+    params = {
+        key: processors[key](value) if key in processors else value
+        for key, value in compiled.construct_params().items()
+    }
+    rows = session.connection().exec_driver_sql(f"EXPLAIN {compiled}", params)
+    return "\n".join(row[0] for row in rows)
+
+
+def _plan_uses(session: Session, query: np.ndarray, bot: uuid.UUID, k: int, version: str, index: str) -> bool:
+    """EXPLAIN retrieval for `bot` with the ANN knobs retrieve_closest_embeddings sets; prints the plan on a miss."""
+    savepoint = session.begin_nested()
+    try:
+        set_ann_search_params(session, ann_candidate_count(k, version))
+        plan = _explain(session, retrieval_statement(
+            query.tolist(), bot, k, 0.5, _EMBEDDING_CONFIG["model"], version))
+    finally:
+        savepoint.rollback()
+    if index not in plan:
+        print(plan)
+    return index in plan
+
+
+def _timed(
+    session: Session, queries: np.ndarray, bot: uuid.UUID, k: int, version: str, exact: bool, ef_search: int | None
+):
+    latencies, results = [], []
+    mode = _VECTOR_STORAGE_CONFIG["versions"][version]
+    if exact and mode == "binary":
+        # Binary rows also carry embedding_half; the exact baseline ranks on it
+        # rather than on the Hamming first pass.
+        _VECTOR_STORAGE_CONFIG["versions"][version] = "halfvec"
+    for q in queries:
+        # SET LOCAL outlives a released savepoint; rolling it back resets the knobs.
+        savepoint = session.begin_nested()
+        try:
+            if exact:
+                session.execute(text("SET LOCAL enable_indexscan = off"))
+            else:
+                set_ann_search_params(session, ann_candidate_count(k, version), ef_search=ef_search)
+            stmt = retrieval_statement(q.tolist(), bot, k, 2.0, _EMBEDDING_CONFIG["model"], version)
+            started = time.perf_counter()
+            rows = session.execute(stmt).all()
+            latencies.append((time.perf_counter() - started) * 1000)
+            results.append({emb.id for emb, _, _ in rows})
+        finally:
+            savepoint.rollback()
+    _VECTOR_STORAGE_CONFIG["versions"][version] = mode
+    return np.asarray(latencies), results
+
+
+def main() -> None:
+    """
+    Check that retrieval runs on the index it is meant to and measure
+    latency/recall against an exact scan, on synthetic vectors spread over
+    several bots; then time all queries as one batch_retrieval_statement
+    against running them one by one.
+
+    Plan checks (EXPLAIN of the exact statement retrieve_closest_embeddings
+    sends), per size: a large bot must use the HNSW index of --storage-mode
+    (embedding, embedding_half or embedding_bits), and a bot of --small-bot
+    rows must use embeddings_bot_live_idx (exact ranking, no ANN). Any miss
+    prints the plan and exits non-zero; --check-only skips the timings.
+
+    Needs CHAT_DB_* env vars for a scratch database migrated to head (README,
+    "Database Benchmarks"). Everything runs in one transaction that is rolled
+    back. Loading 1M vectors maintains the HNSW graph row by row, so that size
+    takes a while.
+
+        python -m app.scripts.bench_retrieval [--sizes 100000 1000000] [--bots 20] [--ef-search 40 100 200]
+        python -m app.scripts.bench_retrieval --check-only --sizes 100000 --storage-mode binary
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(_SIZES))
+    parser.add_argument("--bots", type=int, default=20)
+    parser.add_argument("--small-bot", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument("--storage-mode", choices=sorted(_MODE_INDEXES), default="vector")
+    parser.add_argument("--check-only", action="store_true")
+    args = parser.parse_args()
+
+    if SessionLocal is None:
+        raise SystemExit("Chat DB is not configured (CHAT_DB_* env vars missing).")
+
+    rng = np.random.default_rng(0)
+    dims = int(_EMBEDDING_CONFIG["dimensions"])
+    # A version of its own, so the storage mode doesn't depend on the deployed config.
+    version = f"bench-{args.storage_mode}-{uuid.uuid4().hex[:8]}"
+    _VECTOR_STORAGE_CONFIG["versions"][version] = args.storage_mode
+    ann_index = _MODE_INDEXES[args.storage_mode]
+    failures = 0
+
+    print(f"storage mode {args.storage_mode}, version {version}")
+    print(f"{'vectors':>9}  {'mode':<12}  {'p50 ms':>8}  {'p95 ms':>8}  {'recall':>6}")
+    for n in args.sizes:
+        session = SessionLocal()
+        try:
+            bots = [uuid.uuid4() for _ in range(args.bots)]
+            small_bot = uuid.uuid4()
+            _load(session, n, bots, version, dims, rng)
+            _load(session, args.small_bot, [small_bot], version, dims, rng)
+            session.execute(text("ANALYZE documents"))
+            session.execute(text("ANALYZE embeddings"))
+            queries = _unit(rng, args.queries, dims)
+            bot = bots[0]
+
+            for label, plan_bot, index in (("large bot", bot, ann_index), ("small bot", small_bot, _SMALL_BOT_INDEX)):
+                ok = _plan_uses(session, queries[0], plan_bot, args.k, version, index)
+                failures += not ok
+                print(f"{n:>9}  {label} plan uses {index}: {'yes' if ok else 'NO'}")
+            if args.check_only:
+                continue
+
+            exact_ms, truth = _timed(session, queries, bot, args.k, version, exact=True, ef_search=None)
+            print(f"{n:>9}  {'exact':<12}  {np.percentile(exact_ms, 50):>8.2f}  {np.percentile(exact_ms, 95):>8.2f}  {1.0:>6.3f}")
+            for ef in args.ef_search:
+                ann_ms, found = _timed(session, queries, bot, args.k, version, exact=False, ef_search=ef)
+                recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+                label = f"hnsw ef={ef}"
+                print(f"{n:>9}  {label:<12}  {np.percentile(ann_ms, 50):>8.2f}  {np.percentile(ann_ms, 95):>8.2f}  {recall:>6.3f}")
+
+            # All queries in one LATERAL statement vs. one statement each.
+            savepoint = session.begin_nested()
+            try:
+                set_ann_search_params(session, ann_candidate_count(args.k, version))
+                stmt = batch_retrieval_statement([q.tolist() for q in queries], bot, args.k, 2.0,
+                                                 _EMBEDDING_CONFIG["model"], version)
+                started = time.perf_counter()
+                rows = session.execute(stmt).all()
+                batch_ms = (time.perf_counter() - started) * 1000
+            finally:
+                savepoint.rollback()
+            found = [set() for _ in queries]
+            for query_index, emb, _, _ in rows:
+                found[query_index].add(emb.id)
+            recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+            single_ms, _ = _timed(session, queries, bot, args.k, version, exact=False, ef_search=None)
+            print(f"{n:>9}  batch of {len(queries)}: {batch_ms:.2f} ms in one statement vs "
+                  f"{single_ms.sum():.2f} ms one by one, recall {recall:.3f}")
+        finally:
+            session.rollback()
+            session.close()
+
+    if failures:
+        raise SystemExit(f"{failures} plan check(s) did not use the expected index")
+
+
+if __name__ == "__main__":
+    main()
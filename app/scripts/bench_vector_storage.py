@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.config.rag_config import _EMBEDDING_CONFIG, _VECTOR_STORAGE_CONFIG
+from app.db.bulk import EmbeddingScope, copy_embeddings, insert_documents
+from app.db.session import SessionLocal
+from app.helpers.rag import (ann_candidate_count, retrieval_statement,
+                             set_ann_search_params)
+
+_INSERT_BATCH = 5_000
+# The index each storage mode's first pass runs on.
+_MODE_INDEXES = {
+    "vector": "embeddings_embedding_hnsw_idx",
+    "halfvec": "embeddings_embedding_half_hnsw_idx",
+    "binary": "embeddings_embedding_bits_hnsw_idx",
+}
+
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    return (v / np.linalg.norm(v, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _synthetic(n: int, queries: int, dims: int, clusters: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Clustered unit vectors; closer to real embedding sets than isotropic noise."""
+    centers = rng.standard_normal((clusters, dims), dtype=np.float32)
+    corpus = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dims), dtype=np.float32)
+    probe = centers[rng.integers(0, clusters, queries)] + 0.6 * rng.standard_normal((queries, dims), dtype=np.float32)
+    return _normalize(corpus), _normalize(probe)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    # argpartition then a sort of just the k winners; highest score first
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _timed(fn, queries: np.ndarray) -> tuple[list[np.ndarray], float]:
+    started = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def _recall(found: list[np.ndarray], truth: list[np.ndarray]) -> float:
+    return float(np.mean([len(np.intersect1d(f, t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def _load_version(session: Session, corpus: np.ndarray, version: str) -> tuple[uuid.UUID, dict[uuid.UUID, int]]:
+    """`corpus` as one bot's live chunks under `version`; returns the bot and document id -> row."""
+    bot, source = uuid.uuid4(), uuid.uuid4()
+    scope = EmbeddingScope(bot, "org_bench", _EMBEDDING_CONFIG["model"], version)
+    rows_by_id: dict[uuid.UUID, int] = {}
+    for start in range(0, len(corpus), _INSERT_BATCH):
+        stop = min(start + _INSERT_BATCH, len(corpus))
+        ids = insert_documents(session, [
+            {
+                "organization_id": "org_bench",
+                "bot_id": bot,
+                "source_id": source,
+                "chunk_index": i,
+                "content": f"benchmark chunk {i}",
+                "is_active": True,
+                "token_count": 200,
+                "embedding_model": _EMBEDDING_CONFIG["model"],
+                "embedding_version": version,
+                "embedding_provider": _EMBEDDING_CONFIG["provider"],
+            }
+            for i in range(start, stop)
+        ])
+        copy_embeddings(session, zip(ids, corpus[start:stop]), scope, is_active=True)
+        rows_by_id.update(zip(ids, range(start, stop)))
+    return bot, rows_by_id
+
+
+def _db_search(session: Session, bot: uuid.UUID, version: str, k: int, rows_by_id: dict[uuid.UUID, int]):
+    def search(q: np.ndarray) -> np.ndarray:
+        # SET LOCAL outlives a released savepoint; rolling it back resets the knobs.
+        savepoint = session.begin_nested()
+        try:
+            set_ann_search_params(session, ann_candidate_count(k, version))
+            rows = session.execute(
+                retrieval_statement(q.tolist(), bot, k, 2.0, _EMBEDDING_CONFIG["model"], version)).all()
+        finally:
+            savepoint.rollback()
+        return np.asarray([rows_by_id[doc.id] for _, doc, _ in rows], dtype=np.int64)
+    return search
+
+
+def _db_rows(corpus: np.ndarray, queries: np.ndarray, k: int, oversamples: list[int]) -> list[tuple]:
+    """
+    Load `corpus` once per storage mode (each under its own bench version) and
+    time retrieve_closest_embeddings' statement on the HNSW indexes. Index MB is
+    the size of the mode's index, so it is only per-mode on an otherwise empty
+    table. One transaction, rolled back.
+    """
+    truth = [_top_k(corpus @ q, k) for q in queries]
+    results = []
+    session = SessionLocal()
+    try:
+        for mode, index in _MODE_INDEXES.items():
+            version = f"bench-{mode}-{uuid.uuid4().hex[:8]}"
+            _VECTOR_STORAGE_CONFIG["versions"][version] = mode
+            bot, rows_by_id = _load_version(session, corpus, version)
+            session.execute(text("ANALYZE embeddings"))
+            index_mb = session.scalar(select(func.pg_relation_size(index))) / 1e6
+            for oversample in oversamples if mode == "binary" else [None]:
+                label = mode
+                if oversample is not None:
+                    _VECTOR_STORAGE_CONFIG["binary_oversample"] = oversample
+                    label = f"binary x{oversample}"
+                found, ms = _timed(_db_search(session, bot, version, k, rows_by_id), queries)
+                results.append((label, index_mb, ms, _recall(found, truth)))
+    finally:
+        session.rollback()
+        session.close()
+    return results
+
+
+def main() -> None:
+    """
+    Compare the embedding storage modes of _VECTOR_STORAGE_CONFIG on recall@k,
+    brute-force query latency and bytes per vector, in NumPy (no database), or
+    with --db in Postgres: the same vectors loaded once per mode and searched
+    through retrieval_statement on that mode's HNSW index.
+
+    "vector" (float32) is ground truth; "halfvec" ranks on float16 copies;
+    "binary" ranks on packed sign bits by Hamming distance, then rescores the
+    top k * oversample with halfvec cosine. Bytes are what the HNSW index has
+    to hold per vector (pgvector stores a copy of the indexed value per node).
+
+        python -m app.scripts.bench_vector_storage [--n 100000] [--queries 200] [-k 5]
+        python -m app.scripts.bench_vector_storage --npy embeddings.npy   # real vectors, one per row
+        python -m app.scripts.bench_vector_storage --db --n 20000 [--queries 100]
+
+    --db needs CHAT_DB_* env vars and `alembic upgrade head` on a scratch
+    database (see README); it loads --n rows three times, maintaining the HNSW
+    graphs row by row, and rolls everything back at the end.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--oversample", type=int, nargs="+", default=[1, 4, 10, 20])
+    parser.add_argument("--npy", help="real embeddings (rows); the last --queries rows become queries")
+    parser.add_argument("--db", action="store_true", help="measure in Postgres instead of NumPy")
+    args = parser.parse_args()
+    if args.db and SessionLocal is None:
+        raise SystemExit("Chat DB is not configured (CHAT_DB_* env vars missing).")
+
+    rng = np.random.default_rng(0)
+    if args.npy:
+        data = _normalize(np.load(args.npy).astype(np.float32))
+        corpus, queries = data[:-args.queries], data[-args.queries:]
+    else:
+        dims = int(_EMBEDDING_CONFIG["dimensions"])
+        corpus, queries = _synthetic(args.n, args.queries, dims, args.clusters, rng)
+    n, dims = corpus.shape
+    k = args.k
+
+    if args.db:
+        print(f"Postgres: {n} vectors x {dims} dims, {len(queries)} queries, k={k}")
+        print(f"{'mode':<12}  {'index MB':>9}  {'ms/query':>9}  {'recall@k':>8}")
+        for name, index_mb, ms, recall in _db_rows(corpus, queries, k, args.oversample):
+            print(f"{name:<12}  {index_mb:>9.1f}  {ms:>9.2f}  {recall:>8.3f}")
+        return
+
+    half = corpus.astype(np.float16)
+    # NumPy has no fast float16 matmul; rank on the float16-rounded values in float32
+    # so latency isn't dominated by conversion (Postgres computes halfvec distances natively).
+    half32 = half.astype(np.float32)
+    bits = np.packbits(corpus > 0, axis=1)
+
+    def exact(q: np.ndarray) -> np.ndarray:
+        return _top_k(corpus @ q, k)
+
+    def halfvec(q: np.ndarray) -> np.ndarray:
+        return _top_k(half32 @ q, k)
+
+    def binary(oversample: int):
+        def search(q: np.ndarray) -> np.ndarray:
+            qbits = np.packbits(q > 0)
+            hamming = np.bitwise_count(bits ^ qbits).sum(axis=1, dtype=np.int32)
+            candidates = np.argpartition(hamming, min(k * oversample, n) - 1)[:k * oversample]
+            rescored = half32[candidates] @ q
+            return candidates[_top_k(rescored, k)]
+        return search
+
+    truth, exact_ms = _timed(exact, queries)
+    rows = [("vector", 4 * dims + 8, exact_ms, 1.0)]
+    found, ms = _timed(halfvec, queries)
+    rows.append(("halfvec", 2 * dims + 8, ms, _recall(found, truth)))
+    for oversample in args.oversample:
+        found, ms = _timed(binary(oversample), queries)
+        rows.append((f"binary x{oversample}", dims // 8 + 8, ms, _recall(found, truth)))
+
+    print(f"{n} vectors x {dims} dims, {len(queries)} queries, k={k}")
+    print(f"{'mode':<12}  {'index B/vec':>11}  {'index MB':>9}  {'ms/query':>9}  {'recall@k':>8}")
+    for name, per_vector, ms, recall in rows:
+        print(f"{name:<12}  {per_vector:>11}  {per_vector * n / 1e6:>9.1f}  {ms:>9.2f}  {recall:>8.3f}")
+    print("binary rows also store a halfvec (for the rescore) in the table, outside the index.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import argparse
+
+from rq import Queue
+
+from app.config.rag_config import _COMPACTION_CONFIG
+from app.infra.redis_client import redis_client
+from app.services.compaction import compaction_job, schedule_compaction
+
+
+def main() -> None:
+    """
+    Start (or run once) the soft-delete compaction cycle.
+
+    Workers must run with the scheduler for delayed runs:
+        rq worker --with-scheduler default
+
+    Usage:
+        python -m app.scripts.schedule_compaction          # first run after interval_s
+        python -m app.scripts.schedule_compaction --now    # run now, then every interval_s
+        python -m app.scripts.schedule_compaction --once   # run now, don't reschedule
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--now", action="store_true", help="enqueue a run immediately; it reschedules itself")
+    group.add_argument("--once", action="store_true", help="enqueue a single run immediately")
+    args = parser.parse_args()
+
+    if args.now or args.once:
+        q = Queue(str(_COMPACTION_CONFIG["queue"]), connection=redis_client)
+        job = q.enqueue(compaction_job, reschedule=not args.once, job_timeout=int(_COMPACTION_CONFIG["job_timeout_s"]))
+        print("Enqueued compaction job:", job.id)
+        return
+    if schedule_compaction():
+        print(f"Compaction scheduled in {_COMPACTION_CONFIG['interval_s']}s")
+    else:
+        print("A compaction run is already scheduled")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,42 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
+import time
+import uuid
+from dataclasses import dataclass
 from typing import Any
 
 from fastapi import WebSocket
+from sqlalchemy import select
 
+from app.config.rag_config import _EMBEDDING_CONFIG
+from app.db.session import SessionLocal
 from app.domain.chat import ChatSession
 from app.core.env import load_app_env
+from app.helpers.answer_cache import (CachedAnswer, config_fingerprint,
+                                      lookup_answer,
+                                      record_answer_cache_lookup, store_answer)
+from app.helpers.rag import embed_query
+from app.helpers.vector_cache import get_bot_generation_stamp
+from app.models.chat_db_models import ModelConfigVersions
+
+logger = logging.getLogger(__name__)
+
+_SYSTEM_PROMPT = "You are a helpful customer support assistant."
+
+
+@dataclass(slots=True)
+class _CacheLookup:
+    """An answer cache lookup for one question of a bot that opted in; `cached` is the hit, if any."""
+
+    bot_id: uuid.UUID
+    epoch: str
+    generation: int
+    fingerprint: str
+    query_embedding: list[float]
+    cached: CachedAnswer | None = None
 
 
 async def _send_json_safe(socket: WebSocket | None, data: dict[str, Any]) -> None:
@@ -23,6 +53,68 @@ async def send_to_end_user(message_data: dict[str, Any], session: ChatSession) -
     await _send_json_safe(session.user_socket, message_data)
 
 
+def _active_model_config(chat_session, bot_id: uuid.UUID) -> ModelConfigVersions | None:
+    return chat_session.scalars(
+        select(ModelConfigVersions)
+        .where(ModelConfigVersions.bot_id == bot_id, ModelConfigVersions.active.is_(True))
+        .order_by(ModelConfigVersions.created_at.desc())
+        .limit(1)
+    ).one_or_none()
+
+
+def _lookup_answer(bot_id: str, question: str, llm_model: str) -> _CacheLookup | None:
+    """
+    Look the question up in the bot's answer cache. Blocking; run off the event
+    loop. None (no embedding, no lookup) unless the bot opted in and Redis gave
+    a generation; lookup errors are logged and also give None.
+    """
+    if SessionLocal is None:
+        return None
+    try:
+        bot_uuid = uuid.UUID(str(bot_id))
+        with SessionLocal() as chat_session:
+            config = _active_model_config(chat_session, bot_uuid)
+            if config is None or not config.answer_cache_enabled:
+                return None
+            try:
+                epoch, generation = get_bot_generation_stamp(bot_uuid)
+            except Exception as e:
+                logger.warning("Answer cache skipped: no bot generation", extra={"bot_id": bot_id, "error": str(e)})
+                return None
+            lookup = _CacheLookup(bot_uuid, epoch, generation, _answer_fingerprint(llm_model), embed_query(question))
+            lookup.cached = lookup_answer(
+                chat_session, bot_uuid, epoch, generation, lookup.fingerprint,
+                lookup.query_embedding, config.answer_cache_min_similarity,
+            )
+            chat_session.commit()
+            return lookup
+    except Exception as e:
+        logger.exception("Answer cache lookup failed", extra={"bot_id": bot_id, "error": str(e)})
+        return None
+
+
+def _answer_fingerprint(llm_model: str) -> str:
+    # Anything besides the question that changes the answer at the same generation.
+    return config_fingerprint({
+        "system_prompt": _SYSTEM_PROMPT,
+        "llm_model": llm_model,
+        "embedding_model": _EMBEDDING_CONFIG["model"],
+        "embedding_version": _EMBEDDING_CONFIG["version"],
+    })
+
+
+def _remember_answer(lookup: _CacheLookup, question: str, answer: str, llm_model: str, latency_ms: int) -> None:
+    try:
+        with SessionLocal() as chat_session:
+            store_answer(
+                chat_session, lookup.bot_id, lookup.epoch, lookup.generation, lookup.fingerprint,
+                question, lookup.query_embedding, answer, latency_ms, _EMBEDDING_CONFIG["model"], llm_model,
+            )
+            chat_session.commit()
+    except Exception as e:
+        logger.exception("Failed to store answer", extra={"bot_id": str(lookup.bot_id), "error": str(e)})
+
+
 async def respond_with_ai(message_data: dict[str, Any], session: ChatSession) -> None:
     await _send_json_safe(
         session.user_socket,
@@ -45,14 +137,41 @@ async def respond_with_ai(message_data: dict[str, Any], session: ChatSession) ->
         if isinstance(message_data, dict):
             user_text = str(message_data.get("message") or message_data.get("content") or "")
 
-        resp = await client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful customer support assistant."},
-                {"role": "user", "content": user_text},
-            ],
-        )
-        answer = (resp.choices[0].message.content or "").strip()
+        started = time.perf_counter()
+        lookup = None
+        if session.bot_id and user_text.strip():
+            lookup = await asyncio.to_thread(_lookup_answer, session.bot_id, user_text, model)
+
+        if lookup is not None and lookup.cached is not None:
+            answer = lookup.cached.answer
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            await asyncio.to_thread(
+                record_answer_cache_lookup, lookup.bot_id, True, lookup.cached.answer_latency_ms - elapsed_ms
+            )
+            logger.info(
+                "Answer served from cache",
+                extra={
+                    "bot_id": session.bot_id,
+                    "conversation_id": session.conversation_id,
+                    "similarity": round(lookup.cached.similarity, 4),
+                    "elapsed_ms": elapsed_ms,
+                    "saved_ms": max(0, lookup.cached.answer_latency_ms - elapsed_ms),
+                },
+            )
+        else:
+            resp = await client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": user_text},
+                ],
+            )
+            answer = (resp.choices[0].message.content or "").strip()
+            if lookup is not None:
+                latency_ms = int((time.perf_counter() - started) * 1000)
+                await asyncio.to_thread(record_answer_cache_lookup, lookup.bot_id, False)
+                if answer:
+                    await asyncio.to_thread(_remember_answer, lookup, user_text, answer, model, latency_ms)
 
         await _send_json_safe(
             session.user_socket,
@@ -68,5 +187,3 @@ async def respond_with_ai(message_data: dict[str, Any], session: ChatSession) ->
             session.user_socket,
             {"type": "typing", "from": "assistant", "is_typing": False, "conversation_id": session.conversation_id},
         )
-
-
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+
+from rq import Queue
+from sqlalchemy import delete, func, literal_column, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config.logging_config import setup_logging
+from app.config.rag_config import _COMPACTION_CONFIG
+from app.db.session import SessionLocal, chat_engine
+from app.infra.redis_client import redis_client
+from app.models.chat_db_models import Documents, Embeddings
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Embeddings go first so orphaned tombstones (document still live) are purged too;
+# deleting a document cascades to whatever embedding is left on it.
+_TABLES = (Embeddings, Documents)
+
+
+@dataclass(slots=True)
+class CompactionStats:
+    """What one compaction run removed; bytes are on-disk sizes (tables + TOAST + indexes)."""
+
+    embeddings_deleted: int = 0
+    documents_deleted: int = 0
+    # sum of pg_column_size over the deleted rows (space made reusable)
+    row_bytes_deleted: int = 0
+    batches: int = 0
+    maintenance_ran: bool = False
+    bytes_before: int = 0
+    bytes_after: int = 0
+    elapsed_s: float = 0.0
+    finished: bool = True
+
+    @property
+    def bytes_reclaimed(self) -> int:
+        return max(0, self.bytes_before - self.bytes_after)
+
+
+def _delete_batch(session: Session, model, cutoff: datetime, batch_size: int) -> tuple[int, int]:
+    """Hard-delete up to `batch_size` tombstones older than `cutoff`; returns (rows, row bytes)."""
+    victims = (
+        select(model.id)
+        .where(model.deleted_at.is_not(None), model.deleted_at < cutoff)
+        .limit(batch_size)
+        # Skip rows a concurrent writer holds rather than waiting on them.
+        .with_for_update(skip_locked=True)
+    )
+    table = model.__table__
+    deleted = (
+        delete(model)
+        .where(model.id.in_(victims))
+        .returning(func.pg_column_size(literal_column(table.name)).label("bytes"))
+        .cte("deleted_rows")
+    )
+    rows, size = session.execute(
+        select(func.count(), func.coalesce(func.sum(deleted.c.bytes), 0))
+    ).one()
+    return int(rows), int(size)
+
+
+def _relation_bytes(engine: Engine) -> int:
+    with engine.connect() as conn:
+        return int(conn.execute(text(
+            "SELECT pg_total_relation_size('embeddings') + pg_total_relation_size('documents')"
+        )).scalar_one())
+
+
+def _needs_maintenance(engine: Engine, stats: CompactionStats, config: dict) -> bool:
+    purged = stats.embeddings_deleted + stats.documents_deleted
+    if purged == 0:
+        return False
+    if purged >= int(config["maintenance_min_rows"]):
+        return True
+    with engine.connect() as conn:
+        # planner estimate is plenty here; avoids a count(*) over the vector table
+        live = conn.execute(text(
+            "SELECT greatest(sum(reltuples), 0) FROM pg_class WHERE oid IN ('embeddings'::regclass, 'documents'::regclass)"
+        )).scalar_one()
+    return purged >= float(config["maintenance_min_ratio"]) * float(live or 0)
+
+
+def _run_maintenance(engine: Engine) -> None:
+    # VACUUM and REINDEX CONCURRENTLY can't run inside a transaction block.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in ("embeddings", "documents"):
+            t0 = time.perf_counter()
+            conn.execute(text(f"VACUUM (ANALYZE) {table}"))
+            # Rebuilds every index on the table (including ANN indexes) without
+            # blocking reads or writes; drops the dead entries VACUUM leaves in place.
+            conn.execute(text(f"REINDEX TABLE CONCURRENTLY {table}"))
+            logger.info(
+                "Compaction maintenance done",
+                extra={"table": table, "elapsed_s": round(time.perf_counter() - t0, 3)},
+            )
+
+
+def compact_soft_deleted(config: dict | None = None) -> CompactionStats:
+    """
+    Hard-delete soft-deleted embeddings/documents past the retention window in
+    small throttled transactions, then VACUUM + REINDEX after a large purge.
+    """
+    cfg = {**_COMPACTION_CONFIG, **(config or {})}
+    if SessionLocal is None or chat_engine is None:
+        raise RuntimeError("Python chat DB is not configured (CHAT_DB_* env vars missing).")
+
+    stats = CompactionStats()
+    started = time.perf_counter()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=float(cfg["retention_days"]))
+    batch_size = int(cfg["batch_size"])
+    pause_s = float(cfg["pause_s"])
+    deadline = started + float(cfg["max_runtime_s"])
+    stats.bytes_before = _relation_bytes(chat_engine)
+
+    for model in _TABLES:
+        while True:
+            if time.perf_counter() >= deadline:
+                stats.finished = False
+                break
+            with SessionLocal() as session:
+                rows, size = _delete_batch(session, model, cutoff, batch_size)
+                session.commit()
+            stats.batches += 1
+            stats.row_bytes_deleted += size
+            if model is Embeddings:
+                stats.embeddings_deleted += rows
+            else:
+                stats.documents_deleted += rows
+            if rows < batch_size:
+                break
+            # Let autovacuum, replication and foreground queries keep up.
+            time.sleep(pause_s)
+
+    if _needs_maintenance(chat_engine, stats, cfg):
+        _run_maintenance(chat_engine)
+        stats.maintenance_ran = True
+    stats.bytes_after = _relation_bytes(chat_engine)
+    stats.elapsed_s = time.perf_counter() - started
+
+    logger.info(
+        "Compaction finished",
+        extra={**asdict(stats), "bytes_reclaimed": stats.bytes_reclaimed, "cutoff": cutoff.isoformat()},
+    )
+    return stats
+
+
+def schedule_compaction(interval_s: float | None = None) -> bool:
+    """
+    Enqueue the next run unless one is already scheduled; needs `rq worker --with-scheduler`.
+    Returns False when a run was already pending.
+    """
+    cfg = _COMPACTION_CONFIG
+    prefix = str(cfg["job_id_prefix"])
+    queue = Queue(str(cfg["queue"]), connection=redis_client)
+    if any(job_id.startswith(prefix) for job_id in queue.scheduled_job_registry.get_job_ids()):
+        return False
+    queue.enqueue_in(
+        timedelta(seconds=float(cfg["interval_s"] if interval_s is None else interval_s)),
+        compaction_job,
+        job_timeout=int(cfg["job_timeout_s"]),
+        # Unique per run: reusing the running job's id would overwrite it.
+        job_id=f"{prefix}-{uuid.uuid4()}",
+    )
+    return True
+
+
+def compaction_job(reschedule: bool = True) -> dict:
+    """RQ entry point: one compaction run, then (by default) schedule the next one."""
+    try:
+        stats = compact_soft_deleted()
+    finally:
+        if reschedule:
+            schedule_compaction()
+    return {**asdict(stats), "bytes_reclaimed": stats.bytes_reclaimed}
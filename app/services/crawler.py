@@ -0,0 +1,458 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import logging
+import queue
+import threading
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+from urllib.parse import urldefrag, urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+from bs4 import BeautifulSoup, SoupStrainer
+from redis import Redis
+
+from app.config.rag_config import _CRAWL_CONFIG, _URL_FETCH_CONFIG
+from app.infra.http_fetcher import PooledFetcher
+from app.infra.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Links to these are never HTML pages; skip them instead of fetching to find out.
+_SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js",
+    ".json", ".xml", ".zip", ".gz", ".tar", ".mp3", ".mp4", ".avi", ".mov", ".woff", ".woff2",
+)
+
+
+@dataclass(slots=True)
+class CrawlStats:
+    """Per-crawl page counts; `resumed_pages` were already done by an earlier run."""
+
+    pages_ok: int = 0
+    pages_failed: int = 0
+    pages_skipped: int = 0
+    bytes: int = 0
+    resumed_pages: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def pages_per_s(self) -> float:
+        return self.pages_ok / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class CrawlPage:
+    url: str
+    depth: int
+    html: str
+
+
+def normalize_url(url: str) -> str | None:
+    """Absolute http(s) URL without fragment, lower-cased scheme/host; None if not crawlable."""
+    url, _ = urldefrag(url.strip())
+    parts = urlparse(url)
+    if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+        return None
+    return urlunparse((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.params, parts.query, ""))
+
+
+def _site_key(url: str) -> str:
+    # http/https and a leading www. are the same site for scoping purposes.
+    return (urlparse(url).netloc or "").lower().removeprefix("www.")
+
+
+def extract_links(html: str, base_url: str) -> list[str]:
+    """Normalized, de-duplicated <a href> targets of a page (nofollow links excluded)."""
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("a"))
+    links: dict[str, None] = {}
+    for a in soup.find_all("a", href=True):
+        if "nofollow" in (a.get("rel") or []):
+            continue
+        href = str(a["href"]).strip()
+        if not href or href.startswith(("#", "mailto:", "tel:", "javascript:", "data:")):
+            continue
+        url = normalize_url(urljoin(base_url, href))
+        if url:
+            links[url] = None
+    return list(links)
+
+
+def parse_sitemap(body: bytes, max_bytes: int) -> tuple[bool, list[str]]:
+    """
+    Parse a sitemap or sitemap index (optionally gzipped).
+
+    Returns (is_index, locs): for an index the locs are child sitemaps, otherwise pages.
+    """
+    if body[:2] == b"\x1f\x8b":
+        with gzip.GzipFile(fileobj=io.BytesIO(body)) as gz:
+            body = gz.read(max_bytes + 1)
+        if len(body) > max_bytes:
+            raise ValueError(f"sitemap exceeds {max_bytes} bytes uncompressed")
+    root = ET.fromstring(body)
+    is_index = root.tag.endswith("sitemapindex")
+    path = "{*}sitemap/{*}loc" if is_index else "{*}url/{*}loc"
+    return is_index, [el.text.strip() for el in root.findall(path) if el.text and el.text.strip()]
+
+
+# Pop the lowest-depth URL and move it to `pending` in one step, so a crash
+# between the two can't lose it.
+_POP_SCRIPT = """
+local item = redis.call('ZPOPMIN', KEYS[1])
+if item[1] then redis.call('HSET', KEYS[2], item[1], item[2]) end
+return item
+"""
+
+# Enqueue URLs (ARGV[2..]) at depth ARGV[1] unless they were ever seen before.
+_ADD_SCRIPT = """
+local added = 0
+for i = 2, #ARGV do
+  if redis.call('SADD', KEYS[1], ARGV[i]) == 1 then
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[i])
+    added = added + 1
+  end
+end
+return added
+"""
+
+
+class _RedisFrontier:
+    """
+    Resumable crawl state in Redis, keyed by crawl id:
+
+    - `frontier` (zset url -> depth) URLs still to visit, lowest depth first
+    - `seen`     (set) every URL ever enqueued
+    - `pending`  (hash url -> depth) popped, but its chunks are not persisted yet
+    - `meta`     (hash) root, mode, next_index, pages_done
+    """
+
+    def __init__(self, redis: Redis, crawl_id: str, ttl_s: int) -> None:
+        prefix = f"crawl:{crawl_id}"
+        self._redis = redis
+        self._ttl_s = ttl_s
+        self._frontier = f"{prefix}:frontier"
+        self._seen = f"{prefix}:seen"
+        self._pending = f"{prefix}:pending"
+        self._meta = f"{prefix}:meta"
+        self._pop = redis.register_script(_POP_SCRIPT)
+        self._add = redis.register_script(_ADD_SCRIPT)
+
+    @property
+    def _keys(self) -> tuple[str, ...]:
+        return (self._frontier, self._seen, self._pending, self._meta)
+
+    def load(self, root_url: str) -> dict | None:
+        """Meta of an interrupted crawl of `root_url`, with its pending URLs re-queued."""
+        meta = self._redis.hgetall(self._meta)
+        if meta.get("root") != root_url or "mode" not in meta:
+            return None
+        pending = self._redis.hgetall(self._pending)
+        pipe = self._redis.pipeline()
+        if pending:
+            pipe.zadd(self._frontier, {url: float(depth) for url, depth in pending.items()})
+        pipe.delete(self._pending)
+        pipe.execute()
+        return meta
+
+    def reset(self) -> None:
+        self._redis.delete(*self._keys)
+
+    def start(self, root_url: str, mode: str) -> None:
+        self._redis.hset(self._meta, mapping={"root": root_url, "mode": mode, "next_index": 0, "pages_done": 0})
+        self._touch()
+
+    def add(self, urls: Iterable[str], depth: int) -> int:
+        urls = list(urls)
+        if not urls:
+            return 0
+        return int(self._add(keys=[self._seen, self._frontier], args=[depth, *urls]))
+
+    def pop(self) -> tuple[str, int] | None:
+        item = self._pop(keys=[self._frontier, self._pending])
+        if not item:
+            return None
+        return item[0], int(float(item[1]))
+
+    def discard(self, url: str) -> None:
+        """A popped URL that produced no page (failed, skipped); nothing to checkpoint."""
+        self._redis.hdel(self._pending, url)
+
+    def checkpoint(self, urls: Sequence[str], next_index: int) -> None:
+        pipe = self._redis.pipeline()
+        if urls:
+            pipe.hdel(self._pending, *urls)
+        pipe.hset(self._meta, "next_index", next_index)
+        pipe.hincrby(self._meta, "pages_done", len(urls))
+        pipe.execute()
+        self._touch()
+
+    def _touch(self) -> None:
+        pipe = self._redis.pipeline()
+        for key in self._keys:
+            pipe.expire(key, self._ttl_s)
+        pipe.execute()
+
+
+_DONE = object()
+
+
+class SiteCrawler:
+    """
+    Crawl one site and yield its HTML pages as they arrive.
+
+    Seeds come from the site's sitemap(s) when it has any; otherwise same-origin
+    links are followed breadth first up to `max_depth`. Fetching runs on a
+    background event loop over one PooledFetcher, obeys robots.txt, and spaces
+    requests to a host by the politeness delay. The frontier is kept in Redis:
+    the consumer calls `checkpoint` once a page's chunks are durable, and a new
+    SiteCrawler for the same `crawl_id` picks up from there (`resume_from` is the
+    next chunk index to assign). `finish` drops the state after a full crawl.
+    """
+
+    def __init__(
+        self,
+        crawl_id: str,
+        root_url: str,
+        config: dict | None = None,
+        redis: Redis | None = None,
+    ) -> None:
+        root = normalize_url(root_url)
+        if root is None:
+            raise ValueError(f"Invalid URL: {root_url}")
+        self.crawl_id = crawl_id
+        self.root_url = root
+        self._config = {**_CRAWL_CONFIG, **(config or {})}
+        self._frontier = _RedisFrontier(redis or get_redis(), crawl_id, int(self._config["state_ttl_s"]))
+        self.stats = CrawlStats()
+
+        meta = self._frontier.load(root)
+        self.resumed = meta is not None
+        if meta is None:
+            self._frontier.reset()
+            self.resume_from = 0
+            self._follow_links = True
+        else:
+            self.resume_from = int(meta.get("next_index", 0))
+            self.stats.resumed_pages = int(meta.get("pages_done", 0))
+            self._follow_links = meta["mode"] == "links"
+            logger.info(
+                "Resuming crawl",
+                extra={"crawl_id": crawl_id, "root_url": root, "resume_from": self.resume_from,
+                       "pages_done": self.stats.resumed_pages},
+            )
+
+        self._stop = threading.Event()
+        self._claimed = self.stats.resumed_pages
+        self._in_flight = 0
+        self._delay = float(self._config["politeness_delay_s"])
+        self._next_slot: dict[str, float] = {}
+
+    # ---- consumer side ----
+
+    def pages(self) -> Iterator[CrawlPage]:
+        out: queue.Queue = queue.Queue(maxsize=int(self._config["queue_size"]))
+
+        def _thread_main() -> None:
+            try:
+                asyncio.run(self._run(out))
+            except BaseException as e:  # surfaced to the consumer below
+                self._put(out, e)
+            finally:
+                self._put(out, _DONE)
+
+        started = time.perf_counter()
+        thread = threading.Thread(target=_thread_main, name=f"crawl-{self.crawl_id}", daemon=True)
+        thread.start()
+        completed = False
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+            completed = True
+        finally:
+            # Also unblocks the producer if the consumer stopped early.
+            self._stop.set()
+            if completed:
+                thread.join()
+            self.stats.elapsed_s = time.perf_counter() - started
+            logger.info(
+                "Crawl finished" if completed else "Crawl stopped",
+                extra={
+                    "crawl_id": self.crawl_id,
+                    "root_url": self.root_url,
+                    "pages_ok": self.stats.pages_ok,
+                    "pages_failed": self.stats.pages_failed,
+                    "pages_skipped": self.stats.pages_skipped,
+                    "resumed_pages": self.stats.resumed_pages,
+                    "bytes": self.stats.bytes,
+                    "elapsed_s": round(self.stats.elapsed_s, 3),
+                    "pages_per_s": round(self.stats.pages_per_s, 2),
+                },
+            )
+
+    def checkpoint(self, urls: Sequence[str], next_index: int) -> None:
+        """Record that `urls` are fully persisted and chunk indexes below `next_index` are taken."""
+        self._frontier.checkpoint(urls, next_index)
+
+    def finish(self) -> None:
+        self._frontier.reset()
+
+    # ---- producer side (background event loop) ----
+
+    def _put(self, out: queue.Queue, item: object) -> bool:
+        while True:
+            try:
+                out.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self._stop.is_set():
+                    return False
+
+    def _in_scope(self, url: str) -> bool:
+        path = urlparse(url).path.lower()
+        return _site_key(url) == _site_key(self.root_url) and not path.endswith(_SKIP_EXTENSIONS)
+
+    async def _run(self, out: queue.Queue) -> None:
+        async with PooledFetcher() as fetcher:
+            robots = await self._load_robots(fetcher)
+            crawl_delay = robots.crawl_delay(str(self._config["robots_user_agent"]))
+            self._delay = max(self._delay, float(crawl_delay or 0))
+            if not self.resumed:
+                await self._seed(fetcher, robots)
+            workers = int(self._config["concurrency"])
+            await asyncio.gather(*(self._worker(fetcher, robots, out) for _ in range(workers)))
+
+    async def _load_robots(self, fetcher: PooledFetcher) -> RobotFileParser:
+        robots = RobotFileParser(urljoin(self.root_url, "/robots.txt"))
+        result = await fetcher.fetch(robots.url)
+        if result.ok:
+            robots.parse(result.text.splitlines())
+        elif result.status_code is not None and 400 <= result.status_code < 500:
+            robots.allow_all = True
+        else:
+            # RFC 9309: an unreachable robots.txt means the whole site is off limits.
+            logger.warning(
+                "robots.txt unreachable, not crawling",
+                extra={"crawl_id": self.crawl_id, "url": robots.url,
+                       "status_code": result.status_code, "error": result.error},
+            )
+            robots.disallow_all = True
+        return robots
+
+    async def _seed(self, fetcher: PooledFetcher, robots: RobotFileParser) -> None:
+        pages = await self._read_sitemaps(fetcher, robots.site_maps() or [urljoin(self.root_url, "/sitemap.xml")])
+        if pages:
+            self._follow_links = False
+            await asyncio.to_thread(self._frontier.add, pages, 0)
+        else:
+            await asyncio.to_thread(self._frontier.add, [self.root_url], 0)
+        mode = "links" if self._follow_links else "sitemap"
+        await asyncio.to_thread(self._frontier.start, self.root_url, mode)
+        logger.info(
+            "Crawl seeded",
+            extra={"crawl_id": self.crawl_id, "root_url": self.root_url, "mode": mode, "seed_urls": len(pages) or 1},
+        )
+
+    async def _read_sitemaps(self, fetcher: PooledFetcher, sitemap_urls: list[str]) -> list[str]:
+        max_pages = int(self._config["max_pages"])
+        max_bytes = int(_URL_FETCH_CONFIG["max_body_bytes"])
+        todo = list(dict.fromkeys(sitemap_urls))
+        visited: set[str] = set()
+        pages: dict[str, None] = {}
+        while todo and len(visited) < int(self._config["max_sitemaps"]) and len(pages) < max_pages:
+            sitemap_url = todo.pop(0)
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+            result = await fetcher.fetch(sitemap_url)
+            if not result.ok:
+                continue
+            try:
+                is_index, locs = parse_sitemap(result.body, max_bytes)
+            except (ET.ParseError, ValueError, OSError) as e:
+                logger.warning("Unreadable sitemap", extra={"crawl_id": self.crawl_id, "url": sitemap_url, "error": str(e)})
+                continue
+            if is_index:
+                todo.extend(loc for loc in locs if loc not in visited)
+                continue
+            for loc in locs:
+                url = normalize_url(loc)
+                if url and self._in_scope(url):
+                    pages[url] = None
+        return list(pages)[:max_pages]
+
+    async def _worker(self, fetcher: PooledFetcher, robots: RobotFileParser, out: queue.Queue) -> None:
+        max_pages = int(self._config["max_pages"])
+        while not self._stop.is_set() and self._claimed < max_pages:
+            # Reserve the page against max_pages before popping (which yields the
+            # loop) so workers can't overshoot.
+            self._claimed += 1
+            self._in_flight += 1
+            idle = False
+            try:
+                # Frontier calls are Redis round trips; keep them off the event loop.
+                popped = await asyncio.to_thread(self._frontier.pop)
+                if popped is None:
+                    self._claimed -= 1
+                    idle = self._in_flight == 1
+                elif not await self._visit(fetcher, robots, out, *popped):
+                    self._claimed -= 1
+            finally:
+                self._in_flight -= 1
+            if popped is None:
+                if idle:
+                    return
+                # Another worker may still enqueue links from the page it's on.
+                await asyncio.sleep(0.1)
+
+    async def _polite(self, host: str) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self._next_slot.get(host, 0.0))
+        self._next_slot[host] = start + self._delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _visit(self, fetcher: PooledFetcher, robots: RobotFileParser, out: queue.Queue, url: str, depth: int) -> bool:
+        if not robots.can_fetch(str(self._config["robots_user_agent"]), url):
+            self.stats.pages_skipped += 1
+            await asyncio.to_thread(self._frontier.discard, url)
+            return False
+
+        await self._polite(urlparse(url).netloc)
+        result = await fetcher.fetch(url)
+        content_type = result.content_type
+        final_url = normalize_url(result.final_url or url) or url
+        if (
+            not result.ok
+            or (content_type and "html" not in content_type)
+            or not self._in_scope(final_url)
+        ):
+            self.stats.pages_failed += 1
+            await asyncio.to_thread(self._frontier.discard, url)
+            return False
+
+        html = result.text
+        if self._follow_links and depth < int(self._config["max_depth"]):
+            links = await asyncio.to_thread(extract_links, html, final_url)
+            await asyncio.to_thread(self._frontier.add, [link for link in links if self._in_scope(link)], depth + 1)
+
+        self.stats.pages_ok += 1
+        self.stats.bytes += len(result.body)
+        if self.stats.pages_ok % int(self._config["progress_every_pages"]) == 0:
+            logger.info(
+                "Crawl progress",
+                extra={"crawl_id": self.crawl_id, "pages_ok": self.stats.pages_ok,
+                       "pages_failed": self.stats.pages_failed, "bytes": self.stats.bytes},
+            )
+        # Blocks (off the loop) while the consumer is behind, which throttles the crawl.
+        await asyncio.to_thread(self._put, out, CrawlPage(url=url, depth=depth, html=html))
+        return True
@@ -1,50 +1,381 @@
 from __future__ import annotations
 
+import codecs
+import csv
+import io
 import logging
+import multiprocessing
+import os
+import resource
+import sys
 import tempfile
 import uuid
+from concurrent.futures import (Executor, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor, as_completed)
+from contextlib import ExitStack
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Sequence
+from typing import BinaryIO, Callable, Iterable, Iterator, Sequence
 from urllib.parse import urlparse
 
-import httpx
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_community.document_loaders.pdf import PyPDFLoader
-from langchain_community.document_loaders.text import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sqlalchemy import select, update
+import charset_normalizer
+from sqlalchemy import func, or_, select, update
 from sqlalchemy.orm import Session
 
 from app.config.logging_config import setup_logging
-from app.config.rag_config import _EMBEDDING_CONFIG
+from app.config.rag_config import (_EMBEDDING_CONFIG, _INGEST_CONFIG,
+                                   _R2_CONFIG, _TRAINING_EXECUTOR_CONFIG,
+                                   _VECTOR_CACHE_CONFIG)
 from app.db.session import DashboardDbSessionLocal, SessionLocal
-from app.helpers.rag import count_tokens, create_embeddings
-from app.helpers.utils import clean_scraped_text, extract_main_text_from_html
-from app.infra.r2_storage import (r2_delete_object, r2_download_to_path,
+from app.db.bulk import (EmbeddingScope, copy_embeddings_from,
+                         insert_documents)
+from app.helpers.chunking import (TextChunk, iter_csv_chunks,
+                                   split_text_by_tokens)
+from app.helpers.pdf_extract import iter_pdf_pages, set_pdf_cpu_share
+from app.helpers.rag import (DocumentChunk, EmbeddingStats, content_hash,
+                             create_embeddings, evict_embedding_cache)
+from app.helpers.utils import (clean_scraped_text, extract_all_text_from_html,
+                               extract_main_text_from_html,
+                               iter_clean_text_blocks)
+from app.helpers.vector_cache import (next_bot_generation,
+                                      publish_bot_generation)
+from app.helpers.vector_snapshot import (VECTOR_SNAPSHOT_DIR, gc_snapshots,
+                                         load_bot_vectors, write_snapshot)
+from app.infra.http_fetcher import FetchResult, fetch_url, iter_fetched
+from app.infra.r2_storage import (r2_delete_object, r2_delete_objects,
+                                  r2_download, r2_download_to_path,
                                   r2_object_exists)
 from app.models.chat_db_models import Documents, Embeddings, TrainingJobs
 from app.models.dashboard_db_models import Files, TrainingSources
+from app.services.crawler import SiteCrawler
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 _BUCKET = "bot-files"
+# Chunk sizes are in tokens (see split_text_by_tokens).
+_DEFAULT_CHUNK_CONFIG = {
+    "chunk_size": _EMBEDDING_CONFIG["chunk_size"],
+    "chunk_overlap": _EMBEDDING_CONFIG["chunk_overlap"],
+}
+# Upper bound on ids per IN (...) list in set-based updates.
+_ID_BATCH_SIZE = 5000
+
+
+def _peak_rss_bytes() -> int:
+    """
+    High-water RSS of this process or its largest finished child (source pool
+    processes). ru_maxrss is KiB on Linux, bytes on macOS.
+    """
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def _document_row(
+    source: TrainingSources,
+    chunk_index: int,
+    chunk: TextChunk,
+    chunk_config: dict,
+) -> dict:
+    return {
+        "organization_id": str(source.organization_id),
+        "bot_id": source.bot_id,
+        "source_id": source.id,
+        "chunk_index": chunk_index,
+        "content": chunk.text,
+        "content_hash": content_hash(chunk.text),
+        "section_title": chunk.section_title,
+        "embedding_model": _EMBEDDING_CONFIG["model"],
+        "embedding_version": _EMBEDDING_CONFIG["version"],
+        "embedding_provider": _EMBEDDING_CONFIG["provider"],
+        "is_active": False,
+        "chunk_size": int(chunk_config["chunk_size"]),
+        "chunk_overlap": int(chunk_config["chunk_overlap"]),
+        "token_count": chunk.token_count,
+    }
+
+
+def _embedding_scope(source: TrainingSources) -> EmbeddingScope:
+    # Must match what _document_row writes for the same source.
+    return EmbeddingScope(
+        bot_id=source.bot_id,
+        organization_id=str(source.organization_id),
+        embedding_model=_EMBEDDING_CONFIG["model"],
+        embedding_version=_EMBEDDING_CONFIG["version"],
+    )
+
+
+def _source_documents_filter(source_id: uuid.UUID) -> tuple:
+    return (
+        Documents.source_id == source_id,
+        Documents.embedding_model == _EMBEDDING_CONFIG["model"],
+        Documents.embedding_version == _EMBEDDING_CONFIG["version"],
+        Documents.deleted_at.is_(None),
+    )
+
+
+def _stale_documents_filter(source_id: uuid.UUID) -> tuple:
+    # Live rows embedded with another model/version; retrieval no longer sees
+    # them, so re-training retires them in its swap.
+    return (
+        Documents.source_id == source_id,
+        or_(
+            Documents.embedding_model.is_distinct_from(_EMBEDDING_CONFIG["model"]),
+            Documents.embedding_version.is_distinct_from(_EMBEDDING_CONFIG["version"]),
+        ),
+        Documents.is_active.is_(True),
+        Documents.deleted_at.is_(None),
+    )
+
+
+def _soft_delete_documents(chat_session: Session, document_ids: Sequence[uuid.UUID], now_: datetime) -> None:
+    """Soft-delete documents and their embeddings by id (caller commits)."""
+    for i in range(0, len(document_ids), _ID_BATCH_SIZE):
+        window = list(document_ids[i:i + _ID_BATCH_SIZE])
+        chat_session.execute(
+            update(Embeddings)
+            .where(Embeddings.document_id.in_(window), Embeddings.deleted_at.is_(None))
+            .values(deleted_at=now_, is_active=False)
+        )
+        chat_session.execute(
+            update(Documents)
+            .where(Documents.id.in_(window))
+            .values(deleted_at=now_, is_active=False)
+        )
+
+
+def _embed_missing_vectors(
+    chat_session: Session, source: TrainingSources, document_ids: Sequence[uuid.UUID]
+) -> EmbeddingStats:
+    """Embed the given (inactive) documents that an interrupted run left without a vector."""
+    stats = EmbeddingStats()
+    for i in range(0, len(document_ids), _ID_BATCH_SIZE):
+        missing = chat_session.execute(
+            select(Documents.id, Documents.content, Documents.token_count).where(
+                Documents.id.in_(document_ids[i:i + _ID_BATCH_SIZE]),
+                ~select(Embeddings.id).where(
+                    Embeddings.document_id == Documents.id, Embeddings.deleted_at.is_(None)
+                ).exists(),
+            )
+        ).all()
+        documents = [DocumentChunk(id=doc_id, content=content or "", token_count=tokens)
+                     for doc_id, content, tokens in missing]
+        stats.add(create_embeddings(chat_session, documents, str(source.id), _embedding_scope(source), activate=False))
+    return stats
+
+
+def _persist_and_embed_chunks(
+    chat_session: Session,
+    source: TrainingSources,
+    chunks: Iterable[TextChunk],
+    chunk_config: dict,
+    resume_from: int = 0,
+    on_flush: Callable[[int], None] | None = None,
+) -> EmbeddingStats:
+    """
+    Persist chunks to chat.documents and embed them, `persist_batch_size` chunks at a time.
+
+    `chunks` may be a generator; only one batch of rows is held in memory and chunk
+    indexes are assigned in stream order, so they are stable across runs. After every batch `on_flush(n)` is told that
+    the first n chunk indexes are durable.
+
+    Re-training a source that already has live documents is incremental: a chunk
+    whose text is unchanged at the same index is kept as is, an unchanged chunk
+    that moved copies its old vector, and only new or changed chunks are embedded.
+    Only rows of the current embedding model/version are reused; live rows of
+    older ones are retired. New rows are staged inactive and swapped in, with the
+    retired rows soft-deleted, in one transaction at the end.
+
+    `resume_from` continues an interrupted run whose stream was durable up to that
+    index: numbering starts there, and the rows the earlier run wrote below it are
+    carried into this run's swap instead of being discarded.
+    """
+    batch_size = int(_INGEST_CONFIG["persist_batch_size"])
+    stats = EmbeddingStats()
+    rows: list[dict] = []
+    chunk_count = resume_from
+
+    # Rows left inactive by an aborted earlier run would never be swapped in,
+    # except those a resumed run carries over.
+    inactive = chat_session.execute(
+        select(Documents.id, Documents.chunk_index)
+        .where(*_source_documents_filter(source.id), Documents.is_active.is_not(True))
+    ).all()
+    leftovers = [doc_id for doc_id, index in inactive if index >= resume_from]
+    resumed = {index: doc_id for doc_id, index in inactive if index < resume_from}
+    if leftovers:
+        _soft_delete_documents(chat_session, leftovers, datetime.now(timezone.utc))
+        chat_session.commit()
+
+    live = chat_session.execute(
+        select(Documents.id, Documents.chunk_index, Documents.content_hash)
+        .where(*_source_documents_filter(source.id), Documents.is_active.is_(True))
+    ).all()
+    stale = chat_session.execute(
+        select(Documents.id).where(*_stale_documents_filter(source.id))
+    ).scalars().all()
+    staged = bool(live) or bool(resumed) or bool(stale)
+    reuse_unchanged = staged and bool(_INGEST_CONFIG["incremental"])
+    live_by_index = {index: (doc_id, h) for doc_id, index, h in live}
+    live_by_hash = {h: doc_id for doc_id, _, h in live if h}
+    kept_ids: set[uuid.UUID] = set()
+    staged_ids: list[uuid.UUID] = []
+    copied = 0
+
+    if resume_from:
+        # Below resume_from the earlier run's staged row wins; where it staged
+        # nothing, the live row was unchanged (or activated directly) and stays.
+        staged_ids.extend(resumed.values())
+        kept_ids.update(doc_id for doc_id, index, _ in live if index < resume_from and index not in resumed)
+        stats.add(_embed_missing_vectors(chat_session, source, staged_ids))
+
+    def _flush() -> None:
+        nonlocal copied
+        try:
+            document_ids = insert_documents(chat_session, rows)
+            chat_session.commit()
+        except Exception:
+            chat_session.rollback()
+            logger.exception(
+                "Failed to persist document chunks",
+                extra={"source_id": str(source.id), "chunk_count": chunk_count},
+            )
+            raise ValueError("Failed to save training data. Please retry.")
+        to_embed: list[DocumentChunk] = []
+        moved: list[tuple[uuid.UUID, uuid.UUID]] = []
+        for document_id, row in zip(document_ids, rows):
+            previous = live_by_hash.get(row["content_hash"]) if reuse_unchanged else None
+            if previous is not None:
+                moved.append((document_id, previous))
+            else:
+                to_embed.append(DocumentChunk(id=document_id, content=row["content"], token_count=row["token_count"]))
+        if moved:
+            written = copy_embeddings_from(chat_session, moved)
+            if written != len(moved):
+                # A source vector vanished (deleted or retired concurrently); swapping
+                # now would activate documents that have no vector.
+                chat_session.rollback()
+                logger.error(
+                    "Copied fewer embeddings than moved chunks",
+                    extra={"source_id": str(source.id), "moved": len(moved), "copied": written},
+                )
+                raise ValueError("Failed to save training data. Please retry.")
+            copied += written
+            chat_session.commit()
+        stats.add(create_embeddings(chat_session, to_embed, str(source.id), _embedding_scope(source), activate=not staged))
+        if staged:
+            staged_ids.extend(document_ids)
+        rows.clear()
+
+    for chunk in chunks:
+        row = _document_row(source, chunk_count, chunk, chunk_config)
+        current = live_by_index.get(chunk_count) if reuse_unchanged else None
+        chunk_count += 1
+        if current is not None and current[1] == row["content_hash"]:
+            kept_ids.add(current[0])
+            continue
+        rows.append(row)
+        if len(rows) >= batch_size:
+            _flush()
+            if on_flush is not None:
+                on_flush(chunk_count)
+    if rows:
+        _flush()
+    if on_flush is not None:
+        on_flush(chunk_count)
+
+    if staged:
+        # ---- Swap: retire the old live set, then activate the staged rows ----
+        retired = [doc_id for doc_id, _, _ in live if doc_id not in kept_ids]
+        retired.extend(stale)
+        try:
+            _soft_delete_documents(chat_session, retired, datetime.now(timezone.utc))
+            for i in range(0, len(staged_ids), _ID_BATCH_SIZE):
+                window = staged_ids[i:i + _ID_BATCH_SIZE]
+                chat_session.execute(
+                    update(Documents)
+                    .where(Documents.id.in_(window))
+                    .values(is_active=True)
+                )
+                chat_session.execute(
+                    update(Embeddings)
+                    .where(Embeddings.document_id.in_(window), Embeddings.deleted_at.is_(None))
+                    .values(is_active=True)
+                )
+            chat_session.commit()
+        except Exception:
+            chat_session.rollback()
+            logger.exception(
+                "Failed to swap in re-trained document chunks",
+                extra={"source_id": str(source.id), "staged": len(staged_ids), "retired": len(retired)},
+            )
+            raise ValueError("Failed to save training data. Please retry.")
+        logger.info(
+            "Incremental re-train swapped in",
+            extra={
+                "source_id": str(source.id),
+                "kept": len(kept_ids),
+                "copied": copied,
+                "embedded": stats.chunks,
+                "retired": len(retired),
+            },
+        )
+
+    logger.info(
+        "Document chunks persisted and embedded for training source",
+        extra={
+            "source_id": str(source.id),
+            "chunk_count": chunk_count,
+            "tokens": stats.tokens,
+            "elapsed_s": round(stats.elapsed_s, 3),
+            "chunks_per_s": round(stats.chunks_per_s, 2),
+            "tokens_per_s": round(stats.tokens_per_s, 2),
+        },
+    )
+    return stats
+
+
+# Pages with less cleaned text than this are treated as empty.
+_MIN_PAGE_CHARS = 200
+
+
+def _extract_page_text(html: str, url: str) -> str:
+    """
+    Main-content text of a page, cleaned. Falls back to whole-page text over the
+    same body when the main text falls short of `_MIN_PAGE_CHARS`; the result may
+    still be short, callers decide what that means.
+    """
+    try:
+        cleaned = clean_scraped_text(extract_main_text_from_html(html))
+        if len(cleaned) >= _MIN_PAGE_CHARS:
+            return cleaned
+        logger.info("Page content too short after extraction/cleaning, falling back to full-page extraction",
+                    extra={"url": url, "content_length": len(cleaned)})
+    except Exception as e:
+        logger.error(f"Primary URL extraction failed, falling back to full-page extraction", extra={
+                     "url": url, "error": str(e)})
+    # It keeps boilerplate the main extractor strips, so it only runs when the main text falls short.
+    return clean_scraped_text(extract_all_text_from_html(html))
 
 
 def process_url_training_source(
     source: TrainingSources,
     py_session: Session,
     chunk_config: dict | None = None,
-) -> None:
+    fetched: FetchResult | None = None,
+) -> EmbeddingStats:
     """
     - Verifies if the source is a valid URL
-    - Fetches the HTML and extracts the main content and cleans it falls back to WebBaseLoader if the main text falls short of the threshold.
+    - Uses the page already downloaded by the job's pooled fetcher (`fetched`), or fetches it now.
+    - Fetches the HTML once and extracts the main content and cleans it; falls back to whole-page text over the same body if the main text falls short of the threshold.
     - Chunks the content for RAG and persists to chat_db.documents
     """
     if chunk_config is None:
-        chunk_config = {"chunk_size": 800, "chunk_overlap": 100}
+        chunk_config = dict(_DEFAULT_CHUNK_CONFIG)
 
     url = source.source_value
     if source.bot_id is None or source.organization_id is None:
@@ -61,95 +392,108 @@ def process_url_training_source(
         logger.error(f"Invalid URL: {url}")
         raise ValueError(f"Invalid URL: {url}")
 
-    cleaned: str | None = None
-
-    # * Fetch the HTML and extract the main content and clean it
-    try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (compatible; ChatAPI/1.0; +https://example.local)",
-            "Accept": "text/html,application/xhtml+xml",
-        }
-        with httpx.Client(follow_redirects=True, timeout=30.0, headers=headers) as client:
-            resp = client.get(url)
-        if resp.status_code >= 400:
-            logger.error(f"Failed to fetch URL", extra={
-                         "url": url, "status_code": resp.status_code})
-            raise ValueError(
-                f"Failed to fetch URL (status={resp.status_code})")
-        content_type = resp.headers.get("content-type", "")
-        if "text/html" not in content_type:
-            if content_type and "html" not in content_type:
-                logger.error(f"Unsupported content-type: {content_type}")
-                raise ValueError(f"Unsupported content-type: {content_type}")
-
-        raw_text = extract_main_text_from_html(resp.text)
-        cleaned = clean_scraped_text(raw_text)
-        if len(cleaned) < 200:
-            logger.error(f"Page content too short after extraction/cleaning",
-                         extra={"url": url, "content_length": len(cleaned)})
-            raise ValueError(
-                "Page content too short after extraction/cleaning")
-    except Exception as e:
-        logger.error(f"Primary URL extraction failed, falling back to WebBaseLoader", extra={
-                     "url": url, "error": str(e)})
-        cleaned = None
-
-    # Fallback: LangChain WebBaseLoader extraction.
-    # WebBaseLoader is generic doesn't remove boilerplate html elements doesnt remove scripts or styles. So it is used as a fallback mechanism when the main text falls short of the threshold.
-    if cleaned is None:
-        loader = WebBaseLoader(url)
-        docs = loader.load()
-        merged = "\n\n".join(
-            [d.page_content for d in docs if getattr(d, "page_content", "")])
-        cleaned = clean_scraped_text(merged)
-        if len(cleaned) < 200:
-            logger.error(f"Page content too short after fallback extraction/cleaning",
-                         extra={"url": url, "content_length": len(cleaned)})
-            raise ValueError(
-                "Page content too short after fallback extraction/cleaning")
+    # * Fetch the HTML once; both extractors below work on this body
+    resp = fetched if fetched is not None else fetch_url(url)
+    if resp.error is not None:
+        logger.error(f"Failed to fetch URL", extra={
+                     "url": url, "error": resp.error, "elapsed_ms": round(resp.elapsed_ms, 1)})
+        raise ValueError(f"Failed to fetch URL ({resp.error})")
+    if resp.status_code is None or resp.status_code >= 400:
+        logger.error(f"Failed to fetch URL", extra={
+                     "url": url, "status_code": resp.status_code})
+        raise ValueError(
+            f"Failed to fetch URL (status={resp.status_code})")
+    content_type = resp.content_type
+    if "text/html" not in content_type:
+        if content_type and "html" not in content_type:
+            logger.error(f"Unsupported content-type: {content_type}")
+            raise ValueError(f"Unsupported content-type: {content_type}")
+    html = resp.text
+
+    cleaned = _extract_page_text(html, url)
+    if len(cleaned) < _MIN_PAGE_CHARS:
+        logger.error(f"Page content too short after fallback extraction/cleaning",
+                     extra={"url": url, "content_length": len(cleaned)})
+        raise ValueError(
+            "Page content too short after fallback extraction/cleaning")
 
     # Chunk for RAG and persist to chat.documents
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=int(chunk_config.get("chunk_size", 800)),
-        chunk_overlap=int(chunk_config.get("chunk_overlap", 100)),
-    )
-    chunks = splitter.split_text(cleaned)
-    
-    try:
-        with py_session.begin():
-            for i, chunk in enumerate[str](chunks):
-                py_session.add(
-                    Documents(
-                        organization_id=str(source.organization_id),
-                        bot_id=source.bot_id,
-                        source_id=source.id,
-                        chunk_index=i,
-                        content=chunk,
-                        is_active=False,
-                        chunk_size=int(chunk_config.get("chunk_size", 800)),
-                        chunk_overlap=int(chunk_config.get("chunk_overlap", 100)),
-                        token_count=count_tokens(chunk, _EMBEDDING_CONFIG["model"]),
-                        embedding_model=_EMBEDDING_CONFIG["model"],
-                        embedding_version=_EMBEDDING_CONFIG["version"],
-                        embedding_provider=_EMBEDDING_CONFIG["provider"],
-                    )
-                )
-    except Exception:
-        logger.exception(
-            "Failed to persist document chunks",
-            extra={"source_id": str(source.id), "chunk_count": len(chunks)},
-        )
-        raise ValueError("Failed to save training data.")
-    
-    logger.info(f"Chunks persisted for source", extra={"source_id": str(source.id), "chunk_count": len(chunks)})
+    chunks = split_text_by_tokens([cleaned], chunk_config["chunk_size"], chunk_config["chunk_overlap"])
     
-    # Create embeddings for the chunks
-    documents = list[Documents](py_session.scalars(select(Documents).where(Documents.source_id == source.id,Documents.is_active == False,Documents.deleted_at.is_(None)).order_by(Documents.chunk_index)).all())
-    create_embeddings(py_session, documents,str(source.id))
+    return _persist_and_embed_chunks(py_session, source, chunks, chunk_config)
     
     
 
 
+def process_crawl_training_source(
+    source: TrainingSources,
+    chat_session: Session,
+    chunk_config: dict | None = None,
+) -> EmbeddingStats:
+    """
+    - Crawls the site rooted at `source_value` (sitemap first, else same-origin links).
+    - Each page goes through the same extract/clean/chunk path as a URL source as soon as it
+      arrives; chunk indexes continue across pages and section_title is the page URL.
+    - The crawl frontier is checkpointed in Redis after every persisted batch, so a crashed
+      worker resumes the crawl instead of starting over.
+    """
+    if chunk_config is None:
+        chunk_config = dict(_DEFAULT_CHUNK_CONFIG)
+    if source.bot_id is None or source.organization_id is None:
+        logger.error("Training source missing bot_id/organization_id")
+        raise ValueError("Training source missing bot_id/organization_id")
+    if not _is_fetchable_url(source.source_value):
+        logger.error(f"Invalid URL: {source.source_value}")
+        raise ValueError(f"Invalid URL: {source.source_value}")
+
+    crawler = SiteCrawler(str(source.id), str(source.source_value))
+    # (end chunk index, url) of pages streamed out but not yet checkpointed
+    unconfirmed: list[tuple[int, str]] = []
+
+    def _page_chunks() -> Iterator[TextChunk]:
+        next_index = crawler.resume_from
+        for page in crawler.pages():
+            cleaned = _extract_page_text(page.html, page.url)
+            if len(cleaned) < _MIN_PAGE_CHARS:
+                logger.info("Skipping crawled page with too little content",
+                            extra={"source_id": str(source.id), "url": page.url, "content_length": len(cleaned)})
+                cleaned = ""
+            for chunk in split_text_by_tokens(
+                [cleaned], chunk_config["chunk_size"], chunk_config["chunk_overlap"], section_title=page.url
+            ):
+                next_index += 1
+                yield chunk
+            unconfirmed.append((next_index, page.url))
+
+    def _checked_chunks() -> Iterator[TextChunk]:
+        chunks = _page_chunks()
+        first = next(chunks, None)
+        if first is None and crawler.resume_from == 0:
+            logger.error(
+                "Crawl produced no usable pages",
+                extra={"source_id": str(source.id), "root_url": crawler.root_url,
+                       "pages_ok": crawler.stats.pages_ok, "pages_failed": crawler.stats.pages_failed,
+                       "pages_skipped": crawler.stats.pages_skipped},
+            )
+            crawler.finish()
+            raise ValueError("No crawlable pages with enough content were found for this site.")
+        if first is not None:
+            yield first
+        yield from chunks
+
+    def _checkpoint(durable: int) -> None:
+        done = [url for end, url in unconfirmed if end <= durable]
+        unconfirmed[:] = [(end, url) for end, url in unconfirmed if end > durable]
+        crawler.checkpoint(done, durable)
+
+    stats = _persist_and_embed_chunks(
+        chat_session, source, _checked_chunks(), chunk_config,
+        resume_from=crawler.resume_from, on_flush=_checkpoint,
+    )
+    crawler.finish()
+    return stats
+
+
 # MIME types we support -> extension used for loader selection
 _MIME_TO_EXT: dict[str, str] = {
     "application/pdf": ".pdf",
@@ -173,34 +517,41 @@ def _extension_for_loader(original_filename: str | None, mime_type: str | None)
     return ""
 
 
-def _loader_for_file(
-    path: Path,
-    original_filename: str | None = None,
-    mime_type: str | None = None,
-) -> PyPDFLoader | CSVLoader | TextLoader:
-    """Pick loader by original_filename extension or mime_type; path is the on-disk file path."""
-    ext = _extension_for_loader(original_filename, mime_type)
-    logger.info(
-        "Loading file",
-        extra={"path": str(path), "original_filename": original_filename, "mime_type": mime_type, "resolved_ext": ext},
-    )
-    if ext == ".pdf":
-        return PyPDFLoader(str(path))
-    if ext == ".csv":
-        return CSVLoader(file_path=str(path))
-    if ext in (".md", ".txt"):
-        return TextLoader(str(path), encoding="utf-8", autodetect_encoding=True)
-    raise ValueError(
-        f"Unsupported file type (original_filename={original_filename!r}, mime_type={mime_type!r}). "
-        "Supported: .csv .md .pdf .txt"
-    )
+_SUPPORTED_FILE_EXTS = (".csv", ".md", ".pdf", ".txt")
+
+
+_TEXT_SNIFF_BYTES = 64 * 1024
+
+
+def _open_text_file(raw: BinaryIO) -> io.TextIOWrapper:
+    """
+    Decode as utf-8 (BOM tolerated) if the head is valid utf-8, else the charset
+    detected from the head, else latin-1; same fallback idea as TextLoader's
+    autodetect, but only the head is held in memory.
+    """
+    head = raw.read(_TEXT_SNIFF_BYTES)
+    raw.seek(0)
+    encoding = "utf-8-sig"
+    try:
+        # final=False: the head may end inside a multi-byte character
+        codecs.getincrementaldecoder("utf-8-sig")().decode(head, final=False)
+    except UnicodeDecodeError:
+        best = charset_normalizer.from_bytes(head).best()
+        encoding = best.encoding if best is not None else "latin-1"
+    return io.TextIOWrapper(raw, encoding=encoding, errors="replace")
+
+
+def _iter_text_lines(f: io.TextIOWrapper, max_chars: int) -> Iterator[str]:
+    # Lines without their newline; a line longer than max_chars comes in pieces.
+    for line in iter(lambda: f.readline(max_chars), ""):
+        yield line[:-1] if line.endswith("\n") else line
 
 
 def process_file_training_source(
     source: TrainingSources, chat_session: Session,dashboard_session: Session, chunk_config: dict | None = None
-) -> None:
+) -> EmbeddingStats:
     if chunk_config is None:
-        chunk_config = {"chunk_size": 800, "chunk_overlap": 100}
+        chunk_config = dict(_DEFAULT_CHUNK_CONFIG)
     
 
     # Find the file record so we know its storage path (and extension).
@@ -231,38 +582,41 @@ def process_file_training_source(
             extra={"source_id": str(source.id), "file_record": repr(file_record)},
         )
         raise ValueError("Uploaded file metadata is incomplete.")
- 
-    try:
-        exists = r2_object_exists(file_record.bucket, file_record.path)
-    except Exception:
-        logger.exception(
-            "Failed to check file existence in R2",
-            extra={
-                "source_id": str(source.id),
-                "bucket": file_record.bucket,
-                "path": file_record.path,
-            },
-        )
-        raise ValueError("Unable to verify the file in storage right now. Please retry.")
 
-    if not exists:
-        logger.error(
-            "File not found in storage",
-            extra={
-                "source_id": str(source.id),
-                "bucket": file_record.bucket,
-                "path": file_record.path,
-            },
+    # Use original_filename or mime_type for the extension (path is hashed).
+    suffix = _extension_for_loader(file_record.original_filename, file_record.mime_type)
+    logger.info(
+        "Loading file",
+        extra={
+            "source_id": str(source.id),
+            "original_filename": file_record.original_filename,
+            "mime_type": file_record.mime_type,
+            "resolved_ext": suffix,
+        },
+    )
+    if suffix not in _SUPPORTED_FILE_EXTS:
+        raise ValueError(
+            f"Unsupported file type (original_filename={file_record.original_filename!r}, "
+            f"mime_type={file_record.mime_type!r}). Supported: .csv .md .pdf .txt"
         )
-        raise ValueError("File upload was not completed. Please re-upload and try again.")
 
-    # Download to a temp file; use original_filename or mime_type for extension (path is hashed).
-    suffix = _extension_for_loader(file_record.original_filename, file_record.mime_type) or ""
-    cleaned = ""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmp_path = Path(tmpdir) / f"source{suffix}"
+    # PDFs are parsed page-parallel on a process pool, which needs a real file;
+    # everything else is read from a spooled buffer (in memory unless large).
+    is_pdf = suffix == ".pdf"
+    is_csv = suffix == ".csv"
+    with ExitStack() as stack:
+        tmp_path: Path | None = None
+        buffer = None
         try:
-            r2_download_to_path(file_record.bucket, file_record.path, str(tmp_path))
+            # One conditional GET is both the existence check and the download.
+            if is_pdf:
+                tmp_path = Path(stack.enter_context(tempfile.TemporaryDirectory())) / f"source{suffix}"
+                found = r2_download_to_path(file_record.bucket, file_record.path, str(tmp_path))
+            else:
+                buffer = stack.enter_context(
+                    tempfile.SpooledTemporaryFile(max_size=int(_R2_CONFIG["spool_max_bytes"])))
+                found = r2_download(file_record.bucket, file_record.path, buffer) is not None
+                buffer.seek(0)
         except Exception:
             logger.exception(
                 "Failed to download file from R2",
@@ -274,80 +628,274 @@ def process_file_training_source(
             )
             raise ValueError("Failed to download the uploaded file")
 
-        try:
-            loader = _loader_for_file(
-                tmp_path,
-                original_filename=file_record.original_filename,
-                mime_type=file_record.mime_type,
-            )
-            docs = loader.load()
-            merged = "\n\n".join(
-                [d.page_content for d in docs if getattr(d, "page_content", "")]
-            )
-            cleaned = clean_scraped_text(merged)
-        except ValueError:
-            # Keep user-facing message from loader selection (unsupported type, etc.).
-            raise
-        except Exception:
-            logger.exception(
-                "Failed to parse uploaded file",
+        if not found:
+            logger.error(
+                "File not found in storage",
                 extra={
                     "source_id": str(source.id),
                     "bucket": file_record.bucket,
                     "path": file_record.path,
-                    "tmp_path": str(tmp_path),
                 },
             )
-            raise ValueError("Unable to read the uploaded file. Please try a different file.")
-    if len(cleaned) < 50:
+            raise ValueError("File upload was not completed. Please re-upload and try again.")
+
+        content_length = 0
+
+        def _raw_pages() -> Iterator[str]:
+            # PDF pages -> clean_scraped_text, one page in memory at a time; text
+            # files are decoded line by line and cleaned into blocks.
+            if tmp_path is not None:
+                for page in iter_pdf_pages(tmp_path):
+                    yield clean_scraped_text(page)
+                return
+            window = int(_INGEST_CONFIG["split_window_chars"])
+            with _open_text_file(buffer) as f:
+                yield from iter_clean_text_blocks(_iter_text_lines(f, window), window)
+
+        def _cleaned_pages() -> Iterator[str]:
+            nonlocal content_length
+            try:
+                for cleaned in _raw_pages():
+                    content_length += len(cleaned)
+                    yield cleaned
+            except Exception:
+                logger.exception(
+                    "Failed to parse uploaded file",
+                    extra={
+                        "source_id": str(source.id),
+                        "bucket": file_record.bucket,
+                        "path": file_record.path,
+                        "resolved_ext": suffix,
+                    },
+                )
+                raise ValueError("Unable to read the uploaded file. Please try a different file.")
+
+        def _csv_chunks() -> Iterator[TextChunk]:
+            # rows -> header + row lines per chunk, `batch_rows` rows in memory at a time
+            nonlocal content_length
+            try:
+                for chunk in iter_csv_chunks(buffer, chunk_config["chunk_size"]):
+                    content_length += len(chunk.text)
+                    yield chunk
+            except (csv.Error, OSError):
+                logger.exception(
+                    "Failed to parse uploaded CSV file",
+                    extra={
+                        "source_id": str(source.id),
+                        "bucket": file_record.bucket,
+                        "path": file_record.path,
+                    },
+                )
+                raise ValueError("Unable to read the uploaded file. Please try a different file.")
+
+        def _checked_chunks() -> Iterator[TextChunk]:
+            # Hold back the first chunk until we know the file isn't (nearly) empty.
+            if is_csv:
+                chunks = _csv_chunks()
+            else:
+                chunks = split_text_by_tokens(
+                    _cleaned_pages(), chunk_config["chunk_size"], chunk_config["chunk_overlap"])
+            first = next(chunks, None)
+            # The first chunk only arrives early once a full encode window was read,
+            # so a short count here means the whole file was short.
+            if content_length < 50:
+                logger.error(
+                    "File content too short after loading/cleaning",
+                    extra={"source_id": str(source.id), "content_length": content_length},
+                )
+                raise ValueError("File content too short after loading the data from file")
+            if first is not None:
+                yield first
+            yield from chunks
+
+        #TODO: Implement versioning logic for the embeddings
+        # Versioning scheme:
+        # PATCH (v1.0.1): metadata-only changes
+        # MINOR (v1.1.0): chunking changes
+        # MAJOR (v2.0.0): model or dimension changes
+        return _persist_and_embed_chunks(chat_session, source, _checked_chunks(), chunk_config)
+    
+
+def _is_fetchable_url(url: str | None) -> bool:
+    if not url:
+        return False
+    res = urlparse(url)
+    return bool(res.scheme and res.netloc)
+
+
+@dataclass(frozen=True, slots=True)
+class _SourceResult:
+    source_id: str
+    ok: bool
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+def _file_source_executor(sources: int) -> Executor:
+    workers = max(1, min(int(_TRAINING_EXECUTOR_CONFIG["file_workers"]), sources))
+    # Each concurrent file source may start its own PDF page pool; split the
+    # CPUs between them instead of letting every one start a process per CPU.
+    cpu_share = max(1, (os.cpu_count() or 1) // workers)
+    if _TRAINING_EXECUTOR_CONFIG["file_executor"] == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="train-file",
+                                  initializer=set_pdf_cpu_share, initargs=(cpu_share,))
+    # Parsing PDFs/HTML is CPU bound; separate processes sidestep the GIL.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(str(_TRAINING_EXECUTOR_CONFIG["mp_start_method"])),
+        initializer=set_pdf_cpu_share,
+        initargs=(cpu_share,),
+    )
+
+
+def _mark_source_failed(dashboard_session: Session, source: TrainingSources, error: Exception) -> None:
+    # Refresh source to get latest state, then update status
+    try:
+        dashboard_session.refresh(source)
+        source.status = "training_failed"
+        source.error_message = str(error)
+        dashboard_session.commit()
+    except Exception:
+        dashboard_session.rollback()
+        # If commit fails, try to get a fresh source object
+        try:
+            fresh_source = dashboard_session.scalars(
+                select(TrainingSources).where(TrainingSources.id == source.id)
+            ).one()
+            fresh_source.status = "training_failed"
+            fresh_source.error_message = str(error)
+            dashboard_session.commit()
+        except Exception:
+            dashboard_session.rollback()
+            logger.exception(
+                "Failed to update source status after error",
+                extra={"source_id": str(source.id)},
+            )
+
+
+def _train_source(
+    job_id: str,
+    source_id: str,
+    chunk_config: dict,
+    fetched: FetchResult | None = None,
+) -> _SourceResult:
+    """
+    Train one source end to end with its own chat/dashboard sessions.
+
+    Runs on a thread or in a pool process, so it only takes and returns plain,
+    picklable values. Failures are recorded on the source and reported as ok=False.
+    """
+    if SessionLocal is None or DashboardDbSessionLocal is None:
+        logger.critical("Database sessions not configured")
+        return _SourceResult(source_id=source_id, ok=False)
+
+    chat_session = SessionLocal()
+    dashboard_session = DashboardDbSessionLocal()
+    source = None
+    try:
+        source = dashboard_session.scalars(
+            select(TrainingSources).where(TrainingSources.id == uuid.UUID(source_id))
+        ).one()
+
+        # ---- Mark source processing ----
+        source.status = "training"
+        dashboard_session.commit()
+
+        logger.info(
+            "Processing training source",
+            extra={"job_id": job_id, "source_id": source_id},
+        )
+
+        if source.type == "url":
+            stats = process_url_training_source(source, chat_session, chunk_config=chunk_config, fetched=fetched)
+        elif source.type == "crawl":
+            stats = process_crawl_training_source(source, chat_session, chunk_config=chunk_config)
+        else:
+            stats = process_file_training_source(
+                source,
+                chat_session,
+                dashboard_session,
+                chunk_config=chunk_config,
+            )
+
+        source.status = "trained"
+        dashboard_session.commit()
+        return _SourceResult(
+            source_id=source_id,
+            ok=True,
+            cache_hits=stats.cache_hits,
+            cache_misses=stats.cache_misses,
+        )
+    except Exception as e:
         logger.error(
-            "File content too short after loading/cleaning",
-            extra={"source_id": str(source.id), "content_length": len(cleaned)},
+            "Failed to process training source",
+            extra={
+                "job_id": job_id,
+                "source_id": source_id,
+                "error": str(e),
+            },
         )
-        raise ValueError("File content too short after loading the data from file")
+        # Rollback both sessions to ensure clean state
+        dashboard_session.rollback()
+        chat_session.rollback()
+        if source is not None:
+            _mark_source_failed(dashboard_session, source, e)
+        return _SourceResult(source_id=source_id, ok=False)
+    finally:
+        dashboard_session.close()
+        chat_session.close()
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=int(chunk_config.get(
-        "chunk_size", 800)), chunk_overlap=int(chunk_config.get("chunk_overlap", 100)))
-    chunks = splitter.split_text(cleaned)
+
+def _publish_bot_generation(bot_id: str | uuid.UUID, job_id: str) -> None:
+    """
+    Invalidate the API's cached vectors for a bot (best-effort). The snapshot
+    for the new generation is written before it is published, so API processes
+    map it instead of each reading the bot from Postgres.
+    """
     try:
-        with chat_session.begin():
-            for i, chunk in enumerate[str](chunks):
-                chat_session.add(
-                    Documents(
-                        organization_id=str(source.organization_id),
-                        bot_id=source.bot_id,
-                        source_id=source.id,
-                        chunk_index=i,
-                        content=chunk,
-                        embedding_model=_EMBEDDING_CONFIG["model"],
-                        embedding_version=_EMBEDDING_CONFIG["version"],
-                        embedding_provider=_EMBEDDING_CONFIG["provider"],
-                        is_active=False,
-                        chunk_size=int(chunk_config.get("chunk_size", 800)),
-                        chunk_overlap=int(chunk_config.get("chunk_overlap", 100)),
-                        token_count=count_tokens(chunk, "text-embedding-3-small")
-                    )
+        generation = next_bot_generation(bot_id)
+    except Exception as e:
+        logger.exception(
+            "Failed to bump bot generation",
+            extra={"job_id": job_id, "bot_id": str(bot_id), "error": str(e)},
+        )
+        return
+    if VECTOR_SNAPSHOT_DIR is not None and SessionLocal is not None:
+        bot_uuid = uuid.UUID(str(bot_id))
+        model, version = _EMBEDDING_CONFIG["model"], _EMBEDDING_CONFIG["version"]
+        try:
+            with SessionLocal() as chat_session:
+                vectors = load_bot_vectors(
+                    chat_session, bot_uuid, model, version, generation,
+                    max_rows=int(_VECTOR_CACHE_CONFIG["max_bot_chunks"]),
+                    batch_size=int(_VECTOR_CACHE_CONFIG["load_batch_size"]),
                 )
-                #TODO: Implement versioning logic for the embeddings
-                # Versioning scheme:
-                # PATCH (v1.0.1): metadata-only changes
-                # MINOR (v1.1.0): chunking changes
-                # MAJOR (v2.0.0): model or dimension changes
-        logger.info(f"Document chunks persisted for source: {source.id}")
-    except Exception:
+            path = write_snapshot(vectors, bot_uuid, model, version)
+            removed = gc_snapshots(bot_uuid, model, version, generation)
+            logger.info(
+                "Vector snapshot written",
+                extra={
+                    "job_id": job_id,
+                    "bot_id": str(bot_id),
+                    "generation": generation,
+                    "chunks": vectors.rows,
+                    "path": str(path) if path else None,
+                    "removed": removed,
+                },
+            )
+        except Exception as e:
+            logger.exception(
+                "Failed to write vector snapshot",
+                extra={"job_id": job_id, "bot_id": str(bot_id), "error": str(e)},
+            )
+    try:
+        publish_bot_generation(bot_id, generation)
+    except Exception as e:
         logger.exception(
-            "Failed to persist document chunks",
-            extra={"source_id": str(source.id), "chunk_count": len(chunks)},
+            "Failed to publish bot generation",
+            extra={"job_id": job_id, "bot_id": str(bot_id), "error": str(e)},
         )
-        raise ValueError("Failed to save training data. Please retry.")
-    
-    logger.info(f"Document chunks persisted for training source",extra={"source_id": str(source.id), "chunk_count": len(chunks)})
-    
-    
-    # Create embeddings for the chunks
-    documents = list[Documents](chat_session.scalars(select(Documents).where(Documents.source_id == source.id,Documents.is_active == False,Documents.deleted_at.is_(None)).order_by(Documents.chunk_index)).all())
-    create_embeddings(chat_session, documents,str(source.id))
-    
+
 
 def process_training_job(
     job_id: str,
@@ -390,78 +938,86 @@ def process_training_job(
             )
         ).all()
 
+        # ---- Train sources in parallel; each task owns its DB sessions ----
+        url_sources: dict[str, list[str]] = {}
+        unfetchable_ids: list[str] = []
+        file_source_ids: list[str] = []
+        crawl_source_ids: list[str] = []
         for source in sources:
-            # ---- Idempotency guard ----
-            try:
-                # ---- Mark source processing ----
-                source.status = "training"
-                dashboard_session.commit()
-
-                logger.info(
-                    "Processing training source",
-                    extra={"job_id": job_id, "source_id": str(source.id)},
-                )
-
-                if source.type == "url":
-                    process_url_training_source(source, chat_session)
-                else:
-                    process_file_training_source(
-                        source,
-                        chat_session,
-                        dashboard_session,
-                        chunk_config={"chunk_size": 800, "chunk_overlap": 100},
-                    )
+            if source.type == "crawl":
+                # Crawls fetch their own pages; they share the I/O-bound URL pool.
+                crawl_source_ids.append(str(source.id))
+            elif source.type != "url":
+                file_source_ids.append(str(source.id))
+            elif _is_fetchable_url(source.source_value):
+                url_sources.setdefault(str(source.source_value), []).append(str(source.id))
+            else:
+                # Let process_url_training_source record the validation failure.
+                unfetchable_ids.append(str(source.id))
+        # Nothing below touches these rows again; per-source status lives in the tasks.
+        dashboard_session.rollback()
 
-                source.status = "trained"
-                dashboard_session.commit()
-                any_successful = True
-            except Exception as e:
-                any_failed = True
-                logger.error(
-                    "Failed to process training source",
-                    extra={
-                        "job_id": job_id,
-                        "source_id": str(source.id),
-                        "error": str(e),
-                    },
-                )
-                # Rollback both sessions to ensure clean state
-                dashboard_session.rollback()
-                chat_session.rollback()
-                
-                # Refresh source to get latest state, then update status
+        with ExitStack() as stack:
+            futures: dict[Future[_SourceResult], str] = {}
+            if file_source_ids:
+                file_pool = stack.enter_context(_file_source_executor(len(file_source_ids)))
+                for sid in file_source_ids:
+                    futures[file_pool.submit(_train_source, job_id, sid, _DEFAULT_CHUNK_CONFIG)] = sid
+            if url_sources or unfetchable_ids or crawl_source_ids:
+                url_pool = stack.enter_context(ThreadPoolExecutor(
+                    max_workers=int(_TRAINING_EXECUTOR_CONFIG["url_workers"]),
+                    thread_name_prefix="train-url",
+                ))
+                for sid in crawl_source_ids + unfetchable_ids:
+                    futures[url_pool.submit(_train_source, job_id, sid, _DEFAULT_CHUNK_CONFIG)] = sid
+                # Pages are downloaded over one pooled async client and handed to
+                # extract/chunk/embed as each one arrives.
+                for fetched in iter_fetched(url_sources):
+                    for sid in url_sources[fetched.url]:
+                        futures[url_pool.submit(_train_source, job_id, sid, _DEFAULT_CHUNK_CONFIG, fetched)] = sid
+
+            for future in as_completed(futures):
                 try:
-                    dashboard_session.refresh(source)
-                    source.status = "training_failed"
-                    source.error_message = str(e)
-                    dashboard_session.commit()
-                except Exception:
-                    dashboard_session.rollback()
-                    # If commit fails, try to get a fresh source object
-                    try:
-                        fresh_source = dashboard_session.scalars(
-                            select(TrainingSources).where(TrainingSources.id == source.id)
-                        ).one()
-                        fresh_source.status = "training_failed"
-                        fresh_source.error_message = str(e)
-                        dashboard_session.commit()
-                    except Exception:
-                        dashboard_session.rollback()
-                        logger.exception(
-                            "Failed to update source status after error",
-                            extra={"source_id": str(source.id)},
-                        )
+                    result = future.result()
+                except Exception as e:
+                    # Only reachable if the task itself died (e.g. a pool process was killed).
+                    logger.error(
+                        "Training source task crashed",
+                        extra={"job_id": job_id, "source_id": futures[future], "error": str(e)},
+                    )
+                    any_failed = True
+                    continue
+                if result.ok:
+                    any_successful = True
+                    job.embedding_cache_hits += result.cache_hits
+                    job.embedding_cache_misses += result.cache_misses
+                    chat_session.commit()
+                else:
+                    any_failed = True
 
         # ---- Final job status ----
         job.status = "completed" if any_successful and not any_failed else "partially_completed" if any_successful and any_failed else "failed"
         
         job.completed_at = datetime.now(timezone.utc)
+        job.peak_rss_bytes = _peak_rss_bytes()
         chat_session.commit()
         logger.info(f"Job status updated to {job.status}")
 
+        try:
+            evict_embedding_cache(chat_session)
+        except Exception:
+            chat_session.rollback()
+            logger.exception("Failed to evict embedding cache", extra={"job_id": job_id})
+
         logger.info(
             "Training job finished",
-            extra={"job_id": job_id, "status": job.status},
+            extra={
+                "job_id": job_id,
+                "status": job.status,
+                "embedding_cache_hits": job.embedding_cache_hits,
+                "embedding_cache_misses": job.embedding_cache_misses,
+                "peak_rss_bytes": job.peak_rss_bytes,
+            },
         )
 
     except Exception as e:
@@ -476,15 +1032,58 @@ def process_training_job(
             try:
                 job.status = "failed"
                 job.completed_at = datetime.now(timezone.utc)
+                job.peak_rss_bytes = _peak_rss_bytes()
                 chat_session.commit()
             except Exception:
                 chat_session.rollback()
 
     finally:
+        # Sources commit independently, so even a failed job may have swapped chunks.
+        if job is not None:
+            _publish_bot_generation(bot_id, job_id)
         dashboard_session.close()
         chat_session.close()
 
 
+def _soft_delete_sources(
+    chat_session: Session, source_ids: Sequence[uuid.UUID], deleted_at: datetime
+) -> dict[uuid.UUID, int]:
+    """
+    Soft-delete embeddings FIRST, then documents, for every source in `source_ids`
+    with one set-based UPDATE each (per id window). Idempotent; the caller commits.
+    Returns {source_id: documents newly soft-deleted}.
+    """
+    counts: dict[uuid.UUID, int] = {}
+    for i in range(0, len(source_ids), _ID_BATCH_SIZE):
+        window = list(source_ids[i:i + _ID_BATCH_SIZE])
+        chat_session.execute(
+            update(Embeddings)
+            .where(
+                Embeddings.document_id.in_(
+                    select(Documents.id).where(Documents.source_id.in_(window))
+                ),
+                Embeddings.deleted_at.is_(None),
+            )
+            .values(deleted_at=deleted_at, is_active=False)
+        )
+        # Count per source in SQL rather than returning a row per document.
+        deleted = (
+            update(Documents)
+            .where(
+                Documents.source_id.in_(window),
+                Documents.deleted_at.is_(None),
+            )
+            .values(deleted_at=deleted_at)
+            .returning(Documents.source_id)
+            .cte("deleted_documents")
+        )
+        for source_id, n in chat_session.execute(
+            select(deleted.c.source_id, func.count()).group_by(deleted.c.source_id)
+        ):
+            counts[source_id] = int(n)
+    return counts
+
+
 def delete_training_source_job(
     job_id: str,
     source_id: str,
@@ -561,31 +1160,10 @@ def delete_training_source_job(
             )
             raise ValueError("Source not marked as deleted")
 
-        now_ = datetime.now(timezone.utc)
-
-        # ---- Soft-delete embeddings FIRST (idempotent) ----
-        chat_session.execute(
-            update(Embeddings)
-            .where(
-                Embeddings.document_id.in_(
-                    select(Documents.id).where(Documents.source_id == source_uuid)
-                ),
-                Embeddings.deleted_at.is_(None),
-            )
-            .values(deleted_at=now_)
-        )
-
-        # ---- Soft-delete documents SECOND (idempotent) ----
-        chat_session.execute(
-            update(Documents)
-            .where(
-                Documents.source_id == source_uuid,
-                Documents.deleted_at.is_(None),
-            )
-            .values(deleted_at=now_)
-        )
-
+        # ---- Soft-delete embeddings, then documents (idempotent) ----
+        _soft_delete_sources(chat_session, [source_uuid], datetime.now(timezone.utc))
         chat_session.commit()
+        _publish_bot_generation(bot_uuid, job_id)
 
         # ---- Best-effort file deletion ----
         if source.type == "file":
@@ -648,3 +1226,154 @@ def delete_training_source_job(
     finally:
         dashboard_session.close()
         chat_session.close()
+
+
+def delete_training_sources_job(
+    job_id: str,
+    source_ids: list[str],
+    organization_id: str,
+    bot_id: str,
+):
+    """
+    Batch cleanup worker (best-effort): delete_training_source_job for many sources
+    under one training_jobs row.
+
+    Embeddings/documents of all sources are soft-deleted set-based, files go
+    out with DeleteObjects 1000 keys at a time, and the per-source outcome is
+    stored in training_jobs.source_results. Sources not marked as deleted
+    (the invariant) are skipped and reported instead of failing the batch.
+    """
+
+    chat_session = SessionLocal()
+    dashboard_session = DashboardDbSessionLocal()
+
+    if chat_session is None or dashboard_session is None:
+        logger.critical("Database sessions not configured")
+        return
+
+    job = None
+    results: dict[str, dict] = {}
+
+    try:
+        job_uuid = uuid.UUID(str(job_id))
+        bot_uuid = uuid.UUID(str(bot_id))
+        source_uuids = list(dict.fromkeys(uuid.UUID(str(s)) for s in source_ids))
+
+        job = chat_session.scalars(
+            select(TrainingJobs)
+            .where(TrainingJobs.id == job_uuid)
+            .where(TrainingJobs.organization_id == organization_id)
+            .where(TrainingJobs.bot_id == bot_uuid)
+        ).one_or_none()
+
+        if not job:
+            logger.error("Cleanup job not found", extra={"job_id": job_id})
+            return
+
+        job.status = "processing"
+        job.started_at = datetime.now(timezone.utc)
+        chat_session.commit()
+
+        sources = dashboard_session.scalars(
+            select(TrainingSources).where(
+                TrainingSources.id.in_(source_uuids),
+                TrainingSources.bot_id == bot_uuid,
+                TrainingSources.organization_id == organization_id,
+            )
+        ).all()
+
+        # Already hard-deleted / TTL-cleaned (or not this bot's): nothing to clean up.
+        outcome: dict[str, dict] = {str(s): {"status": "not_found"} for s in source_uuids}
+        deletable: list[TrainingSources] = []
+        for source in sources:
+            if source.deleted_at is None:
+                outcome[str(source.id)] = {"status": "not_deleted"}
+            else:
+                deletable.append(source)
+
+        counts = _soft_delete_sources(
+            chat_session, [s.id for s in deletable], datetime.now(timezone.utc)
+        )
+        chat_session.commit()
+        if deletable:
+            _publish_bot_generation(bot_uuid, job_id)
+        for source in deletable:
+            outcome[str(source.id)] = {"status": "deleted", "documents": counts.get(source.id, 0)}
+        # Only reported (even on a later failure) once the soft-delete is durable.
+        results = outcome
+
+        # ---- Best-effort file deletion, one DeleteObjects per 1000 keys ----
+        file_keys = {
+            str(s.source_value): str(s.id) for s in deletable if s.type == "file" and s.source_value
+        }
+        if file_keys:
+            try:
+                errors = r2_delete_objects(_BUCKET, list(file_keys))
+            except Exception as e:
+                logger.exception(
+                    "Failed to delete files from R2",
+                    extra={"job_id": job_id, "files": len(file_keys), "error": str(e)},
+                )
+                errors = {key: "request_failed" for key in file_keys}
+            for key, sid in file_keys.items():
+                results[sid]["file"] = f"failed: {errors[key]}" if key in errors else "deleted"
+            if errors:
+                logger.warning(
+                    "Some files could not be deleted from R2",
+                    extra={"job_id": job_id, "failed": len(errors), "files": len(file_keys)},
+                )
+
+        skipped = [sid for sid, r in results.items() if r["status"] == "not_deleted"]
+        if skipped:
+            logger.error(
+                "Sources not marked as deleted were skipped",
+                extra={"job_id": job_id, "source_ids": skipped},
+            )
+            job.error_message = f"{len(skipped)} source(s) were not marked as deleted and were skipped."
+
+        job.source_results = results
+        job.status = "cleanup_completed"
+        job.completed_at = datetime.now(timezone.utc)
+        chat_session.commit()
+
+        logger.info(
+            "Batch cleanup completed",
+            extra={
+                "job_id": job_id,
+                "sources": len(source_uuids),
+                "deleted": len(deletable),
+                "skipped": len(skipped),
+                "documents": sum(counts.values()),
+            },
+        )
+
+    except ValueError:
+        # Malformed ids: nothing was touched
+        if job is not None:
+            try:
+                job.status = "failed"
+                job.completed_at = datetime.now(timezone.utc)
+                chat_session.commit()
+            except Exception:
+                chat_session.rollback()
+        raise
+
+    except Exception as e:
+        # Best-effort cleanup failure: do NOT fail deletion
+        logger.exception(
+            "Batch cleanup encountered errors; marking completed",
+            extra={"job_id": job_id, "error": str(e)},
+        )
+        if job is not None:
+            try:
+                chat_session.rollback()
+                job.source_results = results or None
+                job.status = "cleanup_completed"
+                job.completed_at = datetime.now(timezone.utc)
+                chat_session.commit()
+            except Exception:
+                chat_session.rollback()
+
+    finally:
+        dashboard_session.close()
+        chat_session.close()
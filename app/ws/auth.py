@@ -43,6 +43,7 @@ async def authenticate_socket(
         session = ChatSession(
             conversation_id=conversation_id,
             organization_id=organization_id,
+            bot_id=claims.get("bot_id"),
             user_socket=websocket,
         )
         active_sessions[conversation_id] = session